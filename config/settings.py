@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -37,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_countries',
     'shop',
     "imageops",
@@ -47,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.perf.PerfMiddleware',  # первым: общее время запроса включает остальные middleware
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -61,7 +67,7 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'shop.perf.TimedDjangoTemplates',  # DjangoTemplates + время рендера в Server-Timing
         'DIRS': [BASE_DIR / "frontend" / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -93,6 +99,52 @@ DATABASES = {
     }
 }
 
+# Тесты по умолчанию гоняем без Postgres (TEST_ON_POSTGRES=1 — на боевой СУБД).
+# Поиск в shop/search.py в этом случае работает через icontains.
+if TESTING and not os.getenv("TEST_ON_POSTGRES"):
+    DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+
+# Cache
+# Общий для всех gunicorn-воркеров кэш (файловый, без внешних сервисов).
+# В тестах — locmem, чтобы прогоны не делили состояние.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", str(Path(tempfile.gettempdir()) / "sonder_cache")),
+        "TIMEOUT": 60 * 60 * 24,
+    }
+}
+if CACHES["default"]["BACKEND"].endswith("FileBasedCache"):
+    # по умолчанию 300 записей и случайная чистка трети — мало для страниц, корзин и поколений
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": 50_000}
+if TESTING:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+SHOP_PAGE_CACHE = True                # кэш HTML витрины для анонимов (shop/pagecache.py)
+SHOP_PAGE_CACHE_TIMEOUT = 60 * 10
+SHOP_CONTENT_VERSION = os.getenv("SHOP_CONTENT_VERSION", "")  # в ETag и ключе кэша страниц; в compose = тег образа (VERSION)
+SHOP_SEARCH_SUGGEST = True            # /api/search/ из индекса в памяти воркера (shop/suggest.py)
+SHOP_SEARCH_SUGGEST_LRU = 512         # сколько последних запросов помнить
+SHOP_CART_STORAGE = "cookie"          # корзина (shop/cart.py): "cookie" — подписанная cookie, "cache" — только Redis/Memcached/БД-кэш
+SHOP_CART_MAX_AGE = 60 * 60 * 24 * 30
+SHOP_RECS_TOP_K = 8                   # «С этим товаром покупают»: сколько соседей хранить (shop/recommendations.py)
+SHOP_ORDER_NUMBER_YEARLY = False      # True => номера «№-2026-0001», счёт заново каждый год
+SHOP_PERF_SAMPLE_RATE = float(os.getenv("SHOP_PERF_SAMPLE_RATE", "0.05"))  # доля запросов с замером БД/шаблона/миниатюр (shop/perf.py)
+SHOP_PERF_SERVER_TIMING = True        # заголовок Server-Timing на замеренных запросах
+METRICS_DIR = os.getenv("METRICS_DIR", "")  # файлы метрик процессов (core/metrics.py); пусто => <tmp>/sonder_metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # /metrics: Authorization: Bearer <token> (или вход сотрудника)
+
+# Строки замеров (JSON) — в stdout gunicorn
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "shop.perf": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -147,8 +199,16 @@ IMAGEOPS_MAX_DIMS = (1800, 1800)      # по длинной стороне
 IMAGEOPS_QUALITY = 90                 # 1–95
 IMAGEOPS_FORCE_WEBP = False       # True => всё конвертить в WebP
 IMAGEOPS_STRIP_EXIF = True            # вырезать метаданные
+IMAGEOPS_MAX_PIXELS = 40_000_000      # больше после уменьшенного декодирования JPEG — не сжимаем (≈160 МБ RGBA)
 IMAGEOPS_ONLY_ON_CHANGE = True        # сжимать только когда файл заменили
 IMAGEOPS_ENABLE = True                # глобальный выключатель
+IMAGEOPS_FIELDS = {}                  # по полям: {"app.Model.field": {"quality": 85, "skip": True, ...}}, см. imageops/registry.py
+IMAGEOPS_ASYNC = True                 # сжимать в фоне: manage.py imageops_worker
+IMAGEOPS_DELETE_ORIGINALS = False     # удалять оригинал после подмены воркером
+IMAGEOPS_VARIANTS_ENABLE = True       # лесенка ширин для srcset ({% responsive_image %})
+IMAGEOPS_VARIANT_WIDTHS = (320, 640, 960, 1280)
+IMAGEOPS_VARIANT_FORMATS = ("avif", "webp", "jpeg")  # avif — только при наличии плагина Pillow
+IMAGEOPS_VARIANT_QUALITY = 80
 
 
 from easy_thumbnails.conf import Settings as thumbnail_settings
@@ -157,6 +217,8 @@ THUMBNAIL_PROCESSORS = (
 ) + thumbnail_settings.THUMBNAIL_PROCESSORS
 
 IMAGE_CROPPING_THUMB_SIZE = (960, 410)
+# кадрированные миниатюры режутся при сохранении, на рендере — только готовые файлы
+IMAGE_CROPPING_BACKEND = "shop.thumbnails.PregeneratedThumbnailsBackend"
 
 YANDEX_MAPS_API_KEY = os.environ.get("YANDEX_MAPS_API_KEY", "")
 
@@ -25,6 +25,7 @@ class SonderAdminSite(AdminSite):
         # Администрирование
         ("auth", "User"): ("Администрирование", 200),
         ("auth", "Group"): ("Администрирование", 200),
+        ("imageops", "ImageJob"): ("Администрирование", 200),
 
         # Операции (последним)
         ("shop", "Order"): ("Операции", 900),
@@ -47,6 +48,7 @@ class SonderAdminSite(AdminSite):
         # Администрирование
         ("auth", "User"): 10,
         ("auth", "Group"): 20,
+        ("imageops", "ImageJob"): 30,
 
         # Операции
         ("shop", "Customer"): 20,
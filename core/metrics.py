@@ -0,0 +1,228 @@
+"""
+Счётчики и гистограммы в формате Prometheus без внешних сервисов.
+
+Каждый процесс (воркер gunicorn, imageops_worker) копит значения в памяти и
+не чаще раза в FLUSH_INTERVAL секунд сбрасывает их в свой файл
+<METRICS_DIR>/<pid>-<старт>.json (запись через os.replace — атомарно).
+/metrics складывает файлы всех процессов, поэтому счётчики не теряются
+при перезапуске воркера и видны из любого из них. Каталог один на все
+контейнеры (общий volume) и очищается при старте web.
+
+    ORDERS = Counter("shop_orders_created_total", "Оформлено заказов")
+    ORDERS.inc()
+    LATENCY = Histogram("shop_http_request_duration_seconds", "...", ("view",))
+    LATENCY.observe(0.042, view="shop:catalog")
+"""
+import atexit
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+FLUSH_INTERVAL = 5
+INF = float("inf")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, INF)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics_dir() -> Path:
+    return Path(getattr(settings, "METRICS_DIR", "") or Path(tempfile.gettempdir()) / "sonder_metrics")
+
+
+# --- реестр процесса ---
+
+class Registry:
+    def __init__(self):
+        self.families = {}   # имя -> метрика
+        self.values = {}     # имя -> {значения меток: число | [счётчики корзин, сумма]}
+        self.lock = threading.Lock()
+        self.flushed_at = 0.0
+        self.filename = f"{os.getpid()}-{time.time_ns()}.json"
+
+    def register(self, metric) -> None:
+        self.families[metric.name] = metric
+        self.values.setdefault(metric.name, {})
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "families": {name: m.describe() for name, m in self.families.items()},
+                "samples": {
+                    name: [
+                        [list(labels), [list(value[0]), value[1]] if isinstance(value, list) else value]
+                        for labels, value in rows.items()
+                    ]
+                    for name, rows in self.values.items()
+                },
+            }
+
+    def flush(self, force=False) -> None:
+        now = time.monotonic()
+        if not force and now - self.flushed_at < FLUSH_INTERVAL:
+            return
+        self.flushed_at = now
+        if os.getpid() != int(self.filename.split("-")[0]):  # форк после импорта
+            self.filename = f"{os.getpid()}-{time.time_ns()}.json"
+        directory = metrics_dir()
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(self.snapshot(), fh, allow_nan=True)
+            os.replace(tmp, directory / self.filename)
+        except OSError:
+            pass  # метрики не должны ронять запрос
+
+
+registry = Registry()
+atexit.register(registry.flush, True)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _key(self, labels) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def describe(self) -> dict:
+        return {"type": self.type, "help": self.documentation, "labels": list(self.labelnames)}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels) -> None:
+        key = self._key(labels)
+        with registry.lock:
+            rows = registry.values[self.name]
+            rows[key] = rows.get(key, 0) + amount
+        registry.flush()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets) if buckets[-1] == INF else tuple(buckets) + (INF,)
+        super().__init__(name, documentation, labelnames)
+
+    def describe(self) -> dict:
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+    def observe(self, value, **labels) -> None:
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with registry.lock:
+            rows = registry.values[self.name]
+            row = rows.setdefault(key, [[0] * len(self.buckets), 0.0])
+            row[0][index] += 1
+            row[1] += value
+        registry.flush()
+
+
+# --- сбор по всем процессам ---
+
+def collect() -> dict:
+    """
+    Сумма файлов всех процессов:
+    {имя: {"type", "help", "labels", ["buckets"], "samples": {метки: значение}}}
+    """
+    registry.flush(force=True)
+    merged = {}
+    for path in sorted(metrics_dir().glob("*.json")):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # файл удалили или дописывают прямо сейчас
+        for name, family in data["families"].items():
+            into = merged.setdefault(name, {**family, "samples": {}})
+            if into.get("buckets") != family.get("buckets"):
+                continue  # поменяли корзины, а старый процесс ещё жив
+            for labels, value in data["samples"].get(name, ()):
+                key = tuple(labels)
+                if family["type"] == "histogram":
+                    prev = into["samples"].get(key, [[0] * len(family["buckets"]), 0.0])
+                    value = [[a + b for a, b in zip(prev[0], value[0])], prev[1] + value[1]]
+                else:
+                    value += into["samples"].get(key, 0)
+                into["samples"][key] = value
+    return merged
+
+
+def quantile(buckets, counts, q):
+    """Верхняя граница корзины, в которую попадает квантиль q (None — нет данных)."""
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for bound, n in zip(buckets, counts):
+        seen += n
+        if seen >= q * total:
+            return bound
+    return buckets[-1]
+
+
+def _number(value) -> str:
+    if value == INF:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def exposition(families) -> str:
+    """Текстовый формат Prometheus 0.0.4."""
+    lines = []
+    for name, family in sorted(families.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        names = family["labels"]
+        for labels, value in sorted(family["samples"].items()):
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, n in zip(family["buckets"], counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(names, labels, [('le', _number(bound))])} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(names, labels)} {_number(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+def _authorized(request) -> bool:
+    token = getattr(settings, "METRICS_TOKEN", "")
+    header = request.headers.get("Authorization", "")
+    if token and hmac.compare_digest(header, f"Bearer {token}"):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+def metrics_view(request):
+    """GET /metrics — для сборщика (Bearer METRICS_TOKEN) или сотрудника в админке."""
+    if not _authorized(request):
+        return HttpResponseForbidden("forbidden")
+    return HttpResponse(exposition(collect()), content_type=CONTENT_TYPE)
@@ -13,6 +13,7 @@
 
     const linesWrap = panel.querySelector('#cart-lines-mini');
     const totalEl = panel.querySelector('#cart-total-mini');
+    const recsWrap = panel.querySelector('#cart-recs-mini');
 
     function getCookie(name) {
         const v = `; ${document.cookie}`.split(`; ${name}=`);
@@ -21,6 +22,10 @@
 
     const CSRF = getCookie('csrftoken') || '';
 
+    function esc(value) {
+        return String(value ?? '').replace(/[&<>"']/g, ch => `&#${ch.charCodeAt(0)};`);
+    }
+
     const cartIconImages = Array.from(document.querySelectorAll('.cart img, .cart-2 img'))
         .map(img => ({img, initial: img.getAttribute('src')}));
 
@@ -103,6 +108,22 @@
   `).join('');
     }
 
+    // «С этим покупают» по всей корзине (recommendations из cart_summary)
+    function renderRecommendations(recs) {
+        if (!recsWrap) return;
+        if (!recs || !recs.length) {
+            recsWrap.hidden = true;
+            return;
+        }
+        recsWrap.querySelector('.cart-recs-list').innerHTML = recs.map(r => `
+    <a href="${esc(r.url)}" class="cart-rec" data-product-id="${esc(r.id)}">
+      <img src="${esc(r.image || PLACEHOLDER)}" loading="lazy" alt="${esc(r.name)}">
+      <span class="cart-rec-name">${esc(r.name)}</span>
+      <span class="cart-rec-price">${esc(r.price)} BYN</span>
+    </a>
+  `).join('');
+        recsWrap.hidden = false;
+    }
 
     async function refreshMiniCart() {
         try {
@@ -112,6 +133,7 @@
             if (!data.ok) throw new Error('bad');
 
             renderItems(data.items || []);
+            renderRecommendations(data.recommendations || []);
             if (totalEl) totalEl.textContent = data.total || '0';
             setCartIconActive((data.count || 0) > 0);
         } catch (e) {
@@ -152,6 +174,7 @@
                 if (!linesWrap.querySelector('[data-product-id]')) {
                     renderItems([]); // покажем «Корзина пуста», но окно НЕ закрываем
                 }
+                refreshMiniCart(); // рекомендации зависели от удалённого товара
                 return;
             }
 
@@ -1,3 +1,43 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
-# Register your models here.
+from .models import ImageJob
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "content_type", "object_id", "field_name", "status_badge",
+                    "attempts", "size_info", "updated_at")
+    list_filter = ("status", "content_type")
+    search_fields = ("source_name", "result_name", "object_id")
+    readonly_fields = [f.name for f in ImageJob._meta.fields]
+    actions = ["retry"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("content_type")
+
+    @admin.display(description="Статус", ordering="status")
+    def status_badge(self, obj):
+        colors = {
+            "pending": "#2563eb", "running": "#a16207", "done": "#16a34a",
+            "skipped": "#6b7280", "failed": "#dc2626",
+        }
+        c = colors.get(obj.status, "#374151")
+        return format_html('<span style="padding:2px 8px;border-radius:12px;background:{};color:#fff;">{}</span>',
+                           c, obj.get_status_display())
+
+    @admin.display(description="Размер")
+    def size_info(self, obj):
+        if obj.bytes_before is None or obj.bytes_after is None:
+            return "—"
+        return f"{obj.bytes_before // 1024} → {obj.bytes_after // 1024} КБ"
+
+    @admin.action(description="Повторить обработку")
+    def retry(self, request, queryset):
+        n = queryset.exclude(status=ImageJob.Status.RUNNING).update(
+            status=ImageJob.Status.PENDING, attempts=0, error=""
+        )
+        self.message_user(request, f"Поставлено в очередь: {n}")
@@ -5,4 +5,6 @@ class ImageOpsConfig(AppConfig):
     name = "imageops"
 
     def ready(self):
-        from . import signals
\ No newline at end of file
+        from . import registry, signals
+        registry.build()
+        signals.connect()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Очередь фонового сжатия в таблице ImageJob (без внешнего брокера).
+
+Запрос только сохраняет оригинал и ставит задачу; воркер
+(`manage.py imageops_worker`) сжимает файл, кладёт результат рядом
+и атомарно подменяет ссылку в модели, если её не успели поменять.
+"""
+import logging
+import os
+from datetime import timedelta
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from . import registry
+from .models import ImageJob
+from .utils import compress_image
+from .variants import build_variants_safe
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+STALE_AFTER = timedelta(minutes=10)  # RUNNING дольше — воркер, видимо, упал
+
+
+def enqueue(instance, field_name: str) -> ImageJob | None:
+    file_obj = getattr(instance, field_name, None)
+    if not file_obj or not file_obj.name:
+        return None
+    return ImageJob.objects.create(
+        content_type=ContentType.objects.get_for_model(instance, for_concrete_model=False),
+        object_id=str(instance.pk),
+        field_name=field_name,
+        source_name=file_obj.name,
+    )
+
+
+def claim_next() -> ImageJob | None:
+    """Забрать следующую задачу (SKIP LOCKED — несколько воркеров не мешают друг другу)."""
+    stale = timezone.now() - STALE_AFTER
+    with transaction.atomic():
+        job = (
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImageJob.Status.PENDING)
+            .order_by("id")
+            .first()
+        ) or (
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImageJob.Status.RUNNING, updated_at__lt=stale)
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ImageJob.Status.RUNNING
+        job.attempts += 1
+        job.save(update_fields=["status", "attempts", "updated_at"])
+    return job
+
+
+def _long_side(fh) -> int:
+    fh.seek(0)
+    with Image.open(fh) as img:
+        return max(img.size)
+
+
+def _rescaled_crops(obj, field_name: str, scale: float) -> dict:
+    """
+    Кадрирование (ImageRatioField) хранится в пикселях исходника —
+    после уменьшения картинки его нужно пересчитать.
+    """
+    out = {}
+    for ratio_name in getattr(obj, "ratio_fields", []):
+        ratio_field = obj._meta.get_field(ratio_name)
+        if ratio_field.image_field != field_name:
+            continue
+        box = getattr(obj, ratio_name) or ""
+        try:
+            values = [int(v) for v in box.split(",")]
+        except ValueError:
+            continue
+        if len(values) != 4 or values[0] < 0:  # пусто или кадрирование выключено
+            continue
+        out[ratio_name] = ",".join(str(round(v * scale)) for v in values)
+    return out
+
+
+def _finish(job, status, **fields):
+    job.status = status
+    for k, v in fields.items():
+        setattr(job, k, v)
+    job.save()
+
+
+def process(job: ImageJob) -> None:
+    from .signals import image_processed
+
+    model = job.content_type.model_class()
+    obj = model._default_manager.filter(pk=job.object_id).first() if model else None
+    if obj is None:
+        return _finish(job, ImageJob.Status.SKIPPED, error="объект удалён")
+
+    if job.field_name not in registry.managed_fields(model):
+        return _finish(job, ImageJob.Status.SKIPPED, error="поле выключено в IMAGEOPS_FIELDS")
+
+    field = model._meta.get_field(job.field_name)
+    file_obj = getattr(obj, field.name)
+    if not file_obj or file_obj.name != job.source_name:
+        return _finish(job, ImageJob.Status.SKIPPED, error="файл уже заменён")
+
+    storage = file_obj.storage
+    try:
+        bytes_before = storage.size(job.source_name)
+        with storage.open(job.source_name, "rb") as fh:
+            side_before = _long_side(fh)
+            fh.seek(0)
+            new_file = compress_image(fh, **registry.policy(model, field.name))
+        side_after = _long_side(new_file)
+        new_file.seek(0)
+        target = field.generate_filename(obj, os.path.basename(new_file.name))
+        new_name = storage.save(target, new_file)
+    except Exception as exc:
+        logger.exception("imageops job #%s failed", job.pk)
+        status = ImageJob.Status.FAILED if job.attempts >= MAX_ATTEMPTS else ImageJob.Status.PENDING
+        return _finish(job, status, error=f"{type(exc).__name__}: {exc}")
+
+    # подменяем ссылку, только если за время обработки файл не поменяли
+    changes = {field.name: new_name}
+    if side_before and side_after != side_before:
+        changes.update(_rescaled_crops(obj, field.name, side_after / side_before))
+    updated = model._default_manager.filter(
+        pk=obj.pk, **{field.name: job.source_name}
+    ).update(**changes)
+    if not updated:
+        storage.delete(new_name)
+        return _finish(job, ImageJob.Status.SKIPPED, error="файл заменён во время обработки")
+
+    # оригинал не удаляем: на тот же файл могут ссылаться другие поля (Product.image)
+    if getattr(settings, "IMAGEOPS_DELETE_ORIGINALS", False):
+        storage.delete(job.source_name)
+
+    _finish(
+        job, ImageJob.Status.DONE,
+        result_name=new_name, error="",
+        bytes_before=bytes_before, bytes_after=storage.size(new_name),
+    )
+
+    build_variants_safe(new_name, storage)
+
+    for name, value in changes.items():
+        setattr(obj, name, value)
+    image_processed.send(
+        sender=model, instance=obj, field_name=field.name,
+        old_name=job.source_name, new_name=new_name,
+    )
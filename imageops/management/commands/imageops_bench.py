@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw
+
+# Каждый замер — в свежем процессе: пик RSS монотонен, иначе пик первого
+# прогона закрыл бы все последующие.
+CHILD = """
+import json, resource, sys, time
+import django
+django.setup()
+from PIL import Image
+from imageops.utils import compress_image
+
+
+def rss(field):
+    # Linux: VmRSS / VmHWM (пик, сбрасывается через clear_refs); иначе — ru_maxrss
+    try:
+        with open("/proc/self/status") as fh:
+            return next(int(line.split()[1]) * 1024 for line in fh if line.startswith(field))
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+path, repeat, kwargs = sys.argv[1], int(sys.argv[2]), json.loads(sys.argv[3])
+if not kwargs["draft"]:
+    from django.conf import settings
+    settings.IMAGEOPS_MAX_PIXELS = 10**9  # «как раньше»: без бюджета, полное декодирование
+Image.init()
+try:
+    with open("/proc/self/clear_refs", "w") as fh:
+        fh.write("5")  # пик до этой точки (импорты, setup) не считаем
+except OSError:
+    pass
+base = rss("VmRSS:")
+best = float("inf")
+for _ in range(repeat):
+    with open(path, "rb") as fh:
+        started = time.perf_counter()
+        out = compress_image(fh, **kwargs)
+        best = min(best, time.perf_counter() - started)
+peak = rss("VmHWM:")
+with Image.open(out) as img:
+    size = img.size
+print(json.dumps({"seconds": best, "rss": peak - base, "bytes": out.size, "size": size}))
+"""
+
+
+def _source(path, size, fmt):
+    """Синтетическое «фото»: градиенты и линии, чтобы кодеку было что сжимать."""
+    w, h = size
+    gradient = Image.linear_gradient("L")
+    img = Image.merge("RGB", (
+        gradient.resize(size),
+        gradient.rotate(90).resize(size),
+        Image.radial_gradient("L").resize(size),
+    ))
+    draw = ImageDraw.Draw(img)
+    for x in range(0, w, max(w // 100, 1)):
+        draw.line((x, 0, w - x, h), fill=(30, 60, 90), width=3)
+    if fmt == "PNG":
+        img.putalpha(200)
+        img.save(path, "PNG", compress_level=1)
+    else:
+        img.save(path, "JPEG", quality=92)
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк compress_image: время на мегапиксель и прирост пикового RSS "
+        "на типичных исходниках (снимки телефона 12 и 48 Мп, PNG с альфой), "
+        "с декодированием в уменьшенном масштабе (draft) и без."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3, help="Прогонов на замер (берётся лучший).")
+        parser.add_argument("--modes", default="full,draft", help="full — полное декодирование, draft — JPEG draft.")
+
+    def handle(self, *args, **options):
+        cases = [
+            ("JPEG 12 Мп", (4000, 3000), "JPEG"),
+            ("JPEG 48 Мп", (8000, 6000), "JPEG"),
+            ("PNG RGBA 12 Мп", (4000, 3000), "PNG"),
+        ]
+        modes = [m for m in options["modes"].split(",") if m]
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(settings.BASE_DIR), os.environ.get("PYTHONPATH")]))}
+
+        self.stdout.write(f"{'исходник':16} {'режим':6} {'мс':>7} {'мс/Мп':>7} {'RSS +МБ':>8} {'КБ':>7}  результат")
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, size, fmt in cases:
+                path = os.path.join(tmp, f"source.{fmt.lower()}")
+                _source(path, size, fmt)
+                megapixels = size[0] * size[1] / 1e6
+                for mode in modes:
+                    kwargs = {"draft": mode == "draft"}
+                    proc = subprocess.run(
+                        [sys.executable, "-c", CHILD, path, str(options["repeat"]), json.dumps(kwargs)],
+                        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+                    )
+                    if proc.returncode:
+                        self.stderr.write(f"{label} {mode}: {proc.stderr.strip().splitlines()[-1]}")
+                        continue
+                    r = json.loads(proc.stdout.strip().splitlines()[-1])
+                    self.stdout.write(
+                        f"{label:16} {mode:6} {r['seconds'] * 1000:7.0f} {r['seconds'] * 1000 / megapixels:7.1f} "
+                        f"{r['rss'] / 2**20:8.1f} {r['bytes'] / 1024:7.0f}  {r['size'][0]}x{r['size'][1]}"
+                    )
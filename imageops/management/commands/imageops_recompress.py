@@ -0,0 +1,60 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from imageops.recompress import BATCH_SIZE, MIN_SAVING, recompress
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересжать уже загруженные картинки всех ImageField по текущим IMAGEOPS_* "
+        "(пул процессов по числу ядер). Ссылки в БД подменяются пачками в транзакции; "
+        "прерванный прогон продолжается с чекпоинта. --dry-run только считает экономию. "
+        "Без --delete-originals (и IMAGEOPS_DELETE_ORIGINALS) оригиналы остаются и место на диске растёт."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Процессов сжатия.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Строк на транзакцию.")
+        parser.add_argument("--min-saving", type=float, default=MIN_SAVING,
+                            help="Заменять, если файл уменьшился хотя бы на эту долю (или уменьшились размеры).")
+        parser.add_argument("--dry-run", action="store_true", help="Ничего не записывать, показать экономию.")
+        parser.add_argument("--restart", action="store_true", help="Начать заново, не глядя на чекпоинты.")
+        parser.add_argument("--delete-originals", action="store_true", default=None,
+                            help="После подмены удалить оригиналы, на которые больше не ссылается ни одно поле "
+                                 "(по умолчанию — как в IMAGEOPS_DELETE_ORIGINALS).")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--workers и --batch-size должны быть больше нуля.")
+        totals = recompress(
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            min_saving=options["min_saving"],
+            restart=options["restart"],
+            delete_originals=options["delete_originals"],
+            log=self.stdout.write,
+        )
+        mb = 2**20
+        if options["dry_run"]:
+            delete = options["delete_originals"]
+            if delete is None:
+                delete = getattr(settings, "IMAGEOPS_DELETE_ORIGINALS", False)
+            delta = totals["after"] - (totals["before"] if delete else 0)
+            summary = (
+                f"Можно заменить: {totals['replaced']} ({totals['before'] / mb:.1f} → {totals['after'] / mb:.1f} МБ); "
+                f"на диске {delta / mb:+.1f} МБ, {'оригиналы будут удалены' if delete else 'оригиналы останутся'}."
+            )
+        else:
+            delta = totals["after"] - totals["freed"]
+            summary = (
+                f"Заменено: {totals['replaced']} ({totals['before'] / mb:.1f} → {totals['after'] / mb:.1f} МБ); "
+                f"записано {totals['after'] / mb:.1f} МБ, освобождено {totals['freed'] / mb:.1f} МБ, "
+                f"на диске {delta / mb:+.1f} МБ."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Просмотрено файлов: {totals['files']}. {summary}"
+            + (f" Ошибок: {totals['errors']} (см. лог)." if totals["errors"] else "")
+        ))
@@ -0,0 +1,28 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from imageops.variants import build_variants_safe, ensure_variants
+
+
+class Command(BaseCommand):
+    help = "Нарезать адаптивные варианты (srcset) для всех ImageField медиатеки."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Пересобрать, даже если манифест уже есть.")
+
+    def handle(self, *args, **options):
+        build = build_variants_safe if options["force"] else ensure_variants
+        seen = set()
+        for model in apps.get_models():
+            fields = [f for f in model._meta.fields if isinstance(f, models.ImageField)]
+            if not fields:
+                continue
+            for row in model._default_manager.values_list(*[f.name for f in fields]).iterator():
+                for field, name in zip(fields, row):
+                    if not name or name in seen:
+                        continue
+                    seen.add(name)
+                    build(name, field.storage)
+            self.stdout.write(f"{model._meta.label}: готово")
+        self.stdout.write(self.style.SUCCESS(f"Файлов: {len(seen)}"))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.metrics import registry
+from imageops.jobs import claim_next, process
+
+
+class Command(BaseCommand):
+    help = "Фоновый воркер сжатия изображений (очередь ImageJob)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Разобрать очередь и выйти.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Пауза при пустой очереди, сек.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("imageops worker started")
+        while True:
+            close_old_connections()
+            job = claim_next()
+            if job is None:
+                registry.flush()  # метрики последних задач — в файл для /metrics
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+            process(job)
+            self.stdout.write(f"#{job.pk} {job.source_name}: {job.status}")
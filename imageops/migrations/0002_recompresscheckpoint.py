@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imageops', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecompressCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=200, primary_key=True, serialize=False, verbose_name='Поле')),
+                ('settings_key', models.CharField(max_length=200, verbose_name='Настройки сжатия')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Последний pk')),
+                ('files', models.PositiveIntegerField(default=0, verbose_name='Заменено файлов')),
+                ('bytes_saved', models.BigIntegerField(default=0, verbose_name='Сэкономлено байт')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Чекпоинт пересжатия',
+                'verbose_name_plural': 'Чекпоинты пересжатия',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imageops', '0002_recompresscheckpoint'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recompresscheckpoint',
+            name='bytes_saved',
+        ),
+        migrations.AddField(
+            model_name='recompresscheckpoint',
+            name='bytes_freed',
+            field=models.BigIntegerField(default=0, verbose_name='Освобождено байт'),
+        ),
+        migrations.AddField(
+            model_name='recompresscheckpoint',
+            name='bytes_written',
+            field=models.BigIntegerField(default=0, verbose_name='Записано байт'),
+        ),
+    ]
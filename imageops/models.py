@@ -1,3 +1,64 @@
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
 
-# Create your models here.
+
+class ImageJob(models.Model):
+    """Отложенное сжатие картинки (IMAGEOPS_ASYNC), обрабатывается `manage.py imageops_worker`."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "В очереди"
+        RUNNING = "running", "Обрабатывается"
+        DONE = "done", "Готово"
+        SKIPPED = "skipped", "Пропущено"
+        FAILED = "failed", "Ошибка"
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name="Модель")
+    object_id = models.CharField("ID объекта", max_length=64)
+    field_name = models.CharField("Поле", max_length=100)
+    source_name = models.CharField("Исходный файл", max_length=500)
+    result_name = models.CharField("Результат", max_length=500, blank=True, default="")
+
+    status = models.CharField(
+        "Статус",
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True,
+    )
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    error = models.TextField("Ошибка", blank=True, default="")
+    bytes_before = models.PositiveBigIntegerField("Размер до", null=True, blank=True)
+    bytes_after = models.PositiveBigIntegerField("Размер после", null=True, blank=True)
+
+    created_at = models.DateTimeField("Создано", auto_now_add=True)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    class Meta:
+        verbose_name = "Обработка изображения"
+        verbose_name_plural = "Обработка изображений"
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.source_name} [{self.get_status_display()}]"
+
+
+class RecompressCheckpoint(models.Model):
+    """Докуда дошёл `manage.py imageops_recompress` по полю модели (при этих настройках сжатия)."""
+
+    name = models.CharField("Поле", max_length=200, primary_key=True)  # shop.ProductPhoto.image
+    settings_key = models.CharField("Настройки сжатия", max_length=200)
+    position = models.BigIntegerField("Последний pk", default=0)
+    files = models.PositiveIntegerField("Заменено файлов", default=0)
+    bytes_written = models.BigIntegerField("Записано байт", default=0)   # новые файлы
+    bytes_freed = models.BigIntegerField("Освобождено байт", default=0)  # удалённые оригиналы
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    class Meta:
+        verbose_name = "Чекпоинт пересжатия"
+        verbose_name_plural = "Чекпоинты пересжатия"
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
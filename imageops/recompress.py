@@ -0,0 +1,238 @@
+"""
+Пересжатие уже загруженной медиатеки (`manage.py imageops_recompress`).
+
+Сигналы сжимают только новые файлы. Всё, что загружено раньше или до смены
+IMAGEOPS_QUALITY / IMAGEOPS_MAX_DIMS / IMAGEOPS_FORCE_WEBP / IMAGEOPS_FIELDS,
+проходит здесь: файлы жмёт пул процессов (в БД процессы не ходят), результат
+кладётся рядом с оригиналом, а ссылки во всех полях реестра (registry.py)
+со старым именем подменяются одной транзакцией на пачку — вместе
+с чекпоинтом, так что прерванный прогон продолжается с той же строки.
+
+Оригиналы остаются на месте (место на диске только растёт), пока не
+передан delete_originals / --delete-originals или IMAGEOPS_DELETE_ORIGINALS:
+тогда после подмены удаляются те из них, на которые больше не ссылается
+ни одно поле реестра.
+"""
+import logging
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+
+from . import registry
+from .jobs import _long_side, _rescaled_crops
+from .models import RecompressCheckpoint
+from .utils import compress_image
+from .variants import build_variants_safe
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+MIN_SAVING = 0.1  # экономия меньше 10% — не трогаем: повторный JPEG только теряет качество
+
+
+@dataclass
+class Result:
+    name: str
+    replace: bool = False
+    new_name: str = ""
+    before: int = 0
+    after: int = 0
+    scale: float = 1.0
+    error: str = ""
+
+
+def settings_key(kwargs: dict) -> str:
+    """Сменились настройки сжатия — чекпоинты недействительны, проходим заново."""
+    w, h = kwargs["max_dims"]
+    return f"{w}x{h} q{kwargs['quality']} webp={int(bool(kwargs['force_webp']))}"
+
+
+def recompress_file(label, field_name, kwargs, min_saving, dry_run, name) -> Result:
+    """Выполняется в процессе пула: сжать файл и, если есть смысл и это не dry-run, сохранить рядом."""
+    storage = apps.get_model(label)._meta.get_field(field_name).storage
+    result = Result(name)
+    try:
+        result.before = storage.size(name)
+        with storage.open(name, "rb") as fh:
+            side_before = _long_side(fh)
+            fh.seek(0)
+            new_file = compress_image(fh, **kwargs)
+        side_after = _long_side(new_file)
+        result.after = new_file.size
+        if side_after >= side_before and result.after > result.before * (1 - min_saving):
+            return result
+        result.replace = True
+        result.scale = side_after / side_before if side_before else 1.0
+        if dry_run:
+            return result
+        new_file.seek(0)
+        target = posixpath.join(posixpath.dirname(name), os.path.basename(new_file.name))
+        result.new_name = storage.save(target, new_file)
+        build_variants_safe(result.new_name, storage)
+    except Exception as exc:
+        result.replace = False
+        result.error = f"{type(exc).__name__}: {exc}"
+    return result
+
+
+def _swap_references(replaced: dict, targets) -> list:
+    """
+    Подменить старые имена на новые во всех полях реестра (один файл бывает
+    у нескольких полей: Product.image = первое фото) и пересчитать
+    кадрирование уменьшенных картинок. Вызывать внутри transaction.atomic().
+    """
+    changed = []
+    for model, field in targets:
+        rows = list(
+            model._base_manager.select_for_update()
+            .filter(**{f"{field.name}__in": list(replaced)})
+        )
+        if not rows:
+            continue
+        ratio_names = [
+            name for name in getattr(model, "ratio_fields", [])
+            if model._meta.get_field(name).image_field == field.name
+        ]
+        for obj in rows:
+            result = replaced[getattr(obj, field.name).name]
+            crops = _rescaled_crops(obj, field.name, result.scale) if result.scale != 1 else {}
+            setattr(obj, field.name, result.new_name)
+            for name, value in crops.items():
+                setattr(obj, name, value)
+            changed.append((model, obj, field.name, result))
+        model._base_manager.bulk_update(rows, [field.name, *ratio_names])
+    return changed
+
+
+def _unreferenced(names, targets) -> set:
+    """Из names — файлы, на которые не ссылается ни одно поле реестра."""
+    names = set(names)
+    for model, field in targets:
+        if not names:
+            break
+        names -= set(
+            model._base_manager.filter(**{f"{field.name}__in": list(names)})
+            .values_list(field.name, flat=True)
+        )
+    return names
+
+
+def _checkpoint(name: str, key: str, restart: bool) -> RecompressCheckpoint:
+    checkpoint = RecompressCheckpoint.objects.filter(pk=name).first()
+    if checkpoint is None or restart or checkpoint.settings_key != key:
+        checkpoint = RecompressCheckpoint(name=name, settings_key=key)
+    return checkpoint
+
+
+def recompress(workers=None, batch_size=BATCH_SIZE, dry_run=False, min_saving=MIN_SAVING,
+               restart=False, delete_originals=None, log=logger.info) -> dict:
+    """
+    Пройти все ImageField пачками по pk. Возвращает итоги:
+    files — просмотрено, replaced — заменено (или заменилось бы при dry_run),
+    before/after — байты заменённых файлов и их замен (after — записано),
+    freed — байты удалённых оригиналов, errors — не удалось прочитать/сжать.
+    delete_originals=None — как в IMAGEOPS_DELETE_ORIGINALS.
+    """
+    from .signals import image_processed
+
+    if delete_originals is None:
+        delete_originals = getattr(settings, "IMAGEOPS_DELETE_ORIGINALS", False)
+    targets = registry.all_fields()
+    totals = {"files": 0, "replaced": 0, "before": 0, "after": 0, "freed": 0, "errors": 0}
+    seen = set()  # один файл на несколько строк/полей — жмём один раз
+
+    # дочерние процессы не трогают БД: унаследованное соединение им не нужно
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for model, field in targets:
+            label = f"{model._meta.label}.{field.name}"
+            if not isinstance(model._meta.pk, models.IntegerField):
+                log(f"{label}: пропуск — чекпоинт умеет только целочисленный pk")
+                continue
+            kwargs = registry.policy(model, field.name)
+            checkpoint = _checkpoint(label, settings_key(kwargs), restart)
+            position = checkpoint.position
+            work = partial(recompress_file, model._meta.label, field.name, kwargs, min_saving, dry_run)
+            while True:
+                rows = list(
+                    model._base_manager.filter(pk__gt=position)
+                    .exclude(**{field.name: ""})
+                    .order_by("pk")
+                    .values_list("pk", field.name)[:batch_size]
+                )
+                if not rows:
+                    break
+                position = rows[-1][0]
+                names = [n for n in dict.fromkeys(n for _, n in rows) if n and n not in seen]
+                seen.update(names)
+                if not names:
+                    continue
+                results = list(pool.map(work, names))
+
+                for r in results:
+                    if r.error:
+                        logger.warning("imageops recompress %s: %s", r.name, r.error)
+                replaced = {r.name: r for r in results if r.replace}
+                seen.update(r.new_name for r in replaced.values())
+                before = sum(r.before for r in replaced.values())
+                written = sum(r.after for r in replaced.values())
+                totals["files"] += len(names)
+                totals["errors"] += sum(1 for r in results if r.error)
+                totals["replaced"] += len(replaced)
+                totals["before"] += before
+                totals["after"] += written
+                if dry_run:
+                    log(f"{label}: pk ≤ {position}, файлов {len(names)}, заменилось бы {len(replaced)}, "
+                        f"{before / 2**20:.1f} → {written / 2**20:.1f} МБ")
+                    continue
+
+                try:
+                    with transaction.atomic():
+                        changed = _swap_references(replaced, targets) if replaced else []
+                        checkpoint.position = position
+                        checkpoint.files += len(replaced)
+                        checkpoint.bytes_written += written
+                        checkpoint.save()
+                except Exception:
+                    for r in replaced.values():
+                        field.storage.delete(r.new_name)
+                    raise
+                freed = _after_commit(field.storage, replaced, changed, image_processed,
+                                      targets if delete_originals else None)
+                if freed:
+                    checkpoint.bytes_freed += freed
+                    checkpoint.save(update_fields=["bytes_freed", "updated_at"])
+                totals["freed"] += freed
+                log(f"{label}: pk ≤ {position}, файлов {len(names)}, заменено {len(replaced)}, "
+                    f"записано {written / 2**20:.1f} МБ, освобождено {freed / 2**20:.1f} МБ")
+            if not dry_run and checkpoint.position != position:  # хвост без новых файлов
+                checkpoint.position = position
+                checkpoint.save()
+    return totals
+
+
+def _after_commit(storage, replaced: dict, changed: list, signal, targets=None) -> int:
+    """
+    Убрать ненужные новые файлы, а при targets — и оригиналы, на которые
+    больше никто из targets не ссылается. Возвращает освобождённые байты.
+    """
+    referenced = {result.name for _model, _obj, _field, result in changed}
+    for result in replaced.values():
+        if result.name not in referenced:  # строку успели поменять — результат никому не нужен
+            storage.delete(result.new_name)
+    freed = 0
+    if targets is not None and referenced:
+        for name in _unreferenced(referenced, targets):
+            storage.delete(name)
+            freed += replaced[name].before
+    for model, obj, field_name, result in changed:
+        signal.send(
+            sender=model, instance=obj, field_name=field_name,
+            old_name=result.name, new_name=result.new_name,
+        )
+    return freed
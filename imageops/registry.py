@@ -0,0 +1,93 @@
+"""
+Какие ImageField обрабатывает imageops и с какими параметрами.
+
+Реестр строится один раз в ImageOpsConfig.ready(): все ImageField
+установленных моделей, кроме выключенных в IMAGEOPS_FIELDS. Сигналы
+подключаются только к этим моделям — сохранение заказа или сессии
+imageops не трогает.
+
+    IMAGEOPS_FIELDS = {
+        "shop.ProductPhoto.image": {"max_dims": (2400, 2400), "quality": 85},
+        "shop.HomePageSettings": {"format": "webp"},    # все поля модели
+        "accounts.Profile.avatar": {"skip": True},
+    }
+
+Параметры поля: max_dims, quality, format ("webp" или "original"),
+strip_exif, skip. Чего нет — берётся из IMAGEOPS_MAX_DIMS / IMAGEOPS_QUALITY /
+IMAGEOPS_FORCE_WEBP / IMAGEOPS_STRIP_EXIF в момент сжатия.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
+
+OPTIONS = {"max_dims", "quality", "format", "strip_exif", "skip"}
+FORMATS = {"webp": True, "original": False}
+
+# модель -> {имя поля: переопределения из IMAGEOPS_FIELDS}
+_fields: dict = {}
+
+
+def _declared() -> dict:
+    """IMAGEOPS_FIELDS с проверкой ключей: опечатка должна падать при старте, а не молча сжимать."""
+    declared = {}
+    for key, options in getattr(settings, "IMAGEOPS_FIELDS", {}).items():
+        unknown = set(options) - OPTIONS
+        if unknown:
+            raise ImproperlyConfigured(f"IMAGEOPS_FIELDS[{key!r}]: неизвестные параметры {sorted(unknown)}")
+        if options.get("format", "original") not in FORMATS:
+            raise ImproperlyConfigured(f"IMAGEOPS_FIELDS[{key!r}]: format — одно из {sorted(FORMATS)}")
+        app_label, _, rest = key.partition(".")
+        model_name, _, field_name = rest.partition(".")
+        try:
+            model = apps.get_model(app_label, model_name)
+            if field_name and not isinstance(model._meta.get_field(field_name), models.ImageField):
+                raise ImproperlyConfigured(f"IMAGEOPS_FIELDS[{key!r}]: это не ImageField")
+        except (LookupError, ValueError, FieldDoesNotExist):
+            raise ImproperlyConfigured(f"IMAGEOPS_FIELDS[{key!r}]: нет такой модели или поля")
+        declared[(model, field_name)] = options
+    return declared
+
+
+def build() -> dict:
+    declared = _declared()
+    _fields.clear()
+    for model in apps.get_models():
+        if model._meta.proxy:
+            continue
+        for field in model._meta.fields:
+            if not isinstance(field, models.ImageField):
+                continue
+            options = {**declared.get((model, ""), {}), **declared.get((model, field.name), {})}
+            if options.pop("skip", False):
+                continue
+            _fields.setdefault(model, {})[field.name] = options
+    return _fields
+
+
+def registered_models() -> list:
+    return list(_fields)
+
+
+def managed_fields(model) -> list:
+    """Имена обрабатываемых полей модели ([] — модель imageops не касается)."""
+    return list(_fields.get(model, ()))
+
+
+def all_fields() -> list:
+    """(модель, поле) для всех обрабатываемых ImageField."""
+    return [(model, model._meta.get_field(name)) for model, names in _fields.items() for name in names]
+
+
+def policy(model, field_name) -> dict:
+    """Аргументы compress_image для поля: переопределения поверх текущих IMAGEOPS_*."""
+    options = _fields.get(model, {}).get(field_name, {})
+    force_webp = getattr(settings, "IMAGEOPS_FORCE_WEBP", False)
+    if "format" in options:
+        force_webp = FORMATS[options["format"]]
+    return {
+        "max_dims": tuple(options.get("max_dims", getattr(settings, "IMAGEOPS_MAX_DIMS", (1600, 1600)))),
+        "quality": options.get("quality", getattr(settings, "IMAGEOPS_QUALITY", 82)),
+        "force_webp": force_webp,
+        "strip_exif": options.get("strip_exif", getattr(settings, "IMAGEOPS_STRIP_EXIF", True)),
+    }
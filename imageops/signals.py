@@ -1,9 +1,13 @@
-from django.db.models.signals import pre_save
-from django.dispatch import receiver
-from django.db import models
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver, Signal
 from django.conf import settings
+from django.test.signals import setting_changed
+from . import registry
 from .utils import compress_image
 
+# Фоновый воркер подменил файл: sender=модель, instance, field_name, old_name, new_name
+image_processed = Signal()
+
 
 def _should_process(file_obj, only_on_change=True):
     if not file_obj:
@@ -15,26 +19,68 @@ def _should_process(file_obj, only_on_change=True):
     return True
 
 
-@receiver(pre_save)
-def imageops_on_any_model(sender, instance, **kwargs):
+def imageops_on_save(sender, instance, **kwargs):
     if not getattr(settings, "IMAGEOPS_ENABLE", True):
         return
-    for field in instance._meta.fields:
-        if not isinstance(field, models.ImageField):
-            continue
-        if "imageops:skip" in (field.help_text or ""):
-            continue
-        file_obj = getattr(instance, field.name, None)
+    is_async = getattr(settings, "IMAGEOPS_ASYNC", False)
+    for field_name in registry.managed_fields(sender):
+        file_obj = getattr(instance, field_name, None)
         if not _should_process(file_obj, getattr(settings, "IMAGEOPS_ONLY_ON_CHANGE", True)):
             continue
+        if is_async:
+            # оригинал сохранится как есть, сжатие — в imageops_worker (см. post_save ниже)
+            pending = instance.__dict__.setdefault("_imageops_pending", [])
+            pending.append(field_name)
+            continue
         try:
             new_file = compress_image(
                 file_obj.file if hasattr(file_obj, "file") else file_obj,
-                max_dims=getattr(settings, "IMAGEOPS_MAX_DIMS", (1600, 1600)),
-                quality=getattr(settings, "IMAGEOPS_QUALITY", 82),
-                force_webp=getattr(settings, "IMAGEOPS_FORCE_WEBP", False),
-                strip_exif=getattr(settings, "IMAGEOPS_STRIP_EXIF", True),
+                **registry.policy(sender, field_name),
             )
-            setattr(instance, field.name, new_file)
+            setattr(instance, field_name, new_file)
+            instance.__dict__.setdefault("_imageops_compressed", []).append(field_name)
         except Exception:
-            continue
\ No newline at end of file
+            continue
+
+
+def imageops_enqueue(sender, instance, **kwargs):
+    pending = instance.__dict__.pop("_imageops_pending", None)
+    if pending:
+        from .jobs import enqueue
+        for field_name in pending:
+            enqueue(instance, field_name)
+
+    # синхронный режим: файл уже сжат и сохранён — режем варианты для srcset
+    compressed = instance.__dict__.pop("_imageops_compressed", None)
+    if compressed:
+        from .variants import build_variants_safe
+        for field_name in compressed:
+            file_obj = getattr(instance, field_name)
+            build_variants_safe(file_obj.name, file_obj.storage)
+
+
+_connected = []
+
+
+def connect() -> None:
+    """Подписаться на сохранение только тех моделей, где есть обрабатываемые ImageField."""
+    disconnect()
+    for model in registry.registered_models():
+        pre_save.connect(imageops_on_save, sender=model)
+        post_save.connect(imageops_enqueue, sender=model)
+        _connected.append(model)
+
+
+def disconnect() -> None:
+    while _connected:
+        model = _connected.pop()
+        pre_save.disconnect(imageops_on_save, sender=model)
+        post_save.disconnect(imageops_enqueue, sender=model)
+
+
+@receiver(setting_changed)
+def rebuild_registry(setting, **kwargs):
+    # override_settings(IMAGEOPS_FIELDS=...) в тестах
+    if setting == "IMAGEOPS_FIELDS":
+        registry.build()
+        connect()
@@ -0,0 +1,48 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from ..variants import FORMATS, get_manifest, name_from_url
+
+register = template.Library()
+
+
+def _srcset(items, storage):
+    return ", ".join(f"{storage.url(name)} {w}w" for w, name in items)
+
+
+@register.simple_tag
+def responsive_image(src, alt="", sizes="100vw", **attrs):
+    """
+    <picture> по манифесту imageops.variants:
+        {% responsive_image p.image alt=p.name sizes="(max-width: 767px) 50vw, 25vw" %}
+    src — поле картинки (FieldFile) или URL из MEDIA_URL (например, миниатюра).
+    Если вариантов ещё нет — обычный <img>.
+    """
+    if not src:
+        return ""
+    if hasattr(src, "url"):
+        url, name, storage = src.url, src.name, src.storage
+    else:
+        url, name, storage = str(src), name_from_url(str(src)), default_storage
+
+    attrs.setdefault("loading", "lazy")
+    extra = format_html_join("", ' {}="{}"', attrs.items())
+    manifest = get_manifest(name, storage) if name else None
+    if not manifest or not manifest.get("variants"):
+        return format_html('<img src="{}" alt="{}"{}>', url, alt, extra)
+
+    variants = manifest["variants"]
+    original = [manifest["width"], name]
+    sources = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (FORMATS[fmt][2], _srcset(items, storage), sizes)
+            for fmt, items in variants.items() if fmt != "jpeg" and fmt in FORMATS
+        ),
+    )
+    fallback = _srcset(variants.get("jpeg", []) + [original], storage)
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        sources, url, fallback, sizes, alt, extra,
+    )
@@ -1,3 +1,129 @@
-from django.test import TestCase
+"""
+Микробенчмарки compress_image: размер результата и время на мегапиксель
+(пороги с большим запасом — ловят только порядок, не шум). И реестр полей.
 
-# Create your tests here.
+    python manage.py test imageops
+"""
+import io
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from PIL import ExifTags, Image, ImageDraw
+
+from . import registry, signals
+from .utils import ImageTooLarge, compress_image
+
+
+def _source(size, fmt="JPEG", mode="RGB"):
+    img = Image.new(mode, size, (200, 170, 140, 255)[:len(mode)])
+    draw = ImageDraw.Draw(img)
+    for x in range(0, size[0], 40):  # детали, чтобы кодеку было что сжимать
+        draw.line((x, 0, size[0] - x, size[1]), fill=(30, 60, 90, 255)[:len(mode)], width=5)
+    buf = io.BytesIO()
+    img.save(buf, fmt, **({"quality": 95} if fmt == "JPEG" else {}))
+    buf.name = f"source.{fmt.lower()}"
+    buf.seek(0)
+    return buf
+
+
+class CompressImageBenchmarks(SimpleTestCase):
+    MAX_DIMS = (1800, 1800)
+
+    def bench(self, size, fmt="JPEG", mode="RGB", ms_per_megapixel=400):
+        source = _source(size, fmt, mode)
+        source_bytes = len(source.getvalue())
+        best, out = float("inf"), None
+        for _ in range(3):
+            source.seek(0)
+            started = time.perf_counter()
+            out = compress_image(source, max_dims=self.MAX_DIMS, quality=82)
+            best = min(best, time.perf_counter() - started)
+
+        megapixels = size[0] * size[1] / 1e6
+        per_mp = best * 1000 / megapixels
+        self.assertLess(
+            per_mp, ms_per_megapixel,
+            f"{size[0]}x{size[1]} {fmt}: {per_mp:.0f} мс/Мп при пороге {ms_per_megapixel}",
+        )
+        result = Image.open(out)
+        self.assertLessEqual(max(result.size), max(self.MAX_DIMS))
+        return out, result, source_bytes
+
+    def test_large_jpeg(self):
+        out, result, source_bytes = self.bench((4000, 3000))
+        self.assertEqual(result.format, "JPEG")
+        self.assertLess(out.size, source_bytes)
+
+    def test_small_jpeg_is_not_upscaled(self):
+        _out, result, _ = self.bench((800, 600))
+        self.assertEqual(result.size, (800, 600))
+
+    def test_png_with_alpha_becomes_webp(self):
+        out, result, _ = self.bench((2400, 1600), fmt="PNG", mode="RGBA", ms_per_megapixel=1500)
+        self.assertEqual(result.format, "WEBP")
+        self.assertTrue(out.name.endswith(".webp"))
+
+    def test_exif_rotation_survives_draft_decoding(self):
+        img = Image.new("RGB", (4000, 3000), (120, 90, 60))
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6  # снято «боком»: показывать повёрнутым на 90°
+        source = io.BytesIO()
+        img.save(source, "JPEG", exif=exif)
+        source.name = "phone.jpg"
+        source.seek(0)
+        result = Image.open(compress_image(source, max_dims=self.MAX_DIMS))
+        self.assertEqual(result.size, (1350, 1800))
+
+    def test_pixel_budget(self):
+        with self.settings(IMAGEOPS_MAX_PIXELS=1_000_000), self.assertRaises(ImageTooLarge):
+            compress_image(_source((2000, 1000), fmt="PNG"), max_dims=self.MAX_DIMS)
+        # JPEG декодируется уменьшенным (4000x3000 → 1000x750), в бюджет укладывается
+        with self.settings(IMAGEOPS_MAX_PIXELS=1_000_000):
+            compress_image(_source((4000, 3000)), max_dims=(900, 900))
+
+    def test_strip_exif(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Make] = "Phone"
+        exif[ExifTags.Base.Orientation] = 6
+        for strip, fmt in ((True, "JPEG"), (False, "JPEG"), (False, "PNG")):
+            source = io.BytesIO()
+            Image.new("RGBA" if fmt == "PNG" else "RGB", (400, 300)).save(source, fmt, exif=exif)
+            source.name = f"phone.{fmt.lower()}"
+            source.seek(0)
+            with self.subTest(strip=strip, fmt=fmt):
+                result = Image.open(compress_image(source, max_dims=self.MAX_DIMS, strip_exif=strip))
+                kept = result.getexif()
+                self.assertEqual(kept.get(ExifTags.Base.Make), None if strip else "Phone")
+                self.assertNotIn(ExifTags.Base.Orientation, kept)  # поворот уже применён к пикселям
+                self.assertEqual(result.size, (300, 400))
+
+
+class RegistryTests(SimpleTestCase):
+    def test_signals_only_for_models_with_image_fields(self):
+        from django.contrib.auth.models import User
+        from django.db.models.signals import pre_save
+
+        self.assertTrue(registry.registered_models())
+        self.assertNotIn(User, registry.registered_models())
+        # disconnect() отвечает, был ли приёмник подключён (у User — не был, ничего не ломаем)
+        self.assertFalse(pre_save.disconnect(signals.imageops_on_save, sender=User))
+
+    def test_field_policy_and_skip(self):
+        model, field = registry.all_fields()[0]
+        key = f"{model._meta.label}.{field.name}"
+        with self.settings(IMAGEOPS_QUALITY=70, IMAGEOPS_FIELDS={key: {"quality": 88, "format": "webp"}}):
+            policy = registry.policy(model, field.name)
+            self.assertEqual((policy["quality"], policy["force_webp"]), (88, True))
+        with self.settings(IMAGEOPS_FIELDS={key: {"skip": True}}):
+            self.assertNotIn(field.name, registry.managed_fields(model))
+        self.assertIn(field.name, registry.managed_fields(model))
+
+    def test_typos_fail_loudly(self):
+        for fields in ({"nope.Model.image": {}}, {"imageops.ImageJob.field_name": {}}):
+            with self.assertRaises(ImproperlyConfigured), self.settings(IMAGEOPS_FIELDS=fields):
+                pass
+        model, field = registry.all_fields()[0]
+        with self.assertRaises(ImproperlyConfigured):
+            with self.settings(IMAGEOPS_FIELDS={f"{model._meta.label}.{field.name}": {"qualty": 80}}):
+                pass
@@ -1,26 +1,69 @@
 import io
-from PIL import Image, ImageOps
+import tempfile
+import time
+from PIL import ExifTags, Image, ImageOps
 from django.conf import settings
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadedfile import UploadedFile
+from core.metrics import Histogram
+
+COMPRESS_SECONDS = Histogram("imageops_compress_duration_seconds", "Время compress_image", ("format",))
+COMPRESS_BYTES = Histogram(
+    "imageops_output_bytes", "Размер результата compress_image", ("format",),
+    buckets=(50_000, 100_000, 200_000, 500_000, 1_000_000, 2_000_000, 5_000_000),
+)
+
+SPOOL_MAX = 4 * 2**20  # результат крупнее — из памяти во временный файл
+ROTATED = {5, 6, 7, 8}  # EXIF Orientation с поворотом на 90°: ширина и высота меняются местами
+
+
+class ImageTooLarge(ValueError):
+    """Картинка (после уменьшенного декодирования) больше IMAGEOPS_MAX_PIXELS."""
+
+
+class _Spool(tempfile.SpooledTemporaryFile):
+    # Pillow пишет напрямую в fileno(), если он есть, а fileno() сбрасывает спул на диск
+    def fileno(self):
+        if not self._rolled:
+            raise io.UnsupportedOperation("fileno")
+        return super().fileno()
+
+
+def _draft_size(size, box, rotated):
+    """Размер после thumbnail(box) в ориентации исходника — меньше него draft не уменьшит."""
+    w, h = size
+    box_w, box_h = (box[1], box[0]) if rotated else box
+    ratio = min(box_w / w, box_h / h, 1)
+    return max(1, int(w * ratio)), max(1, int(h * ratio))
 
 
 def compress_image(file,
                    max_dims=None,
                    quality=None,
                    force_webp=None,
-                   strip_exif=True):
+                   strip_exif=True,
+                   draft=True):
     max_w, max_h = max_dims or getattr(settings, "IMAGEOPS_MAX_DIMS", (1600, 1600))
     quality = quality or getattr(settings, "IMAGEOPS_QUALITY", 82)
     force_webp = (getattr(settings, "IMAGEOPS_FORCE_WEBP", False)
                   if force_webp is None else force_webp)
+    max_pixels = getattr(settings, "IMAGEOPS_MAX_PIXELS", 40_000_000)
 
+    started = time.perf_counter()
     img = Image.open(file)
-    img = ImageOps.exif_transpose(img)
+    if draft:
+        # JPEG декодируется сразу в 1/2, 1/4 или 1/8 масштаба, но не меньше итогового размера
+        rotated = img.getexif().get(ExifTags.Base.Orientation) in ROTATED
+        img.draft(None, _draft_size(img.size, (max_w, max_h), rotated))
+    if img.width * img.height > max_pixels:
+        raise ImageTooLarge(f"{img.width}x{img.height} больше IMAGEOPS_MAX_PIXELS={max_pixels}")
+    ImageOps.exif_transpose(img, in_place=True)  # без копии всего кадра
+    # метаданные (камера, дата, GPS) переносим только по просьбе; Orientation уже снят
+    exif = None if strip_exif else img.getexif()
     img.thumbnail((max_w, max_h), Image.Resampling.LANCZOS)
 
-    fmt = (getattr(img, "format", "JPEG") or "JPEG").upper()
-    if fmt == "JPG": fmt = "JPEG"
-    if fmt not in {"JPEG", "PNG", "WEBP"}: fmt = "JPEG"
+    # формат исходника не сохраняем (копия из exif_transpose была без format):
+    # без альфы — JPEG, с альфой — WEBP
+    fmt = "WEBP" if force_webp else "JPEG"
     has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
     if fmt == "JPEG" and has_alpha:
         fmt = "WEBP"
@@ -29,17 +72,21 @@ def compress_image(file,
     elif fmt in ("WEBP", "PNG") and img.mode == "P":
         img = img.convert("RGBA")
 
-    buf = io.BytesIO()
+    spool = _Spool(max_size=SPOOL_MAX)
     params = {"quality": quality, "optimize": True}
     if fmt == "WEBP":
         params["method"] = 6
-    img.save(buf, format=fmt, **params)
-    data = buf.getvalue()
+    if exif:
+        params["exif"] = exif
+    img.save(spool, format=fmt, **params)
+    size = spool.tell()
+    spool.seek(0)
+    COMPRESS_SECONDS.observe(time.perf_counter() - started, format=fmt)
+    COMPRESS_BYTES.observe(size, format=fmt)
 
     ext = "jpg" if fmt == "JPEG" else fmt.lower()
     content_type = f"image/{'jpeg' if ext == 'jpg' else ext}"
-    out = InMemoryUploadedFile(io.BytesIO(data), None,
-                               (file.name.rsplit(".", 1)[0] + f".{ext}"),
-                               content_type, len(data), None)
+    out = UploadedFile(spool, (file.name.rsplit(".", 1)[0] + f".{ext}"),
+                       content_type, size, None)
     setattr(out, "_imageops_processed", True)
     return out
@@ -0,0 +1,138 @@
+"""
+Адаптивные варианты картинок для srcset.
+
+Для файла `products/photos/x.jpg` рядом в хранилище появляется
+`variants/products/photos/x.jpg/` с лесенкой ширин в нескольких форматах
+и manifest.json. Шаблонный тег {% responsive_image %} (templatetags/imageops.py)
+читает манифест и рисует <picture>.
+"""
+import io
+import json
+import logging
+import posixpath
+from urllib.parse import unquote
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "variants"
+MANIFEST_NAME = "manifest.json"
+MISSING = "-"  # в кэше: манифеста нет (не ходим в хранилище на каждом рендере)
+
+FORMATS = {
+    # формат -> (PIL-формат, расширение, MIME, параметры кодека)
+    "avif": ("AVIF", "avif", "image/avif", {"quality": 55}),
+    "webp": ("WEBP", "webp", "image/webp", {"method": 4}),
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"optimize": True, "progressive": True}),
+}
+
+
+def _settings():
+    return {
+        "enable": getattr(settings, "IMAGEOPS_VARIANTS_ENABLE", True),
+        "widths": sorted(getattr(settings, "IMAGEOPS_VARIANT_WIDTHS", (320, 640, 960, 1280))),
+        "formats": getattr(settings, "IMAGEOPS_VARIANT_FORMATS", ("avif", "webp", "jpeg")),
+        "quality": getattr(settings, "IMAGEOPS_VARIANT_QUALITY", 80),
+    }
+
+
+def supported_formats(wanted) -> list:
+    """Форматы, которые умеет сохранять текущий Pillow (AVIF — только с плагином)."""
+    Image.init()
+    return [f for f in wanted if f in FORMATS and FORMATS[f][0] in Image.SAVE]
+
+
+def variants_dir(name: str) -> str:
+    return posixpath.join(VARIANTS_DIR, name)
+
+
+def _cache_key(name: str) -> str:
+    return f"imageops:manifest:{name}"
+
+
+def name_from_url(url: str) -> str | None:
+    """URL из MEDIA_URL -> имя файла в хранилище."""
+    media_url = settings.MEDIA_URL or "/media/"
+    if not url or not url.startswith(media_url):
+        return None
+    return unquote(url[len(media_url):].split("?", 1)[0])
+
+
+def build_variants(name: str, storage=None) -> dict | None:
+    """Нарезать лесенку ширин/форматов для файла и записать манифест."""
+    conf = _settings()
+    storage = storage or default_storage
+    if not conf["enable"] or not name:
+        return None
+
+    formats = supported_formats(conf["formats"])
+    with storage.open(name, "rb") as fh:
+        with Image.open(fh) as src:
+            img = ImageOps.exif_transpose(src)
+            img.load()
+    width, height = img.size
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha else "RGB")
+
+    base = variants_dir(name)
+    manifest = {"source": name, "width": width, "height": height, "variants": {}}
+    for w in [w for w in conf["widths"] if w < width]:
+        h = max(1, round(height * w / width))
+        resized = img.resize((w, h), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            if fmt == "jpeg" and has_alpha:
+                continue  # фолбэк для прозрачных — оригинал
+            pil_fmt, ext, _mime, params = FORMATS[fmt]
+            buf = io.BytesIO()
+            resized.save(buf, format=pil_fmt, **{"quality": conf["quality"], **params})
+            target = posixpath.join(base, f"{w}w.{ext}")
+            if storage.exists(target):
+                storage.delete(target)
+            saved = storage.save(target, ContentFile(buf.getvalue()))
+            manifest["variants"].setdefault(fmt, []).append([w, saved])
+
+    manifest_name = posixpath.join(base, MANIFEST_NAME)
+    if storage.exists(manifest_name):
+        storage.delete(manifest_name)
+    storage.save(manifest_name, ContentFile(json.dumps(manifest).encode()))
+    cache.set(_cache_key(name), manifest, None)
+    return manifest
+
+
+def get_manifest(name: str, storage=None) -> dict | None:
+    """Манифест из кэша; при промахе — из хранилища."""
+    if not name:
+        return None
+    key = _cache_key(name)
+    manifest = cache.get(key)
+    if manifest is not None:
+        return None if manifest == MISSING else manifest
+
+    storage = storage or default_storage
+    manifest_name = posixpath.join(variants_dir(name), MANIFEST_NAME)
+    try:
+        with storage.open(manifest_name, "rb") as fh:
+            manifest = json.loads(fh.read())
+    except (OSError, ValueError):
+        cache.set(key, MISSING, 60)
+        return None
+    cache.set(key, manifest, None)
+    return manifest
+
+
+def build_variants_safe(name: str, storage=None) -> dict | None:
+    try:
+        return build_variants(name, storage)
+    except Exception:
+        logger.exception("imageops: variants failed for %s", name)
+        return None
+
+
+def ensure_variants(name: str, storage=None) -> dict | None:
+    """Нарезать варианты, только если манифеста ещё нет."""
+    return get_manifest(name, storage) or build_variants_safe(name, storage)
@@ -17,6 +17,10 @@ GHCR_TOKEN="${GHCR_TOKEN:-}"
 # Поддержка: ./deploy.sh <IMAGE_TAG_OR_SHA>
 if [[ -n "${1:-}" ]]; then VERSION="$1"; fi
 VERSION="${VERSION:-latest}"
+# Версия контента (ETag и кэш страниц): тег образа, для latest — коммит
+if [[ -z "${SHOP_CONTENT_VERSION:-}" ]]; then
+  SHOP_CONTENT_VERSION="$VERSION"
+fi
 
 log(){  echo -e "\033[1;36m$1\033[0m"; }
 ok(){   echo -e "\033[1;32m$1\033[0m"; }
@@ -33,6 +37,10 @@ log "[1/9] Git: fetch + hard reset → origin/${BRANCH}"
 git fetch --all
 git checkout -q "${BRANCH}"
 git reset --hard "origin/${BRANCH}"
+if [[ "$SHOP_CONTENT_VERSION" == "latest" ]]; then
+  SHOP_CONTENT_VERSION="$(git rev-parse --short HEAD)"
+fi
+export SHOP_CONTENT_VERSION
 
 # ===============================
 # 2) Логин в реестр (если нужен)
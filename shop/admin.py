@@ -3,15 +3,17 @@ from decimal import Decimal
 
 from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.db import models
-from django.db.models import F, Sum, Value, DecimalField
+from django.db.models import Count, F, Sum, Value, DecimalField
 from django.db.models.expressions import ExpressionWrapper
 from django.db.models.functions import Coalesce, Cast
-from django.forms import Textarea
+from django.forms import BaseInlineFormSet, Textarea
 from django.http import JsonResponse
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse, path
 from django.utils.html import format_html
+from django.utils.http import urlencode
 
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
 from image_cropping import ImageCroppingMixin
@@ -29,15 +31,74 @@ COMMON = "width:25rem !important; min-width:25rem !important; max-width:none !im
 NARROW = "width:8rem !important; min-width:8rem !important; max-width:8rem !important; text-align:right;"
 TEXTINPUT_MAX = 50
 TEXTAREA_MAX = 300
+CUSTOMER_ORDERS_INLINE = 20  # последних заказов в карточке клиента, остальные — по ссылке
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Автокомплит, который не ищет выбранное значение в БД, если форма уже
+    отдала объект (`loaded`, загружен select_related вместе со строкой).
+    Штатный виджет делает SELECT на каждую строку инлайна.
+    """
+    loaded = None
+
+    def optgroups(self, name, value, attr=None):
+        obj = self.loaded
+        if obj is None or [str(v) for v in value] != [str(obj.pk)]:
+            return super().optgroups(name, value, attr)
+        options = [] if self.is_required else [self.create_option(name, "", "", False, 0)]
+        label = self.choices.field.label_from_instance(obj)
+        options.append(self.create_option(name, obj.pk, label, True, len(options)))
+        return [(None, options, 0)]
+
+
+def _preload_autocomplete(form, name, obj) -> None:
+    widget = form.fields[name].widget
+    widget = getattr(widget, "widget", widget)  # внутри RelatedFieldWidgetWrapper
+    if isinstance(widget, LoadedAutocompleteSelect):
+        widget.loaded = obj
+
+
+class LoadedAutocompleteMixin:
+    """autocomplete_fields рисуются LoadedAutocompleteSelect."""
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if "widget" not in kwargs and db_field.name in self.get_autocomplete_fields(request):
+            kwargs["widget"] = LoadedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get("using"))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 # =====================================================================
 # ============================ КАТАЛОГ ================================
 # =====================================================================
 
+def _categories():
+    """Категории для выпадающих списков: str() читает родителя — берём его сразу."""
+    return Category.objects.select_related("parent")
+
+
+class CategoryListFilter(admin.RelatedFieldListFilter):
+    """Фильтр по категории без запроса на каждый пункт (str() — «Родитель — Имя»)."""
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        qs = _categories().order_by(*ordering) if ordering else _categories()
+        return [(c.pk, str(c)) for c in qs]
+
+
+class CategoryChoicesMixin:
+    """ForeignKey на Category в форме — со select_related родителя."""
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.related_model is Category and "queryset" not in kwargs:
+            kwargs["queryset"] = _categories()
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
 # --- Категории
 @admin.register(Category)
-class CategoryAdmin(ImageCroppingMixin, admin.ModelAdmin):
+class CategoryAdmin(CategoryChoicesMixin, ImageCroppingMixin, admin.ModelAdmin):
     list_display = ("name", "position", "parent", "banner_preview")
+    list_select_related = ("parent__parent",)  # str(родителя) — «Его родитель — Имя»; null FK сам не подтянется
     list_editable = ("position",)
     search_fields = ("name",)
     prepopulated_fields = {"slug": ("name",)}
@@ -92,12 +153,11 @@ class ProductPhotoInline(ImageCroppingMixin, admin.TabularInline):
     ordering = ("position", "id")
     min_num, max_num, validate_min, extra = 3, 3, True, 0
     verbose_name_plural = "Галерея товара (первое фото — обложка, всего 3)"
+    # extra не считаем по photos.count(): min_num/max_num и так добивают форму до трёх строк
 
-    def get_extra(self, request, obj=None, **kwargs):
-        if obj:
-            have = obj.photos.count()
-            return max(0, self.max_num - have)
-        return self.max_num
+    def get_queryset(self, request):
+        # str(фото) в заголовке строки берёт product.name
+        return super().get_queryset(request).select_related("product")
 
     def preview(self, obj):
         if obj and getattr(obj, "image", None):
@@ -150,10 +210,11 @@ class ProductAdminForm(forms.ModelForm):
 
 # --- Товары (с lookup JSON + автоподстановкой главного фото)
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(CategoryChoicesMixin, admin.ModelAdmin):
     form = ProductAdminForm
     list_display = ("name", "category", "price_byn", "is_new", "is_active")
-    list_filter = ("is_active", "is_new", "category")
+    list_select_related = ("category__parent",)  # str(категории) — «Родитель — Имя»
+    list_filter = ("is_active", "is_new", ("category", CategoryListFilter))
     search_fields = ("name", "slug", "id", "category__name")
     prepopulated_fields = {"slug": ("name",)}
     inlines = [ProductPhotoInline]
@@ -402,15 +463,25 @@ class DeliveryPageSettingsAdmin(ImageCroppingMixin, admin.ModelAdmin):
 # =====================================================================
 
 # --- Клиенты + история заказов (inline)
+class RecentOrdersFormSet(BaseInlineFormSet):
+    """Только последние CUSTOMER_ORDERS_INLINE заказов: история клиента не ограничена."""
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            self._queryset = super().get_queryset()[:CUSTOMER_ORDERS_INLINE]
+        return self._queryset
+
+
 class CustomerOrderInline(admin.TabularInline):
     model = Order
+    formset = RecentOrdersFormSet
     fk_name = "customer"
     extra = 0
     can_delete = False
     show_change_link = True
     ordering = ("-created_at",)
     verbose_name = "Заказ"
-    verbose_name_plural = "История заказов"
+    verbose_name_plural = f"История заказов (последние {CUSTOMER_ORDERS_INLINE}, все — по ссылке «Заказов» выше)"
 
     fields = ("number", "status_badge_inline", "email", "total_price_inline", "created_at")
     readonly_fields = ("number", "status_badge_inline", "email", "total_price_inline", "created_at")
@@ -436,11 +507,21 @@ class CustomerOrderInline(admin.TabularInline):
 class CustomerAdmin(admin.ModelAdmin):
     list_display = ("email", "name", "phone", "created_at", "orders_count")
     search_fields = ("email", "name", "phone")
-    readonly_fields = ("created_at",)
+    readonly_fields = ("created_at", "orders_link")
     inlines = [CustomerOrderInline]
 
-    def orders_count(self, obj): return obj.orders.count()
-    orders_count.short_description = "Заказов"
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(orders_total=Count("orders"))
+
+    @admin.display(description="Заказов", ordering="orders_total")
+    def orders_count(self, obj): return obj.orders_total
+
+    @admin.display(description="Заказов")
+    def orders_link(self, obj):
+        if not obj or not obj.pk:
+            return "—"
+        url = reverse("admin:shop_order_changelist") + "?" + urlencode({"customer__id__exact": obj.pk})
+        return format_html('<a href="{}">{} — открыть списком</a>', url, obj.orders_total)
 
 
 # --- Платёж (standalone admin)
@@ -525,6 +606,8 @@ class OrderAdminForm(forms.ModelForm):
                 self.fields[name].widget.attrs.update(style=TEXT_STYLE)
         if "customer" in self.fields:
             self.fields["customer"].widget.attrs.update(style=SELECT_STYLE)
+            if self.instance.customer_id:
+                _preload_autocomplete(self, "customer", self.instance.customer)
 
         if "delivery_provider" in self.fields:
             f = self.fields["delivery_provider"]
@@ -562,6 +645,12 @@ class OrderItemForm(forms.ModelForm):
         model = OrderItem
         fields = ("product", "qty", "price_byn")  # только редактируемые поля
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # товар строки уже загружен (select_related); неактивный автокомплит всё равно не покажет
+        if "product" in self.fields and self.instance.product_id and self.instance.product.is_active:
+            _preload_autocomplete(self, "product", self.instance.product)
+
     def clean(self):
         cleaned = super().clean()
         p = cleaned.get("product")
@@ -579,7 +668,7 @@ class OrderItemForm(forms.ModelForm):
         return obj
 
 
-class OrderItemInline(admin.TabularInline):
+class OrderItemInline(LoadedAutocompleteMixin, admin.TabularInline):
     model = OrderItem
     form = OrderItemForm
     fields = ("product", "qty", "price_byn", "line_total")
@@ -602,7 +691,7 @@ class OrderItemInline(admin.TabularInline):
 
 # --- Заказы (основная форма)
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LoadedAutocompleteMixin, admin.ModelAdmin):
     form = OrderAdminForm
 
     exclude = ("utm",)
@@ -639,6 +728,10 @@ class OrderAdmin(admin.ModelAdmin):
 
     inlines = [OrderItemInline]
 
+    def get_queryset(self, request):
+        # customer_*_plain и автокомплит клиента — без отдельных запросов
+        return super().get_queryset(request).select_related("customer")
+
     # утилита для read-only «plain»-полей
     @staticmethod
     def _box(val: str):
@@ -0,0 +1,115 @@
+"""
+Кэш витрины на счётчиках поколений.
+
+Каждая группа данных («menu», «catalog», …) имеет номер поколения в общем
+кэше. Значения кэшируются под ключом с текущим поколением, поэтому
+инвалидация — это просто смена поколения (см. shop/signals.py):
+старые записи больше не читаются и доживают до своего TIMEOUT.
+
+Поколение — не счётчик с нуля, а метка времени в наносекундах (строго
+больше предыдущей). Файловый кэш вытесняет ключи и не умеет атомарный
+incr: счётчик, начатый заново с 1, совпал бы с номерами старых записей и
+«оживил» их, а два одновременных incr дали бы одно значение. Метки не
+повторяются: вытесненное поколение заменяется новой меткой, а из двух
+одновременных сбросов побеждает любой — оба значения новые.
+"""
+import time
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from core.metrics import Counter
+
+KEY_PREFIX = "shop"
+GENERATION_TIMEOUT = None  # счётчики живут бессрочно
+
+CACHE_REQUESTS = Counter(
+    "shop_cache_requests_total", "Обращения к кэшу: cache=data|page, result=hit|miss",
+    ("cache", "group", "result"),
+)
+
+
+def _gen_key(name: str) -> str:
+    return f"{KEY_PREFIX}:gen:{name}"
+
+
+def _mtime_key(name: str) -> str:
+    return f"{KEY_PREFIX}:mtime:{name}"
+
+
+def new_generation(current: int = 0) -> int:
+    """Новая метка поколения: не повторяет ни одну выданную раньше."""
+    return max(time.time_ns(), current + 1)
+
+
+def _start(key: str) -> int:
+    """Завести поколение для ключа, которого нет (первый запуск или вытеснен)."""
+    cache.add(key, new_generation(), GENERATION_TIMEOUT)
+    # add() атомарен не на всех бэкендах: перечитываем то, что победило
+    return cache.get(key) or new_generation()
+
+
+def get_generation(name: str) -> int:
+    """Текущее поколение группы."""
+    key = _gen_key(name)
+    return cache.get(key) or _start(key)
+
+
+def get_generations(*names: str) -> tuple:
+    """Поколения нескольких групп одним запросом к кэшу."""
+    keys = [_gen_key(n) for n in names]
+    found = cache.get_many(keys)
+    return tuple(found.get(k) or _start(k) for k in keys)
+
+
+def get_modified(*names: str) -> dict:
+    """Время (unix) последнего сброса групп; групп без отметки в ответе нет."""
+    found = cache.get_many([_mtime_key(n) for n in names])
+    return {n: found[_mtime_key(n)] for n in names if _mtime_key(n) in found}
+
+
+def set_modified(name: str, timestamp: float) -> None:
+    """Отметка времени для группы, если её ещё нет (холодный кэш)."""
+    cache.add(_mtime_key(name), timestamp, GENERATION_TIMEOUT)
+
+
+def set_generation(name: str, generation: int) -> None:
+    """Записать поколение, выданное new_generation()."""
+    cache.set(_mtime_key(name), time.time(), GENERATION_TIMEOUT)
+    cache.set(_gen_key(name), generation, GENERATION_TIMEOUT)
+
+
+def next_generation(name: str) -> int:
+    """Сменить поколение группы и вернуть новое значение."""
+    generation = new_generation(cache.get(_gen_key(name)) or 0)
+    set_generation(name, generation)
+    return generation
+
+
+def bump_generation(*names: str) -> None:
+    """Сбросить всё закэшированное для перечисленных групп."""
+    for name in names:
+        next_generation(name)
+
+
+def versioned_key(key: str, *groups: str) -> str:
+    """Ключ, который «устаревает» при сбросе любой из групп."""
+    gens = ".".join(str(g) for g in get_generations(*groups))
+    return f"{KEY_PREFIX}:{key}:{gens}"
+
+
+def cached(key: str, builder, *groups: str, timeout=DEFAULT_TIMEOUT):
+    """
+    Вернуть значение из кэша или построить через builder() и сохранить.
+    groups — группы поколений, от которых зависит значение.
+    """
+    full_key = versioned_key(key, *(groups or (key,)))
+    value = cache.get(full_key)
+    group = groups[0] if groups else key
+    if value is None:
+        CACHE_REQUESTS.inc(cache="data", group=group, result="miss")
+        value = builder()
+        cache.set(full_key, value, timeout)
+    else:
+        CACHE_REQUESTS.inc(cache="data", group=group, result="hit")
+    return value
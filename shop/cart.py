@@ -0,0 +1,224 @@
+"""
+Корзина без БД-сессии.
+
+Содержимое хранится компактной строкой «id:qty.id:qty» в подписанной
+cookie (SHOP_CART_STORAGE = "cookie") или в общем кэше под случайным
+ключом из cookie ("cache"). Режим "cache" — только с общим бэкендом без
+случайного вытеснения (Redis, Memcached, БД): файловый кэш чистит записи
+наугад, а locmem у каждого процесса свой, так что корзины молча терялись
+бы — с ними проект не стартует (check_storage()). Цены, названия и картинки
+берутся из price_map(ids): только товары корзины, по одному ключу общего
+кэша на товар и копией в памяти воркера до сброса группы «catalog». В итоге
++/- в мини-корзине не делает запросов к БД (один — на товары, которых ещё
+нет в кэше).
+
+Корзина старого формата в сессии ({"12": {"qty": 2}}) читается, пока не
+будет записана в новое хранилище; чтение убрать через релиз.
+"""
+import secrets
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signing import BadSignature
+
+from .cache import get_generation
+from .models import Product
+
+COOKIE_NAME = "cart"
+COOKIE_SALT = "shop.cart"
+MAX_QTY = 99
+MAX_LINES = 50  # чтобы cookie не разрасталась
+LEGACY_SESSION_KEY = "cart"  # корзина до переезда из сессии
+MISSING = "-"  # в кэше: товара нет или скрыт
+# бэкенды, где корзина в режиме "cache" может пропасть: свои у процесса или со случайной чисткой
+UNSAFE_BACKENDS = ("FileBasedCache", "LocMemCache", "DummyCache")
+
+
+def _settings():
+    return {
+        "storage": getattr(settings, "SHOP_CART_STORAGE", "cookie"),
+        "max_age": getattr(settings, "SHOP_CART_MAX_AGE", 60 * 60 * 24 * 30),
+    }
+
+
+def check_storage() -> None:
+    """Вызывается из ShopConfig.ready(): режим "cache" без общего кэша — ошибка при старте."""
+    storage = _settings()["storage"]
+    if storage not in ("cookie", "cache"):
+        raise ImproperlyConfigured(f'SHOP_CART_STORAGE: "cookie" или "cache", а не {storage!r}')
+    backend = settings.CACHES["default"]["BACKEND"].rsplit(".", 1)[-1]
+    if storage == "cache" and backend in UNSAFE_BACKENDS:
+        raise ImproperlyConfigured(
+            f'SHOP_CART_STORAGE = "cache" требует общего кэша (Redis, Memcached, БД), а не {backend}: '
+            "корзины будут пропадать"
+        )
+
+
+# --- карта цен ---
+
+def _load_prices(ids) -> dict:
+    found = {
+        p.id: {
+            "name": p.name,
+            "slug": p.slug,
+            "price": p.price_byn,
+            "image": (p.image.url if p.image else None),
+        }
+        for p in Product.objects.filter(is_active=True, pk__in=ids).only("id", "name", "slug", "price_byn", "image")
+    }
+    return {pk: found.get(pk) for pk in ids}
+
+
+def _price_key(gen, pk) -> str:
+    return f"shop:cart_price:{gen}:{pk}"
+
+
+_price_map = (None, {})  # (поколение «catalog», {id: данные или None}) — уже спрошенные товары
+
+
+def price_map(product_ids) -> dict:
+    """id -> {name, slug, price, image} для активных товаров из product_ids."""
+    global _price_map
+    gen = get_generation("catalog")
+    if _price_map[0] != gen:
+        _price_map = (gen, {})
+    known = _price_map[1]
+    missing = [pk for pk in dict.fromkeys(product_ids) if pk not in known]
+    if missing:
+        shared = cache.get_many([_price_key(gen, pk) for pk in missing])
+        found = {pk: shared[_price_key(gen, pk)] for pk in missing if _price_key(gen, pk) in shared}
+        rest = [pk for pk in missing if pk not in found]
+        if rest:
+            loaded = _load_prices(rest)
+            cache.set_many({_price_key(gen, pk): row or MISSING for pk, row in loaded.items()})
+            found.update(loaded)
+        known.update({pk: (None if row == MISSING else row) for pk, row in found.items()})
+    return {pk: known[pk] for pk in product_ids if known.get(pk)}
+
+
+def _legacy_lines(request) -> dict:
+    """Корзина из сессии старого формата; без cookie сессии сессию не трогаем (это запрос к БД)."""
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES or not hasattr(request, "session"):
+        return {}
+    old = request.session.get(LEGACY_SESSION_KEY)
+    if not isinstance(old, dict):
+        return {}
+    return loads(".".join(
+        f"{pid}:{row.get('qty', 0)}" for pid, row in old.items() if isinstance(row, dict)
+    ))
+
+
+# --- сериализация ---
+
+def dumps(lines: dict) -> str:
+    return ".".join(f"{pid}:{qty}" for pid, qty in lines.items())
+
+
+def loads(raw: str) -> dict:
+    lines = {}
+    for part in (raw or "").split("."):
+        pid, _, qty = part.partition(":")
+        if pid.isdigit() and qty.isdigit() and int(qty) > 0:
+            lines[int(pid)] = min(int(qty), MAX_QTY)
+        if len(lines) >= MAX_LINES:
+            break
+    return lines
+
+
+def _cache_key(token: str) -> str:
+    return f"shop:cart:{token}"
+
+
+class Cart:
+    """
+    Корзина текущего запроса. После изменений вызвать save(response):
+        cart = Cart(request)
+        cart.add(12, 2)
+        response = JsonResponse(...)
+        cart.save(response)
+    """
+
+    def __init__(self, request):
+        conf = _settings()
+        self.storage = conf["storage"]
+        self.max_age = conf["max_age"]
+        self.token = None
+        self.modified = False
+        self.legacy_session = None
+
+        try:
+            raw = request.get_signed_cookie(COOKIE_NAME, default="", salt=COOKIE_SALT)
+        except BadSignature:
+            raw = ""
+        if self.storage == "cache":
+            self.token = raw or None
+            raw = cache.get(_cache_key(raw), "") if raw else ""
+        self.lines = loads(raw)
+        if not raw:
+            self.lines = _legacy_lines(request)
+            if self.lines:
+                self.legacy_session = request.session
+                self.modified = True  # при первом save() переедет в новое хранилище
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def qty(self, pid: int) -> int:
+        return self.lines.get(pid, 0)
+
+    def set(self, pid: int, qty: int) -> None:
+        qty = min(qty, MAX_QTY)
+        if qty <= 0:
+            self.lines.pop(pid, None)
+        elif pid in self.lines or len(self.lines) < MAX_LINES:
+            self.lines[pid] = qty
+        self.modified = True
+
+    def add(self, pid: int, qty: int = 1) -> None:
+        self.set(pid, self.qty(pid) + qty)
+
+    def remove(self, pid: int) -> None:
+        self.set(pid, 0)
+
+    def clear(self) -> None:
+        self.lines = {}
+        self.modified = True
+
+    def rows(self) -> list:
+        """[(pid, данные из price_map, qty)] только по активным товарам."""
+        prices = price_map(self.lines)
+        return [(pid, prices[pid], qty) for pid, qty in self.lines.items() if pid in prices]
+
+    def totals(self):
+        """(сумма, кол-во штук)."""
+        total, count = Decimal(0), 0
+        for _pid, info, qty in self.rows():
+            total += info["price"] * qty
+            count += qty
+        return total, count
+
+    def save(self, response) -> None:
+        if not self.modified:
+            return
+        if self.legacy_session is not None:
+            self.legacy_session.pop(LEGACY_SESSION_KEY, None)
+        if not self.lines:
+            if self.token:
+                cache.delete(_cache_key(self.token))
+            response.delete_cookie(COOKIE_NAME)
+            return
+
+        value = dumps(self.lines)
+        if self.storage == "cache":
+            self.token = self.token or secrets.token_urlsafe(16)
+            cache.set(_cache_key(self.token), value, self.max_age)
+            value = self.token
+        response.set_signed_cookie(
+            COOKIE_NAME, value, salt=COOKIE_SALT,
+            max_age=self.max_age,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite="Lax",
+        )
@@ -0,0 +1,96 @@
+"""
+Условные GET (ETag / Last-Modified) для страниц витрины.
+
+Версия страницы — это поколения групп кэша, от которых она зависит
+(shop/cache.py), и время их последнего сброса; всё читается из кэша без
+запросов к БД. Если кэш холодный и отметки времени нет, она берётся из
+max(updated_at) моделей группы. Совпал If-None-Match / If-Modified-Since —
+отвечаем 304 ещё до view и шаблона. Ответы помечаются Cache-Control: no-cache —
+браузер хранит страницу, но каждый раз переспрашивает с If-None-Match.
+В ETag входит и CSRF-cookie посетителя: в HTML зашит токен от неё, и после
+смены cookie (вход, выход) 304 оставил бы в браузере форму со старым токеном.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .cache import get_generations, get_modified, set_modified
+from .signals import CACHE_GROUPS
+
+
+def _group_models(group):
+    return [
+        model for model, groups in CACHE_GROUPS.items()
+        if group in groups and any(f.name == "updated_at" for f in model._meta.fields)
+    ]
+
+
+def _db_modified(group) -> float:
+    stamps = [
+        model.objects.aggregate(m=Max("updated_at"))["m"]
+        for model in _group_models(group)
+    ]
+    stamps = [s.timestamp() for s in stamps if s]
+    return max(stamps) if stamps else 0.0
+
+
+def content_version(request, groups):
+    """(поколения, время последнего изменения) групп; считается раз на запрос."""
+    cache_attr = "_shop_content_version"
+    memo = getattr(request, cache_attr, None)
+    if memo is None or memo[0] != groups:
+        modified = get_modified(*groups)
+        for group in groups:
+            if group not in modified:
+                modified[group] = _db_modified(group)
+                set_modified(group, modified[group])
+        memo = (groups, get_generations(*groups), max(modified.values(), default=0.0))
+        setattr(request, cache_attr, memo)
+    return memo[1], memo[2]
+
+
+def _csrf_secret(request) -> str:
+    """Секрет CSRF, от которого будет токен в HTML; нет cookie — заводим сейчас, как это сделал бы шаблон."""
+    get_token(request)
+    return request.META.get("CSRF_COOKIE", "")
+
+
+def conditional_page(*groups):
+    """
+    Декоратор view: ETag и Last-Modified по группам кэша.
+        @conditional_page("menu", "catalog")
+    Ставить снаружи page_cached, чтобы 304 не доходил даже до кэша страниц.
+    """
+    def etag(request, *args, **kwargs):
+        gens, mtime = content_version(request, groups)
+        raw = "|".join((
+            getattr(settings, "SHOP_CONTENT_VERSION", ""),  # версия выкладки: шаблоны и статика
+            request.get_full_path(),
+            _csrf_secret(request),  # токен в формах страницы
+            ".".join(map(str, gens)),
+            str(mtime),
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        _gens, mtime = content_version(request, groups)
+        return datetime.fromtimestamp(mtime, tz=timezone.utc) if mtime else None
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+
+    def decorator(view):
+        view_with_etag = conditional(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view_with_etag(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)  # браузер переспрашивает с If-None-Match
+            return response
+        return wrapper
+    return decorator
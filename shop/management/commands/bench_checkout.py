@@ -0,0 +1,82 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.test.utils import CaptureQueriesContext
+
+from shop.models import Customer, Order, OrderItem, Payment, Product
+from shop.services import place_order
+
+
+class Rollback(Exception):
+    pass
+
+
+def _legacy_create(customer) -> Order:
+    """
+    Прежний Order.save: INSERT без номера, потом UPDATE номера по pk.
+    Нынешний Order.save уже пишет номер тем же INSERT — вызываем Model.save в обход.
+    """
+    order = Order(customer=customer, email=customer.email, currency="BYN")
+    models.Model.save(order)
+    order.number = f"№-{order.pk:04d}"
+    models.Model.save(order, update_fields=["number"])
+    return order
+
+
+def legacy_order(customer, lines):
+    """Прежняя сборка заказа из checkout_submit — для сравнения."""
+    order = _legacy_create(customer)
+    subtotal = Decimal("0")
+    for product, qty, price in lines:
+        OrderItem.objects.create(
+            order=order, product=product, product_name=product.name,
+            qty=qty, price_byn=price, line_total=price * qty,
+        )
+        subtotal += price * qty
+    order.subtotal = subtotal
+    order.total = subtotal
+    order.save(update_fields=["subtotal", "total"])
+    Payment.objects.create(order=order, amount=order.total, currency=order.currency)
+    return order
+
+
+def bulk_order(customer, lines):
+    return place_order(customer=customer, lines=lines, email=customer.email, currency="BYN")
+
+
+class Command(BaseCommand):
+    help = "Сравнить число запросов и время сборки заказа: прежний путь и place_order (всё откатывается)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=10, help="Позиций в заказе.")
+        parser.add_argument("--runs", type=int, default=20, help="Повторов для замера времени.")
+
+    def _measure(self, build, lines, runs):
+        statements, elapsed = 0, 0.0
+        for _ in range(runs):
+            try:
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    with transaction.atomic():
+                        customer = Customer.objects.create(email=f"bench-{time.time_ns()}@example.com")
+                        build(customer, lines)
+                        elapsed += time.perf_counter() - started
+                        raise Rollback
+            except Rollback:
+                pass
+            # SAVEPOINT — тоже round trip, считаем; BEGIN/ROLLBACK и INSERT клиента — нет
+            statements = sum(1 for q in ctx if q["sql"] not in ("BEGIN", "ROLLBACK")) - 1
+        return statements, elapsed / runs * 1000
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.filter(is_active=True).only("id", "name", "price_byn")[:options["items"]])
+        if not products:
+            raise CommandError("Нет активных товаров: сначала заведите каталог.")
+        lines = [(p, 1, p.price_byn) for p in products]
+
+        self.stdout.write(f"Позиций в заказе: {len(lines)}, повторов: {options['runs']}, БД: {connection.vendor}")
+        for label, build in (("прежний путь", legacy_order), ("place_order", bulk_order)):
+            statements, ms = self._measure(build, lines, options["runs"])
+            self.stdout.write(f"  {label:<14} запросов: {statements:>3}   {ms:7.2f} мс/заказ")
@@ -0,0 +1,45 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.recommendations import count_pairs, top_neighbours
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер расчёта совместных покупок на синтетических заказах (без БД): "
+        "сколько занимает матрица и топ-K на N позиций заказов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100_000, help="Позиций заказов всего.")
+        parser.add_argument("--products", type=int, default=2_000, help="Товаров в каталоге.")
+        parser.add_argument("--basket", type=int, default=3, help="Средний размер корзины.")
+        parser.add_argument("--top-k", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        products = range(1, options["products"] + 1)
+        # популярность по Ципфу: как в реальном каталоге, немного хитов и длинный хвост
+        weights = [1 / i for i in products]
+
+        baskets, items = [], 0
+        while items < options["items"]:
+            size = max(1, min(int(rnd.expovariate(1 / options["basket"])) + 1, 30))
+            basket = set(rnd.choices(products, weights=weights, k=size))
+            baskets.append(basket)
+            items += len(basket)
+
+        started = time.perf_counter()
+        pairs = count_pairs(baskets)
+        counted = time.perf_counter()
+        top = top_neighbours(pairs, options["top_k"])
+        done = time.perf_counter()
+
+        self.stdout.write(
+            f"Заказов {len(baskets)}, позиций {items}, товаров {options['products']}\n"
+            f"  матрица: {(counted - started) * 1000:8.1f} мс, ненулевых пар {len(pairs) // 2}\n"
+            f"  топ-{options['top_k']}: {(done - counted) * 1000:8.1f} мс, товаров с рекомендациями {len(top)}"
+        )
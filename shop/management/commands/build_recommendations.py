@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from shop.recommendations import rebuild_all, refresh_incremental
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать «С этим товаром покупают» по заказам. По умолчанию — только новые "
+        "заказы после прошлого прогона (cron раз в час), --full — всё заново (раз в сутки)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Полный пересчёт матрицы по всем заказам.")
+
+    def handle(self, *args, **options):
+        stats = rebuild_all() if options["full"] else refresh_incremental()
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: заказы до #{stats['orders_upto']}, пар {stats['pairs']}, товаров {stats['products']}."
+        ))
@@ -0,0 +1,255 @@
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from math import ceil
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Category, Product
+from shop.pagination import SORTS
+
+# сценарий -> вес в смеси трафика
+MIX = {
+    "home": 10,
+    "catalog": 30,
+    "catalog_api": 5,
+    "product": 30,
+    "search": 15,
+    "cart": 8,
+    "checkout": 2,
+}
+QUANTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+
+
+def percentile(sorted_values, q):
+    """Ближайший ранг: значение, не меньше которого q всех замеров."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, ceil(q * len(sorted_values)) - 1)]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+class VirtualUser:
+    """Посетитель со своими cookie (корзина, CSRF); каждый вызов — одно действие смеси."""
+
+    def __init__(self, base_url, data, rnd, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.data = data
+        self.rnd = rnd
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+        self.samples = []  # (метка, мс, статус)
+        self.recording = True
+
+    def _csrf(self) -> str:
+        return next((c.value for c in self.cookies if c.name == "csrftoken"), "")
+
+    def request(self, label, path, data=None):
+        headers = {}
+        body = None
+        if data is not None:
+            body = urlencode(data).encode()
+            headers["X-CSRFToken"] = self._csrf()
+        req = Request(self.base_url + path, data=body, headers=headers)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as resp:
+                content = resp.read()
+                status = resp.status
+        except HTTPError as exc:
+            content, status = exc.read(), exc.code
+        except (URLError, TimeoutError, ConnectionError):
+            content, status = b"", 0
+        if self.recording:
+            self.samples.append((label, (time.perf_counter() - started) * 1000, status))
+        return status, content
+
+    # --- сценарии ---
+
+    def home(self):
+        self.request("home", "/")
+
+    def catalog(self):
+        section = self.rnd.choice(self.data["sections"])
+        params = {"section": section["section"], "sort": self.rnd.choice(list(SORTS))}
+        if section["categories"] and self.rnd.random() < 0.5:
+            params["category"] = self.rnd.choice(section["categories"])
+        params["page"] = self.rnd.choice((1, 1, 1, 2, 3))
+        self.request("catalog", "/catalog/?" + urlencode(params))
+
+    def catalog_api(self):
+        params = {"sort": self.rnd.choice(list(SORTS))}
+        for _ in range(self.rnd.randint(1, 3)):  # «показать ещё»
+            status, content = self.request("catalog_api", "/api/catalog/?" + urlencode(params))
+            cursor = json.loads(content).get("next") if status == 200 else None
+            if not cursor:
+                break
+            params["cursor"] = cursor
+
+    def product(self):
+        self.request("product", f"/product/{self.rnd.choice(self.data['products'])['slug']}/")
+
+    def search(self):
+        word = self.rnd.choice(self.data["words"])
+        for i in range(2, len(word) + 1):  # по запросу на каждое нажатие
+            self.request("search", "/api/search/?" + urlencode({"q": word[:i]}))
+
+    def cart(self):
+        pid = self.rnd.choice(self.data["products"])["id"]
+        self.request("cart_add", "/cart/add/", {"product_id": pid, "qty": 1})
+        self.request("cart_update", "/cart/update/", {"product_id": pid, "action": "plus"})
+        self.request("cart_summary", "/api/cart/summary/")
+
+    def checkout(self):
+        self.request("cart_add", "/cart/add/", {"product_id": self.rnd.choice(self.data["products"])["id"], "qty": 1})
+        self.request("checkout_submit", "/checkout/submit/", {
+            "full_name": "Нагрузочный тест",
+            "email": f"loadtest-{self.rnd.randrange(10 ** 6)}@example.com",
+            "contact_method": "email",
+        })
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест витрины: смесь трафика (главная, каталог с сортировками и "
+        "страницами, карточки, поиск по нажатиям, корзина, оформление) против "
+        "запущенного сервера; пропускная способность и p50/p95/p99 по точкам. "
+        "Данные для запросов берутся из БД (manage.py seed_shop). Оформление "
+        "создаёт настоящие заказы — только на тестовой БД."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--users", type=int, default=8, help="Одновременных посетителей (потоков).")
+        parser.add_argument("--duration", type=float, default=30, help="Длительность замера, сек.")
+        parser.add_argument("--warmup", type=float, default=5, help="Прогрев без записи, сек.")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--mix", default="", help="Переопределить веса: catalog=50,checkout=0")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="Сохранить результат в JSON.")
+        parser.add_argument("--compare", help="JSON прошлого прогона (например, с другого коммита).")
+
+    def _mix(self, raw) -> dict:
+        mix = dict(MIX)
+        for part in filter(None, raw.split(",")):
+            name, _, weight = part.partition("=")
+            if name not in MIX or not weight.isdigit():
+                raise CommandError(f"Неизвестный сценарий или вес: {part} (есть: {', '.join(MIX)})")
+            mix[name] = int(weight)
+        return {k: v for k, v in mix.items() if v > 0}
+
+    def _data(self) -> dict:
+        products = list(Product.objects.filter(is_active=True).values("id", "slug", "name")[:2000])
+        if not products:
+            raise CommandError("Нет активных товаров: сначала manage.py seed_shop.")
+        sections = [{"section": "new", "categories": []}]
+        for root in Category.objects.filter(parent__isnull=True).prefetch_related("children"):
+            sections.append({"section": root.slug, "categories": [c.slug for c in root.children.all()]})
+        words = sorted({w for p in products for w in re.findall(r"\w{4,}", p["name"].lower())})
+        return {"products": products, "sections": sections, "words": words or ["плед"]}
+
+    def handle(self, *args, **options):
+        mix = self._mix(options["mix"])
+        data = self._data()
+        scenarios, weights = list(mix), list(mix.values())
+        warmup_until = time.monotonic() + options["warmup"]
+        stop_at = warmup_until + options["duration"]
+        lock = threading.Lock()
+        users = []
+
+        def run(n):
+            user = VirtualUser(options["base_url"], data, random.Random(options["seed"] + n), options["timeout"])
+            with lock:
+                users.append(user)
+            user.catalog()  # base.html выдаёт cookie csrftoken для POST корзины
+            while time.monotonic() < stop_at:
+                user.recording = time.monotonic() >= warmup_until
+                getattr(user, user.rnd.choices(scenarios, weights=weights)[0])()
+
+        self.stdout.write(
+            f"{options['base_url']}: {options['users']} посетителей, прогрев {options['warmup']:g} с, "
+            f"замер {options['duration']:g} с"
+        )
+        with ThreadPoolExecutor(options["users"]) as pool:
+            for future in [pool.submit(run, n) for n in range(options["users"])]:
+                future.result()
+
+        result = self._summary([s for u in users for s in u.samples], options)
+        self._print(result, self._load(options["compare"]))
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(result, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Сохранено: {options['output']}")
+
+    def _summary(self, samples, options) -> dict:
+        by_label = defaultdict(list)
+        errors = defaultdict(int)
+        for label, ms, status in samples:
+            by_label[label].append(ms)
+            if not 200 <= status < 400:
+                errors[label] += 1
+        endpoints = {}
+        for label, values in sorted(by_label.items()):
+            values.sort()
+            endpoints[label] = {
+                "requests": len(values),
+                "errors": errors[label],
+                "rps": len(values) / options["duration"],
+                "mean": sum(values) / len(values),
+                **{name: percentile(values, q) for name, q in QUANTILES},
+            }
+        return {
+            "commit": _git_commit(),
+            "base_url": options["base_url"],
+            "users": options["users"],
+            "duration": options["duration"],
+            "total_rps": len(samples) / options["duration"],
+            "endpoints": endpoints,
+        }
+
+    def _load(self, path):
+        if not path:
+            return None
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Не прочитать {path}: {exc}")
+
+    def _print(self, result, baseline) -> None:
+        header = f"{'точка':16} {'запросов':>8} {'ошибок':>6} {'rps':>7} {'mean':>7} {'p50':>7} {'p95':>7} {'p99':>7}"
+        if baseline:
+            header += f"   p95 было ({baseline.get('commit') or '?'})"
+        self.stdout.write(header + "   мс")
+        for label, row in result["endpoints"].items():
+            line = (
+                f"{label:16} {row['requests']:8d} {row['errors']:6d} {row['rps']:7.1f} {row['mean']:7.1f} "
+                f"{row['p50']:7.1f} {row['p95']:7.1f} {row['p99']:7.1f}"
+            )
+            old = (baseline or {}).get("endpoints", {}).get(label)
+            if old:
+                delta = (row["p95"] - old["p95"]) / old["p95"] * 100 if old["p95"] else 0.0
+                line += f"   {old['p95']:7.1f} ({delta:+.0f}%)"
+            self.stdout.write(line)
+        total = f"Всего: {result['total_rps']:.1f} запросов/с (коммит {result['commit'] or '?'})"
+        if baseline:
+            total += f", было {baseline['total_rps']:.1f}"
+        self.stdout.write(total)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from core.metrics import collect, quantile
+from shop.perf import REQUEST_SECONDS, SPAN_SECONDS
+
+
+def _ms(value) -> str:
+    if value is None:
+        return "-"
+    return "inf" if value == float("inf") else f"≤{value * 1000:g}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Сводка гистограмм времени по view со всех воркеров (shop/perf.py): "
+        "число запросов, среднее и p50/p95/p99 (с точностью до корзины)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--span", default="total", help="Отрезок: total, db, tpl, thumb.")
+
+    def handle(self, *args, **options):
+        span = options["span"]
+        name = REQUEST_SECONDS.name if span == "total" else SPAN_SECONDS.name
+        family = collect().get(name)
+
+        rows = []
+        for labels, (counts, total) in (family["samples"].items() if family else ()):
+            view = labels[0]
+            if span != "total" and labels[1] != span:
+                continue
+            rows.append((total, view, sum(counts), counts))
+
+        if not rows:
+            self.stdout.write("Нет данных: запросов ещё не было или метрики в другом METRICS_DIR.")
+            return
+
+        buckets = family["buckets"]
+        self.stdout.write(f"{'view':40} {'n':>7} {'avg':>8} {'p50':>7} {'p95':>7} {'p99':>7}  мс")
+        for total, view, n, counts in sorted(rows, reverse=True):
+            self.stdout.write(
+                f"{view[:40]:40} {n:7d} {total / n * 1000:8.1f} "
+                f"{_ms(quantile(buckets, counts, 0.5)):>7} {_ms(quantile(buckets, counts, 0.95)):>7} "
+                f"{_ms(quantile(buckets, counts, 0.99)):>7}"
+            )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from shop.cache import bump_generation
+from shop.models import Product, SingletonSettings
+from shop.services import refresh_product_cover
+from shop.signals import CACHE_GROUPS
+from shop.thumbnails import THUMBNAIL_SPECS, pregenerate
+
+
+class Command(BaseCommand):
+    help = "Нарезать кадрированные миниатюры для всех картинок витрины (бэкфилл медиатеки)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--skip-covers", action="store_true",
+            help="Не пересчитывать обложки товаров (Product.cover / cover_url).",
+        )
+
+    def handle(self, *args, **options):
+        for model, specs in THUMBNAIL_SPECS.items():
+            objects = total = 0
+            for obj in model.objects.all().iterator(chunk_size=200):
+                total += pregenerate(obj)
+                objects += 1
+            self.stdout.write(f"{model.__name__}: объектов {objects}, миниатюр {total}")
+
+        if not options["skip_covers"]:
+            ids = list(Product.objects.values_list("id", flat=True))
+            for pk in ids:
+                refresh_product_cover(pk)
+            self.stdout.write(f"Обложки товаров: {len(ids)}")
+
+        # страницы и копии настроек, собранные до нарезки, ссылаются на оригиналы
+        groups = set()
+        for model in THUMBNAIL_SPECS:
+            groups.update(CACHE_GROUPS.get(model, ()))
+            if issubclass(model, SingletonSettings):
+                groups.update(model._solo_groups())
+        bump_generation(*groups)
+
+        self.stdout.write(self.style.SUCCESS("Готово."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop.related import refresh_related
+
+
+class Command(BaseCommand):
+    help = "Пересчитать блоки «Похожие товары» для всего каталога (после миграции и для проверки)."
+
+    def handle(self, *args, **options):
+        count = refresh_related()
+        self.stdout.write(self.style.SUCCESS(f"Готово: товаров {count}."))
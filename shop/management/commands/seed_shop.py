@@ -0,0 +1,190 @@
+import io
+import random
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image, ImageDraw
+
+from imageops.variants import build_variants_safe, ensure_variants, name_from_url
+from shop.cache import bump_generation
+from shop.models import Category, Customer, Order, OrderItem, Payment, Product, ProductPhoto
+from shop.recommendations import rebuild_all
+from shop.related import refresh_related
+from shop.search import update_search_vectors
+from shop.thumbnails import pregenerate, thumbnail_url
+
+PREFIX = "seed-"
+ORDER_PREFIX = "SEED-"
+EMAIL_DOMAIN = "seed.example.com"
+BATCH_SIZE = 2000
+PHOTO_SIZE = 1200
+
+ROOTS = ["Текстиль", "Посуда", "Свечи", "Декор", "Кухня", "Ванная", "Хранение", "Освещение", "Сад", "Детская"]
+KINDS = ["Пледы", "Подушки", "Скатерти", "Кружки", "Тарелки", "Вазы", "Корзины", "Лампы", "Полотенца", "Коврики"]
+ADJECTIVES = ["Льняной", "Хлопковый", "Керамический", "Плетёный", "Шерстяной", "Матовый", "Глиняный", "Бархатный"]
+NOUNS = ["плед", "кувшин", "подсвечник", "чехол", "поднос", "абажур", "коврик", "органайзер", "набор"]
+COLORS = ["молочный", "графит", "терракота", "шалфей", "песочный", "индиго", "горчичный"]
+
+
+def _photo(color) -> bytes:
+    img = Image.new("RGB", (PHOTO_SIZE, PHOTO_SIZE), color)
+    draw = ImageDraw.Draw(img)
+    for i in range(0, PHOTO_SIZE, 60):  # немного деталей, чтобы JPEG не был пустым
+        draw.line((0, i, i, 0), fill=tuple(255 - c for c in color), width=3)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Синтетические данные для нагрузочных тестов: категории, товары с фото, "
+        "клиенты и история заказов (bulk_create, без сигналов; затем обложки, "
+        "поиск, «похожие» и рекомендации пересчитываются пакетно). Запускать на "
+        "отдельной БД: повторный запуск не удаляет прежние данные и откажется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--roots", type=int, default=6, help="Корневых категорий.")
+        parser.add_argument("--children", type=int, default=5, help="Подкатегорий у каждой корневой.")
+        parser.add_argument("--products", type=int, default=20_000)
+        parser.add_argument("--photos", type=int, default=3, help="Фото на товар.")
+        parser.add_argument("--images", type=int, default=24, help="Разных файлов фото (переиспользуются).")
+        parser.add_argument("--customers", type=int, default=5_000)
+        parser.add_argument("--orders", type=int, default=20_000)
+        parser.add_argument("--seed", type=int, default=1, help="Одинаковый seed — одинаковые данные.")
+
+    def handle(self, *args, **options):
+        if Category.objects.filter(slug__startswith=PREFIX).exists():
+            raise CommandError("Синтетические данные уже есть: пересоздайте БД (manage.py flush) и запустите снова.")
+        rnd = random.Random(options["seed"])
+
+        images = self._images(rnd, options["images"])
+        with transaction.atomic():
+            leaves = self._categories(options["roots"], options["children"])
+            products = self._products(rnd, leaves, options["products"])
+            self._photos(rnd, products, images, options["photos"])
+            self._orders(rnd, products, options["customers"], options["orders"])
+
+        self.stdout.write("Миниатюры, обложки, поиск, «похожие», рекомендации…")
+        self._covers()
+        update_search_vectors()
+        refresh_related()
+        rebuild_all()
+        bump_generation("menu", "catalog", "search", "recs")
+        self.stdout.write(self.style.SUCCESS("Готово."))
+
+    def _images(self, rnd, count) -> list:
+        names = []
+        for i in range(count):
+            name = f"products/photos/{PREFIX}{i}.jpg"
+            if not default_storage.exists(name):
+                color = tuple(rnd.randrange(40, 220) for _ in range(3))
+                name = default_storage.save(name, ContentFile(_photo(color)))
+                build_variants_safe(name, default_storage)
+            names.append(name)
+        return names
+
+    def _categories(self, roots, children) -> list:
+        parents = Category.objects.bulk_create([
+            Category(name=ROOTS[i % len(ROOTS)] + ("" if i < len(ROOTS) else f" {i}"),
+                     slug=f"{PREFIX}{i}", position=i)
+            for i in range(roots)
+        ])
+        leaves = Category.objects.bulk_create([
+            Category(name=KINDS[(p.position + j) % len(KINDS)], slug=f"{PREFIX}{p.position}-{j}",
+                     parent=p, position=j)
+            for p in parents
+            for j in range(children)
+        ])
+        self.stdout.write(f"Категорий: {len(parents)} + {len(leaves)}")
+        return leaves or parents
+
+    def _products(self, rnd, categories, count) -> list:
+        products = [
+            Product(
+                name=f"{rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS)} {rnd.choice(COLORS)} №{i}",
+                slug=f"{PREFIX}{i}",
+                category=rnd.choice(categories),
+                price_byn=Decimal(rnd.randrange(4, 100) * 5),
+                is_active=rnd.random() > 0.05,
+                is_new=rnd.random() < 0.1,
+                short_desc=" ".join(rnd.choice(COLORS + NOUNS) for _ in range(8)),
+            )
+            for i in range(count)
+        ]
+        products = Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+        self.stdout.write(f"Товаров: {len(products)}")
+        return products
+
+    def _photos(self, rnd, products, images, per_product) -> None:
+        crop = f"0,0,{PHOTO_SIZE},{PHOTO_SIZE}"
+        photos = [
+            ProductPhoto(product=p, image=rnd.choice(images), image_crop=crop, position=i)
+            for p in products
+            for i in range(per_product)
+        ]
+        ProductPhoto.objects.bulk_create(photos, batch_size=BATCH_SIZE)
+        self.stdout.write(f"Фото: {len(photos)}")
+
+    def _orders(self, rnd, products, customers_count, orders_count) -> None:
+        customers = Customer.objects.bulk_create(
+            [Customer(email=f"{PREFIX}{i}@{EMAIL_DOMAIN}", name=f"Покупатель {i}") for i in range(customers_count)],
+            batch_size=BATCH_SIZE,
+        )
+        active = [p for p in products if p.is_active]
+        if not customers or not active:
+            return
+        # популярность по Ципфу: немного хитов и длинный хвост
+        cum_weights = list(accumulate(1 / (i + 1) for i in range(len(active))))
+        statuses = [s for s, _ in Order.Status.choices]
+
+        created = 0
+        for start in range(0, orders_count, BATCH_SIZE):
+            orders, baskets = [], []
+            for n in range(start, min(start + BATCH_SIZE, orders_count)):
+                basket = set(rnd.choices(active, cum_weights=cum_weights, k=rnd.randint(1, 4)))
+                lines = [(p, rnd.randint(1, 3)) for p in basket]
+                subtotal = sum(p.price_byn * qty for p, qty in lines)
+                customer = rnd.choice(customers)
+                orders.append(Order(
+                    number=f"{ORDER_PREFIX}{n:07d}", customer=customer, email=customer.email,
+                    status=rnd.choice(statuses), subtotal=subtotal, total=subtotal,
+                    delivery_provider="pickup", delivery_method="pickup",
+                ))
+                baskets.append(lines)
+            orders = Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=o, product=p, product_name=p.name, qty=qty,
+                          price_byn=p.price_byn, line_total=p.price_byn * qty)
+                for o, lines in zip(orders, baskets)
+                for p, qty in lines
+            ])
+            Payment.objects.bulk_create([Payment(order=o, amount=o.total) for o in orders])
+            created += len(orders)
+        self.stdout.write(f"Клиентов: {len(customers)}, заказов: {created}")
+
+    def _covers(self) -> None:
+        """Обложка — первое фото; миниатюры режем один раз на каждый файл из пула."""
+        first = {
+            photo.product_id: photo
+            for photo in ProductPhoto.objects.filter(product__slug__startswith=PREFIX, position=0)
+        }
+        urls = {}
+        for photo in first.values():
+            if photo.image.name not in urls:
+                pregenerate(photo)
+                urls[photo.image.name] = url = thumbnail_url(photo, "image_crop")
+                ensure_variants(name_from_url(url))  # srcset для карточек каталога
+        Product.objects.bulk_update(
+            [
+                Product(pk=product_id, cover_id=photo.pk, cover_url=urls[photo.image.name][:500])
+                for product_id, photo in first.items()
+            ],
+            ["cover", "cover_url"],
+            batch_size=BATCH_SIZE,
+        )
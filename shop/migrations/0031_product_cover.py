@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_cover(apps, schema_editor):
+    Product = apps.get_model("shop", "Product")
+    ProductPhoto = apps.get_model("shop", "ProductPhoto")
+    first_by_product = {}
+    for ph in ProductPhoto.objects.filter(is_active=True).order_by("product_id", "position", "id"):
+        first_by_product.setdefault(ph.product_id, ph.id)
+    for product_id, photo_id in first_by_product.items():
+        Product.objects.filter(pk=product_id).update(cover_id=photo_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0030_productphoto_image_crop'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='cover',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.productphoto', verbose_name='Фото-обложка'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='cover_url',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500, verbose_name='Миниатюра обложки'),
+        ),
+        migrations.RunPython(fill_cover, migrations.RunPython.noop),
+    ]
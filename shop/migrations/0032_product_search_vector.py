@@ -0,0 +1,49 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Только Postgres: на SQLite (тесты) поиск идёт через icontains, индексы не нужны.
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS shop_product_search_gin ON shop_product USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS shop_product_name_trgm ON shop_product USING gin (name gin_trgm_ops)",
+]
+# Снимок shop.search.UPDATE_VECTOR_SQL на момент миграции
+FILL_SQL = """
+UPDATE shop_product AS p SET search_vector =
+    setweight(to_tsvector('russian', coalesce(p.name, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(c.name, '') || ' ' || coalesce(pc.name, '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(p.short_desc, '')), 'C')
+FROM shop_category AS c
+LEFT JOIN shop_category AS pc ON pc.id = c.parent_id
+WHERE c.id = p.category_id
+"""
+BACKWARD_SQL = [
+    "DROP INDEX IF EXISTS shop_product_name_trgm",
+    "DROP INDEX IF EXISTS shop_product_search_gin",
+]
+
+
+def _run(statements):
+    def op(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return op
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0031_product_cover'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(_run(FORWARD_SQL), _run(BACKWARD_SQL)),
+        migrations.RunPython(_run([FILL_SQL]), migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+import re
+
+from django.db import migrations, models
+
+NUMBER_RE = re.compile(r"^№-(\d+)$")
+
+
+def backfill(apps, schema_editor):
+    """Номера для заказов без номера и стартовое значение счётчика."""
+    Order = apps.get_model("shop", "Order")
+    OrderCounter = apps.get_model("shop", "OrderCounter")
+
+    for order in Order.objects.filter(number__isnull=True).only("id"):
+        order.number = f"№-{order.pk:04d}"
+        order.save(update_fields=["number"])
+
+    last = 0
+    for number in Order.objects.values_list("number", flat=True).iterator():
+        m = NUMBER_RE.match(number or "")
+        if m:
+            last = max(last, int(m.group(1)))
+    OrderCounter.objects.update_or_create(scope="", defaults={"value": last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0032_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCounter',
+            fields=[
+                ('scope', models.CharField(max_length=10, primary_key=True, serialize=False, verbose_name='Область')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Последний номер')),
+            ],
+            options={
+                'verbose_name': 'Счётчик заказов',
+                'verbose_name_plural': 'Счётчики заказов',
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='number',
+            field=models.CharField(blank=True, editable=False, max_length=20, unique=True, verbose_name='Номер заказа'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:55
+
+from django.db import migrations, models
+
+SINGLETONS = (
+    "NewTabSettings", "HomePageSettings", "AboutPageSettings",
+    "ContactPageSettings", "DeliveryPageSettings",
+)
+
+
+def collapse_to_pk1(apps, schema_editor):
+    """Оставить первую запись каждой модели и перенести её на pk=1."""
+    for name in SINGLETONS:
+        model = apps.get_model("shop", name)
+        first = model.objects.order_by("pk").first()
+        if first is None:
+            continue
+        model.objects.exclude(pk=first.pk).delete()
+        if first.pk != 1:
+            model.objects.filter(pk=first.pk).update(id=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0033_order_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_to_pk1, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='aboutpagesettings',
+            constraint=models.CheckConstraint(condition=models.Q(('id', 1)), name='shop_aboutpagesettings_singleton'),
+        ),
+        migrations.AddConstraint(
+            model_name='contactpagesettings',
+            constraint=models.CheckConstraint(condition=models.Q(('id', 1)), name='shop_contactpagesettings_singleton'),
+        ),
+        migrations.AddConstraint(
+            model_name='deliverypagesettings',
+            constraint=models.CheckConstraint(condition=models.Q(('id', 1)), name='shop_deliverypagesettings_singleton'),
+        ),
+        migrations.AddConstraint(
+            model_name='homepagesettings',
+            constraint=models.CheckConstraint(condition=models.Q(('id', 1)), name='shop_homepagesettings_singleton'),
+        ),
+        migrations.AddConstraint(
+            model_name='newtabsettings',
+            constraint=models.CheckConstraint(condition=models.Q(('id', 1)), name='shop_newtabsettings_singleton'),
+        ),
+    ]
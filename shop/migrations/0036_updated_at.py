@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0035_product_price_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aboutpagesettings',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлён'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлена'),
+        ),
+        migrations.AddField(
+            model_name='contactpagesettings',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлён'),
+        ),
+        migrations.AddField(
+            model_name='deliverypagesettings',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлён'),
+        ),
+        migrations.AddField(
+            model_name='homepagesettings',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлён'),
+        ),
+        migrations.AddField(
+            model_name='newtabsettings',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлён'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлён'),
+        ),
+        migrations.AddField(
+            model_name='productphoto',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Обновлено'),
+        ),
+    ]
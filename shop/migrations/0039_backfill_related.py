@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:05
+
+from django.db import migrations
+
+
+def fill_related(apps, schema_editor):
+    # та же логика, что у rebuild_related, но на моделях миграции
+    from shop.related import refresh_related
+    refresh_related(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0038_copurchase_recommendations'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_related, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,16 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.conf import settings
+from django.db import connection, models, transaction
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from image_cropping import ImageRatioField
 from decimal import Decimal
 from django.core.validators import RegexValidator
 
+from .cache import bump_generation, cached, get_generations
+
 username_validator = RegexValidator(
     regex=r'^[A-Za-z0-9._]{2,30}$',
     message="Только латинские буквы/цифры/._, 2–30 символов."
@@ -30,6 +35,79 @@ class BannerFieldsMixin(models.Model):
         abstract = True
 
 
+class SingletonSettings(models.Model):
+    """
+    Основа настроек страниц из одной записи (всегда pk=1, CHECK в БД).
+
+    get_solo() отдаёт копию из памяти процесса, сверяя её с поколением в
+    общем кэше (shop/cache.py); при промахе читает общий кэш и только потом
+    БД. save()/delete() сбрасывают поколение после коммита, так что правка
+    в админке видна всем воркерам. Возвращённый объект общий — не менять.
+    """
+    updated_at = models.DateTimeField("Обновлён", auto_now=True)
+
+    SOLO_PK = 1
+    solo_related = ()     # FK, которые подтягиваем сразу (select_related)
+    solo_depends_on = ()  # группы кэша, при сбросе которых копия тоже устаревает
+
+    class Meta:
+        abstract = True
+        constraints = [
+            models.CheckConstraint(condition=models.Q(id=1), name="%(app_label)s_%(class)s_singleton"),
+        ]
+
+    @classmethod
+    def _solo_groups(cls):
+        return (f"solo_{cls._meta.model_name}", *cls.solo_depends_on)
+
+    @classmethod
+    def _load_solo(cls):
+        obj = cls.objects.select_related(*cls.solo_related).filter(pk=cls.SOLO_PK).first()
+        if obj is None:
+            # get_or_create по pk: две параллельные первые загрузки не создадут дубль
+            obj, _ = cls.objects.get_or_create(pk=cls.SOLO_PK)
+        obj.prepare_solo()
+        return obj
+
+    @classmethod
+    def get_solo(cls):
+        """Единственная запись настроек (создаст при первом доступе)."""
+        groups = cls._solo_groups()
+        gens = get_generations(*groups)
+        local = _solo_copies.get(cls)
+        if local is not None and local[0] == gens:
+            return local[1]
+        obj = cached(f"solo:{cls._meta.label_lower}", cls._load_solo, *groups)
+        _solo_copies[cls] = (gens, obj)
+        return obj
+
+    @classmethod
+    def invalidate_solo(cls):
+        transaction.on_commit(lambda: bump_generation(*cls._solo_groups()))
+
+    def prepare_solo(self):
+        """Хук: досчитать то, что кэшируется вместе с объектом."""
+
+    def save(self, *args, **kwargs):
+        # страховка от второй записи, если кто-то создаст через shell/скрипт
+        if self.pk is None:
+            if type(self).objects.exists():
+                raise ValidationError(
+                    f"Разрешена только одна запись: «{self._meta.verbose_name}»."
+                )
+            self.pk = self.SOLO_PK
+        super().save(*args, **kwargs)
+        self.invalidate_solo()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invalidate_solo()
+        return result
+
+
+_solo_copies = {}  # модель -> (поколения, объект): копии в памяти процесса
+
+
 class Category(BannerFieldsMixin, models.Model):
     name = models.CharField("Название", max_length=200)
     slug = models.SlugField("Слаг", unique=True)
@@ -42,6 +120,7 @@ class Category(BannerFieldsMixin, models.Model):
         "Порядок", default=100, db_index=True,
         help_text="Чем меньше число, тем выше категория в меню"
     )
+    updated_at = models.DateTimeField("Обновлена", auto_now=True)
 
     class Meta:
         verbose_name = "Категория"
@@ -60,35 +139,19 @@ class Category(BannerFieldsMixin, models.Model):
             )
 
 
-class NewTabSettings(BannerFieldsMixin, models.Model):
+class NewTabSettings(BannerFieldsMixin, SingletonSettings):
     """
     Единственные настройки для вкладки «Новинки»
     (баннер как у родительских категорий).
     """
 
-    class Meta:
+    class Meta(SingletonSettings.Meta):
         verbose_name = "Вкладка «Новинки»"
         verbose_name_plural = "Вкладка «Новинки»"
 
     def __str__(self):
         return "Настройки вкладки «Новинки»"
 
-    @classmethod
-    def get_solo(cls):
-        """Гарантированно вернуть одну запись (создаст при первом доступе)."""
-        obj = cls.objects.first()
-        if not obj:
-            obj = cls.objects.create()
-        return obj
-
-    # Страховка от второй записи, если кто-то создаст через shell/скрипт
-    def save(self, *args, **kwargs):
-        if not self.pk and NewTabSettings.objects.exists():
-            raise ValidationError(
-                "Разрешена только одна запись настроек вкладки «Новинки»."
-            )
-        return super().save(*args, **kwargs)
-
 
 class Product(models.Model):
     name = models.CharField("Название", max_length=200)
@@ -112,7 +175,28 @@ class Product(models.Model):
         blank=True,
     )
     image = models.ImageField("Обложка", upload_to="products/", blank=True, null=True)
+    # денормализованная обложка для карточек каталога (см. services.refresh_product_cover)
+    cover = models.ForeignKey(
+        "ProductPhoto",
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        verbose_name="Фото-обложка",
+    )
+    cover_url = models.CharField(
+        "Миниатюра обложки",
+        max_length=500,
+        blank=True,
+        default="",
+        editable=False,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField("Обновлён", auto_now=True)
+    # tsvector для поиска (name + категория + short_desc), ведёт shop/search.py;
+    # GIN-индексы создаёт миграция 0032 только на Postgres
+    search_vector = SearchVectorField(null=True, editable=False)
 
     size_title = models.CharField(
         "Заголовок блока размера",
@@ -136,6 +220,7 @@ class Product(models.Model):
             models.Index(fields=["is_active"]),
             models.Index(fields=["is_active", "is_new"]),
             models.Index(fields=["category", "is_active"]),
+            models.Index(fields=["is_active", "price_byn", "id"]),  # keyset по цене (shop/pagination.py)
         ]
 
     def __str__(self):
@@ -158,6 +243,7 @@ class ProductPhoto(models.Model):
     position = models.PositiveIntegerField("Порядок", default=0)
     is_active = models.BooleanField("Показывать", default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
 
     class Meta:
         verbose_name = "Фото товара"
@@ -171,7 +257,79 @@ class ProductPhoto(models.Model):
         return f"{self.product.name} — фото #{self.pk}"
 
 
-class HomePageSettings(models.Model):
+class RelatedProduct(models.Model):
+    """Готовый блок «Похожие товары» карточки; пересчитывает shop/related.py."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="related_links", verbose_name="Товар")
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+", verbose_name="Похожий товар")
+    position = models.PositiveSmallIntegerField("Порядок")
+
+    class Meta:
+        verbose_name = "Похожий товар"
+        verbose_name_plural = "Похожие товары"
+        ordering = ["product", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "position"], name="shop_relatedproduct_position_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} → {self.related_id}"
+
+
+class CoPurchase(models.Model):
+    """
+    Разреженная матрица «купили вместе»: в скольких заказах встретились
+    два товара. Хранится в обе стороны (product, other) и (other, product).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    orders = models.PositiveIntegerField("Совместных заказов", default=0)
+
+    class Meta:
+        verbose_name = "Совместная покупка"
+        verbose_name_plural = "Совместные покупки"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "other"], name="shop_copurchase_pair_uniq"),
+        ]
+        indexes = [models.Index(fields=["product", "-orders"])]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id}: {self.orders}"
+
+
+class ProductRecommendation(models.Model):
+    """Топ-K «С этим товаром покупают»; пересчитывает shop/recommendations.py."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommendations", verbose_name="Товар")
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+", verbose_name="Рекомендация")
+    position = models.PositiveSmallIntegerField("Порядок")
+    score = models.PositiveIntegerField("Совместных заказов")
+
+    class Meta:
+        verbose_name = "Рекомендация"
+        verbose_name_plural = "Рекомендации"
+        ordering = ["product", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "position"], name="shop_productrecommendation_position_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} → {self.recommended_id} ({self.score})"
+
+
+class BatchCheckpoint(models.Model):
+    """Докуда дошла фоновая задача (например, последний учтённый id заказа)."""
+    name = models.CharField("Задача", max_length=50, primary_key=True)
+    position = models.BigIntegerField("Позиция", default=0)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    class Meta:
+        verbose_name = "Чекпоинт задачи"
+        verbose_name_plural = "Чекпоинты задач"
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+
+class HomePageSettings(SingletonSettings):
     hero_image = models.ImageField(
         "Фоновое фото (герой)",
         upload_to="homepage/",
@@ -266,7 +424,20 @@ class HomePageSettings(models.Model):
         verbose_name="Обрезка блока 3",
     )
 
+    solo_related = ("featured_1", "featured_2", "featured_3")
+    solo_depends_on = ("menu",)  # слаги/названия/баннеры категорий
+
+    def prepare_solo(self):
+        self.__dict__["_featured_blocks"] = self._build_featured_blocks()
+
     def featured_blocks(self):
+        if "_featured_blocks" not in self.__dict__:
+            self.prepare_solo()
+        return self.__dict__["_featured_blocks"]
+
+    def _build_featured_blocks(self):
+        from .thumbnails import ready_thumbnail_url
+
         rows = []
         triples = (
             (self.featured_1, self.featured_1_title, self.featured_1_image),
@@ -279,33 +450,33 @@ class HomePageSettings(models.Model):
                 continue
 
             crop_name = f"featured_{idx}_crop" if img else None
+            image = img.url if img else (cat.banner_image.url if cat.banner_image else "")
+            if crop_name:
+                try:
+                    # готовый URL кадрированного фона: шаблону не нужен {% cropped_thumbnail %};
+                    # нарезает его pregenerate после сохранения, не запрос страницы
+                    image = ready_thumbnail_url(self, crop_name, upscale=True) or image
+                except Exception:
+                    pass  # битый файл — остаётся оригинал
             rows.append(
                 {
                     "slug": cat.slug,
                     "title": title or cat.name,
-                    "image": (
-                        img.url
-                        if img
-                        else (cat.banner_image.url if cat.banner_image else "")
-                    ),
-                    "crop": crop_name,  # ← важно
+                    "image": image,
+                    "crop": crop_name,
                 }
             )
         return rows
 
-    class Meta:
+    class Meta(SingletonSettings.Meta):
         verbose_name = "Страница «Главная»"
         verbose_name_plural = "Страница «Главная»"
 
     def __str__(self):
         return "Настройки главной"
 
-    @classmethod
-    def get_solo(cls):
-        return cls.objects.first() or cls.objects.create()
 
-
-class AboutPageSettings(models.Model):
+class AboutPageSettings(SingletonSettings):
     # Хедер
     title = models.CharField("Заголовок", max_length=120, default="О НАС")
     intro_text = models.TextField("Интро-текст", blank=True, default="")
@@ -352,27 +523,15 @@ class AboutPageSettings(models.Model):
     )
     block3_text = models.TextField("Блок 3 — текст", blank=True, default="")
 
-    class Meta:
+    class Meta(SingletonSettings.Meta):
         verbose_name = "Страница «О нас»"
         verbose_name_plural = "Страница «О нас»"
 
     def __str__(self):
         return "Настройки «О нас»"
 
-    @classmethod
-    def get_solo(cls):
-        return cls.objects.first() or cls.objects.create()
-
-    # страховка от дубликатов при прямом создании
-    def save(self, *args, **kwargs):
-        if not self.pk and AboutPageSettings.objects.exists():
-            raise ValidationError(
-                "Разрешена только одна запись настроек «О нас»."
-            )
-        return super().save(*args, **kwargs)
-
 
-class ContactPageSettings(models.Model):
+class ContactPageSettings(SingletonSettings):
     title = models.CharField("Заголовок", max_length=120, default="КОНТАКТЫ")
     address_text = models.TextField(
         "Адрес / описание",
@@ -415,26 +574,15 @@ class ContactPageSettings(models.Model):
     )
     map_zoom = models.PositiveSmallIntegerField("Зум карты", default=16)
 
-    class Meta:
+    class Meta(SingletonSettings.Meta):
         verbose_name = "Страница «Контакты»"
         verbose_name_plural = "Страница «Контакты»"
 
     def __str__(self):
         return "Настройки «Контакты»"
 
-    @classmethod
-    def get_solo(cls):
-        return cls.objects.first() or cls.objects.create()
-
-    def save(self, *args, **kwargs):
-        if not self.pk and ContactPageSettings.objects.exists():
-            raise ValidationError(
-                "Разрешена только одна запись настроек «Контакты»."
-            )
-        return super().save(*args, **kwargs)
-
 
-class DeliveryPageSettings(models.Model):
+class DeliveryPageSettings(SingletonSettings):
     title = models.CharField(
         "Заголовок",
         max_length=120,
@@ -464,25 +612,13 @@ class DeliveryPageSettings(models.Model):
         verbose_name="Обрезка справа",
     )
 
-    class Meta:
+    class Meta(SingletonSettings.Meta):
         verbose_name = "Страница «Доставка и оплата»"
         verbose_name_plural = "Страница «Доставка и оплата»"
 
     def __str__(self):
         return "Настройки «Доставка и оплата»"
 
-    @classmethod
-    def get_solo(cls):
-        return cls.objects.first() or cls.objects.create()
-
-    # страховка от дублей
-    def save(self, *args, **kwargs):
-        if not self.pk and DeliveryPageSettings.objects.exists():
-            raise ValidationError(
-                "Разрешена только одна запись настроек «Доставка и оплата»."
-            )
-        return super().save(*args, **kwargs)
-
 
 # === Заказы ===
 
@@ -548,6 +684,36 @@ class Customer(models.Model):
         return self.name or self.email or f"Клиент #{self.pk}"
 
 
+class OrderCounter(models.Model):
+    """
+    Счётчик номеров заказов. Инкремент идёт внутри транзакции оформления и
+    держит блокировку строки до коммита: при откате номер возвращается,
+    поэтому номера идут без дыр.
+    """
+    scope = models.CharField("Область", max_length=10, primary_key=True)  # "" или год
+    value = models.PositiveBigIntegerField("Последний номер", default=0)
+
+    class Meta:
+        verbose_name = "Счётчик заказов"
+        verbose_name_plural = "Счётчики заказов"
+
+    def __str__(self):
+        return f"{self.scope or 'все'}: {self.value}"
+
+    @classmethod
+    def next_value(cls, scope: str = "") -> int:
+        """Следующий номер в области одним запросом (upsert ... RETURNING)."""
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cur:
+            cur.execute(
+                f"INSERT INTO {table} (scope, value) VALUES (%s, 1) "
+                f"ON CONFLICT (scope) DO UPDATE SET value = {table}.value + 1 "
+                f"RETURNING value",
+                [scope],
+            )
+            return cur.fetchone()[0]
+
+
 class Order(models.Model):
     class Status(models.TextChoices):
         NEW = "new", "Новый"
@@ -567,7 +733,6 @@ class Order(models.Model):
         "Номер заказа",
         max_length=20,
         unique=True,
-        null=True,
         blank=True,
         editable=False,
     )
@@ -634,12 +799,20 @@ class Order(models.Model):
     def __str__(self):
         return f"{self.number or 'ORDER-????'} — {self.get_status_display()}"
 
+    @staticmethod
+    def allocate_number() -> str:
+        """
+        Номер нового заказа из OrderCounter: «№-0042» или, при
+        SHOP_ORDER_NUMBER_YEARLY, «№-2026-0042» со счётом с начала года.
+        """
+        if getattr(settings, "SHOP_ORDER_NUMBER_YEARLY", False):
+            year = str(timezone.localdate().year)
+            return f"№-{year}-{OrderCounter.next_value(year):04d}"
+        return f"№-{OrderCounter.next_value():04d}"
+
     def save(self, *args, **kwargs):
-        if not self.pk:
-            super().save(*args, **kwargs)  # получить pk
-            self.number = f"№-{self.pk:04d}"
-            super().save(update_fields=["number"])
-            return
+        if not self.pk and not self.number:
+            self.number = self.allocate_number()  # номер пишется тем же INSERT
         super().save(*args, **kwargs)
 
     def recalc_totals(self, commit=True):
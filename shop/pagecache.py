@@ -0,0 +1,80 @@
+"""
+Кэш целых страниц витрины для анонимных посетителей.
+
+Ключ — версия выкладки (SHOP_CONTENT_VERSION) + путь + нормализованные
+GET-параметры, которые влияют на страницу, + поколения групп данных из
+shop/cache.py. Сигналы моделей сбрасывают
+нужные группы (shop/signals.py), так что изменённая страница сразу
+пересобирается. CSRF-токен в HTML заменяется заглушкой и подставляется
+заново на каждый ответ.
+"""
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .cache import CACHE_REQUESTS, versioned_key
+
+CSRF_PLACEHOLDER = "__SHOP_CSRF_TOKEN__"
+_CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def _enabled() -> bool:
+    return getattr(settings, "SHOP_PAGE_CACHE", True)
+
+
+def page_key(request, params) -> str:
+    query = "&".join(
+        f"{p}={request.GET.get(p, '').strip()}"
+        for p in sorted(params)
+        if request.GET.get(p, "").strip()
+    )
+    version = getattr(settings, "SHOP_CONTENT_VERSION", "")
+    return f"page:{version}:{request.path}?{query}"
+
+
+def _cacheable_request(request) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return False
+    user = getattr(request, "user", None)
+    return not (user and user.is_authenticated)
+
+
+def page_cached(*groups, params=()):
+    """
+    Декоратор view: отдать HTML из кэша, пока не изменились данные групп.
+        @page_cached("menu", "catalog", params=("section", "sort"))
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _enabled() or not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            key = versioned_key(page_key(request, params), *groups)
+            hit = cache.get(key)
+            CACHE_REQUESTS.inc(cache="page", group=view.__name__, result="miss" if hit is None else "hit")
+            if hit is not None:
+                content, content_type = hit
+                if CSRF_PLACEHOLDER in content:
+                    content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+                response = HttpResponse(content, content_type=content_type)
+                response["X-Page-Cache"] = "HIT"
+                return response
+
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render") and callable(response.render):
+                response = response.render()
+            if response.status_code == 200 and not response.cookies and not response.streaming:
+                content = _CSRF_INPUT_RE.sub(
+                    rf"\g<1>{CSRF_PLACEHOLDER}\g<2>", response.content.decode(response.charset)
+                )
+                cache.set(key, (content, response["Content-Type"]),
+                          getattr(settings, "SHOP_PAGE_CACHE_TIMEOUT", 600))
+                response["X-Page-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
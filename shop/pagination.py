@@ -0,0 +1,164 @@
+"""
+Keyset-пагинация каталога.
+
+Ссылки «вперёд/назад» несут курсор — ключ сортировки последней (первой)
+карточки страницы, поэтому следующая страница выбирается по индексу
+`WHERE (price, id) < (…)` без OFFSET. Номер страницы остаётся в URL
+(?page=N), и старые ссылки без курсора тоже работают — через OFFSET.
+Число товаров для «N / M» кэшируется по фильтру в группе «catalog».
+"""
+import base64
+import re
+from math import ceil
+
+from django.db.models import Q
+
+from .cache import cached
+
+# сортировка -> поля ORDER BY; id в конце — однозначный порядок для курсора
+SORTS = {
+    "newest": ("-id",),
+    "oldest": ("id",),
+    "price_desc": ("-price_byn", "-id"),
+    "price_asc": ("price_byn", "id"),
+}
+DEFAULT_SORT = "newest"
+CURSOR_SEP = "_"
+CURSOR_PART_RE = re.compile(r"\d{1,18}")  # ASCII-цифры, влезает в bigint
+
+
+def _reverse(fields):
+    return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in fields)
+
+
+def encode_cursor(obj, fields) -> str:
+    return CURSOR_SEP.join(str(getattr(obj, f.lstrip("-"))) for f in fields)
+
+
+def decode_cursor(raw, fields):
+    parts = (raw or "").split(CURSOR_SEP)
+    if len(parts) != len(fields) or not all(CURSOR_PART_RE.fullmatch(p) for p in parts):
+        return None
+    return [int(p) for p in parts]
+
+
+def encode_opaque_cursor(sort: str, cursor: str) -> str:
+    """Курсор для API: сортировка + ключ, упакованные в base64."""
+    return base64.urlsafe_b64encode(f"{sort}:{cursor}".encode()).decode().rstrip("=")
+
+
+def decode_opaque_cursor(raw: str, sort: str):
+    """Ключ из курсора API; None — битый курсор или курсор другой сортировки."""
+    try:
+        decoded = base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)).decode()
+    except ValueError:  # binascii.Error, UnicodeDecodeError, не-ASCII во входе
+        return None
+    cursor_sort, _, cursor = decoded.partition(":")
+    fields = SORTS.get(sort, SORTS[DEFAULT_SORT])
+    if cursor_sort != sort or decode_cursor(cursor, fields) is None:
+        return None
+    return cursor
+
+
+def _seek(fields, values) -> Q:
+    """Условие «строго после values» для порядка fields: (a, b) > (x, y) по частям."""
+    condition = Q()
+    for i, field in enumerate(fields):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[i]})
+        for prev, value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev.lstrip("-"): value})
+        condition |= step
+    return condition
+
+
+def _to_int(value, default=1) -> int:
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return default
+
+
+class KeysetPage:
+    """Страница каталога; интерфейс как у django.core.paginator.Page для шаблона."""
+
+    def __init__(self, items, number, count, per_page, next_cursor, previous_cursor):
+        self.object_list = items
+        self.number = number
+        self.count = count
+        self.num_pages = max(1, ceil(count / per_page))
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def paginator(self):
+        return self  # шаблон читает products.paginator.num_pages
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def cached_count(qs, count_key) -> int:
+    return cached(f"catalog_count:{count_key}", qs.count, "catalog")
+
+
+def keyset_slice(qs, *, sort, after=None, per_page=8):
+    """
+    (строки, курсор следующего среза или None) — страница после курсора after.
+    Невалидный курсор считается началом списка.
+    """
+    fields = SORTS.get(sort, SORTS[DEFAULT_SORT])
+    ordered = qs.order_by(*fields)
+    values = decode_cursor(after, fields)
+    if values is not None:
+        ordered = ordered.filter(_seek(fields, values))
+    rows = list(ordered[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    return rows, (encode_cursor(rows[-1], fields) if rows and has_more else None)
+
+
+def keyset_page(qs, params, *, sort, count_key, per_page=8) -> KeysetPage:
+    """
+    Страница qs по GET-параметрам page / after / before.
+    count_key — ключ кэша для количества (разный для каждого фильтра).
+    """
+    fields = SORTS.get(sort, SORTS[DEFAULT_SORT])
+    count = cached_count(qs, count_key)
+    num_pages = max(1, ceil(count / per_page))
+    number = min(_to_int(params.get("page")), num_pages)
+
+    after = decode_cursor(params.get("after"), fields)
+    before = decode_cursor(params.get("before"), fields) if after is None else None
+
+    if before is not None:
+        rows = list(qs.filter(_seek(_reverse(fields), before)).order_by(*_reverse(fields))[:per_page])
+        rows.reverse()  # пришли со следующей страницы — она точно есть
+        next_cursor = encode_cursor(rows[-1], fields) if rows else None
+    elif after is not None or number == 1:
+        rows, next_cursor = keyset_slice(qs, sort=sort, after=params.get("after"), per_page=per_page)
+    else:
+        offset = (number - 1) * per_page  # старые ?page=N без курсора
+        rows = list(qs.order_by(*fields)[offset:offset + per_page + 1])
+        next_cursor = encode_cursor(rows[per_page - 1], fields) if len(rows) > per_page else None
+        rows = rows[:per_page]
+
+    # на первую страницу ведём чистым ?page=1 — это дёшево и без дублей URL
+    previous_cursor = encode_cursor(rows[0], fields) if rows and number > 2 else None
+    return KeysetPage(rows, number, count, per_page, next_cursor, previous_cursor)
@@ -0,0 +1,166 @@
+"""
+Замеры времени запросов: где тратится время — Postgres, шаблон или миниатюры.
+
+PerfMiddleware на выбранной доле запросов (SHOP_PERF_SAMPLE_RATE) заводит
+профиль запроса и считает отрезки (spans):
+    db     — execute_wrapper на всех соединениях: число запросов и время;
+    tpl    — рендер шаблона верхнего уровня (бэкенд TimedDjangoTemplates);
+    thumb  — поиск кадрированных миниатюр (shop/thumbnails.py);
+плюс любые свои через `with span("имя"):`.
+
+Результат: заголовок Server-Timing (виден в DevTools), строка JSON в логгер
+«shop.perf» и гистограммы по view в core/metrics.py (общие для всех
+воркеров, отдаются на /metrics). Общее время пишется в гистограмму для
+каждого запроса, отрезки — только для попавших в выборку.
+`manage.py perf_report` показывает по ним p50/p95/p99.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+from core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+def sample_rate() -> float:
+    return getattr(settings, "SHOP_PERF_SAMPLE_RATE", 0.0)
+
+
+# --- профиль запроса ---
+
+class Profile:
+    """Накопленные отрезки текущего запроса: имя -> [мс, количество]."""
+
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, name, ms) -> None:
+        entry = self.spans.setdefault(name, [0.0, 0])
+        entry[0] += ms
+        entry[1] += 1
+
+
+_profile = ContextVar("shop_perf_profile", default=None)
+
+
+@contextmanager
+def span(name):
+    """Посчитать время блока в отрезок name (вне выборки — ничего не делает)."""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, (time.perf_counter() - start) * 1000)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    with span("db"):
+        return execute(sql, params, many, context)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with span("tpl"):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Обычный бэкенд Django, рендер шаблона верхнего уровня идёт в отрезок «tpl»."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# --- гистограммы (core/metrics.py, /metrics) ---
+
+REQUEST_SECONDS = Histogram(
+    "shop_http_request_duration_seconds", "Время ответа по view, все запросы", ("view",),
+)
+SPAN_SECONDS = Histogram(
+    "shop_request_span_seconds", "Время отрезков запроса (db, tpl, thumb) по выборке", ("view", "span"),
+)
+DB_QUERIES = Histogram(
+    "shop_db_queries_per_request", "Запросов к БД на HTTP-запрос по выборке", ("view",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+
+
+# --- middleware ---
+
+def _view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "-"
+
+
+def _server_timing(profile, total_ms) -> str:
+    parts = [f'{name};dur={ms:.1f};desc="{n}"' for name, (ms, n) in profile.spans.items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+class PerfMiddleware:
+    """Ставить первым в MIDDLEWARE, чтобы общее время включало всё остальное."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        sampled = random.random() < sample_rate()
+        if not sampled:
+            response = self.get_response(request)
+            self._observe(request, (time.perf_counter() - start) * 1000, None)
+            return response
+
+        profile = Profile()
+        token = _profile.set(profile)
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_db_wrapper))
+                response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+
+        total_ms = (time.perf_counter() - start) * 1000
+        view = self._observe(request, total_ms, profile)
+        if getattr(settings, "SHOP_PERF_SERVER_TIMING", True):
+            response["Server-Timing"] = _server_timing(profile, total_ms)
+        logger.info(json.dumps({
+            "view": view,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 1),
+            **{
+                f"{name}_ms": round(ms, 1) for name, (ms, _n) in profile.spans.items()
+            },
+            **{
+                f"{name}_count": n for name, (_ms, n) in profile.spans.items()
+            },
+        }, ensure_ascii=False))
+        return response
+
+    def _observe(self, request, total_ms, profile) -> str:
+        view = _view_name(request)
+        REQUEST_SECONDS.observe(total_ms / 1000, view=view)
+        if profile is not None:
+            for name, (ms, _n) in profile.spans.items():
+                SPAN_SECONDS.observe(ms / 1000, view=view, span=name)
+            DB_QUERIES.observe(profile.spans.get("db", (0, 0))[1], view=view)
+        return view
@@ -0,0 +1,215 @@
+"""
+«С этим товаром покупают» — рекомендации по совместным покупкам.
+
+Пакетная задача (manage.py build_recommendations) считает разреженную
+матрицу совместных покупок из OrderItem (отменённые заказы не в счёт)
+в CoPurchase и хранит топ-K соседей каждого товара в ProductRecommendation.
+Инкрементальный прогон берёт только заказы после чекпоинта и пересчитывает
+топ-K лишь затронутых товаров; заказы, отменённые уже после учёта,
+вычищает полный пересчёт (--full), его стоит гонять раз в сутки.
+
+Витрина читает топ-K из кэша (группа «recs») и карту цен корзины —
+без запросов к БД.
+"""
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .cache import bump_generation, cached, get_generation
+from .cart import price_map
+from .models import BatchCheckpoint, CoPurchase, Order, OrderItem, ProductRecommendation
+
+CHECKPOINT = "copurchase"
+GROUP = "recs"
+BATCH_SIZE = 5000
+
+
+def _top_k() -> int:
+    return getattr(settings, "SHOP_RECS_TOP_K", 8)
+
+
+# --- расчёт ---
+
+def baskets(after_id=0, upto_id=None):
+    """{order_id: {product_id, ...}} по неотменённым заказам из диапазона id."""
+    items = OrderItem.objects.filter(order_id__gt=after_id).exclude(order__status=Order.Status.CANCELED)
+    if upto_id is not None:
+        items = items.filter(order_id__lte=upto_id)
+    result = defaultdict(set)
+    for order_id, product_id in items.values_list("order_id", "product_id").iterator(chunk_size=BATCH_SIZE):
+        result[order_id].add(product_id)
+    return result
+
+
+def count_pairs(basket_sets) -> Counter:
+    """(a, b) -> число корзин, где встретились оба товара; обе стороны пары."""
+    pairs = Counter()
+    for products in basket_sets:
+        if len(products) < 2:
+            continue
+        for a, b in combinations(sorted(products), 2):
+            pairs[(a, b)] += 1
+    for (a, b), n in list(pairs.items()):
+        pairs[(b, a)] = n
+    return pairs
+
+
+def top_neighbours(pairs, k) -> dict:
+    """product -> [(other, orders)] по убыванию orders, при равенстве — новые товары выше."""
+    rows = defaultdict(list)
+    for (a, b), n in pairs.items():
+        rows[a].append((n, b))
+    return {a: [(b, n) for n, b in sorted(lst, reverse=True)[:k]] for a, lst in rows.items()}
+
+
+# --- запись ---
+
+def _write_top(product_ids, k) -> None:
+    """Пересобрать ProductRecommendation для product_ids из CoPurchase."""
+    product_ids = list(product_ids)
+    neighbours = defaultdict(list)
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        chunk = product_ids[start:start + BATCH_SIZE]
+        for product_id, other_id, orders in (
+            CoPurchase.objects.filter(product_id__in=chunk)
+            .values_list("product_id", "other_id", "orders")
+            .iterator(chunk_size=BATCH_SIZE)
+        ):
+            neighbours[product_id].append((orders, other_id))
+        ProductRecommendation.objects.filter(product_id__in=chunk).delete()
+
+    ProductRecommendation.objects.bulk_create(
+        [
+            ProductRecommendation(product_id=pk, recommended_id=other, position=i, score=orders)
+            for pk, lst in neighbours.items()
+            for i, (orders, other) in enumerate(sorted(lst, reverse=True)[:k])
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def _checkpoint():
+    checkpoint, _ = BatchCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    # блокировка: два прогона одновременно посчитали бы заказы дважды
+    return BatchCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+
+
+@transaction.atomic
+def rebuild_all() -> dict:
+    """Полный пересчёт матрицы и топ-K по всем заказам."""
+    checkpoint = _checkpoint()
+    upto = Order.objects.aggregate(m=Max("id"))["m"] or 0
+    pairs = count_pairs(baskets(upto_id=upto).values())
+
+    CoPurchase.objects.all().delete()
+    ProductRecommendation.objects.all().delete()
+    CoPurchase.objects.bulk_create(
+        [CoPurchase(product_id=a, other_id=b, orders=n) for (a, b), n in pairs.items()],
+        batch_size=BATCH_SIZE,
+    )
+    k = _top_k()
+    ProductRecommendation.objects.bulk_create(
+        [
+            ProductRecommendation(product_id=pk, recommended_id=other, position=i, score=orders)
+            for pk, lst in top_neighbours(pairs, k).items()
+            for i, (other, orders) in enumerate(lst)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    checkpoint.position = upto
+    checkpoint.save(update_fields=["position", "updated_at"])
+    transaction.on_commit(lambda: bump_generation(GROUP))
+    return {"orders_upto": upto, "pairs": len(pairs) // 2, "products": len({a for a, _ in pairs})}
+
+
+@transaction.atomic
+def refresh_incremental() -> dict:
+    """Учесть заказы после чекпоинта и пересчитать топ-K затронутых товаров."""
+    checkpoint = _checkpoint()
+    upto = Order.objects.filter(id__gt=checkpoint.position).aggregate(m=Max("id"))["m"]
+    if upto is None:
+        return {"orders_upto": checkpoint.position, "pairs": 0, "products": 0}
+
+    deltas = count_pairs(baskets(after_id=checkpoint.position, upto_id=upto).values())
+    affected = {a for a, _ in deltas}
+    if deltas:
+        existing = {
+            (row.product_id, row.other_id): row
+            for row in CoPurchase.objects.filter(product_id__in=affected, other_id__in=affected)
+        }
+        changed, created = [], []
+        for (a, b), n in deltas.items():
+            row = existing.get((a, b))
+            if row is None:
+                created.append(CoPurchase(product_id=a, other_id=b, orders=n))
+            else:
+                row.orders += n
+                changed.append(row)
+        CoPurchase.objects.bulk_update(changed, ["orders"], batch_size=BATCH_SIZE)
+        CoPurchase.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        _write_top(affected, _top_k())
+
+    checkpoint.position = upto
+    checkpoint.save(update_fields=["position", "updated_at"])
+    if affected:
+        transaction.on_commit(lambda: bump_generation(GROUP))
+    return {"orders_upto": upto, "pairs": len(deltas) // 2, "products": len(affected)}
+
+
+# --- витрина ---
+
+def _build_map() -> dict:
+    result = defaultdict(list)
+    for product_id, recommended_id, score in (
+        ProductRecommendation.objects.order_by("product_id", "position")
+        .values_list("product_id", "recommended_id", "score")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        result[product_id].append((recommended_id, score))
+    return dict(result)
+
+
+_recs_map = (None, {})  # (поколение «recs», карта) — копия в памяти воркера
+
+
+def recommendations_map() -> dict:
+    """product_id -> [(recommended_id, score)]."""
+    global _recs_map
+    gen = get_generation(GROUP)
+    if _recs_map[0] != gen:
+        _recs_map = (gen, cached("recs_map", _build_map, GROUP))
+    return _recs_map[1]
+
+
+def also_bought(product_ids, limit=4) -> list:
+    """
+    Рекомендации для набора товаров (карточка — один товар, корзина — все):
+    очки соседей складываются, сами товары набора и скрытые отбрасываются.
+    [{id, name, slug, price_byn, image}]
+    """
+    product_ids = set(product_ids)
+    recs = recommendations_map()
+    scores = Counter()
+    for pk in product_ids:
+        for other, score in recs.get(pk, ()):
+            if other not in product_ids:
+                scores[other] += score
+    prices = price_map(scores)  # скрытых в ответе нет
+    ranked = sorted(
+        ((pk, score) for pk, score in scores.items() if pk in prices),
+        key=lambda kv: (kv[1], kv[0]), reverse=True,
+    )[:limit]
+    return [
+        {
+            "id": pk,
+            "name": prices[pk]["name"],
+            "slug": prices[pk]["slug"],
+            "price_byn": prices[pk]["price"],
+            "image": prices[pk]["image"],
+        }
+        for pk, _score in ranked
+    ]
@@ -0,0 +1,85 @@
+"""
+Блок «Похожие товары» на карточке товара.
+
+Списки хранятся в RelatedProduct и читаются одним запросом. Правило:
+товары той же категории (-is_new, -id), добор — из всего каталога.
+Пересчёт — по категориям (shop/signals.py), когда в них добавили,
+скрыли, перевели или пометили «новинкой» товар. Категории, где товаров
+не хватает на блок, добирают из общего списка — их пересчитываем всегда.
+"""
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Product, RelatedProduct
+
+RELATED_LIMIT = 4
+ORDERING = ("-is_new", "-id")
+
+
+def _pick(product_id, same_category, top) -> list:
+    picked = [pk for pk in same_category if pk != product_id][:RELATED_LIMIT]
+    for pk in top:
+        if len(picked) >= RELATED_LIMIT:
+            break
+        if pk != product_id and pk not in picked:
+            picked.append(pk)
+    return picked
+
+
+def _small_categories(product_model=Product) -> list:
+    """Категории, где на блок не хватает «своих» товаров."""
+    return list(
+        product_model.objects.filter(is_active=True)
+        .values("category")
+        .annotate(n=Count("id"))
+        .filter(n__lte=RELATED_LIMIT)
+        .values_list("category", flat=True)
+    )
+
+
+def refresh_related(category_ids=None, apps=None) -> int:
+    """
+    Пересчитать списки товаров из category_ids (None — весь каталог).
+    Возвращает число пересчитанных товаров. apps — реестр моделей миграции
+    (заполнение таблицы в 0039_backfill_related).
+    """
+    product_model = apps.get_model("shop", "Product") if apps else Product
+    link_model = apps.get_model("shop", "RelatedProduct") if apps else RelatedProduct
+    active = product_model.objects.filter(is_active=True)
+    if category_ids is not None:
+        active = active.filter(category_id__in={*category_ids, *_small_categories(product_model)})
+    rows = list(active.order_by(*ORDERING).values_list("id", "category_id"))
+    # запас на исключение самого товара и уже выбранных
+    top = list(
+        product_model.objects.filter(is_active=True)
+        .order_by(*ORDERING)
+        .values_list("id", flat=True)[:RELATED_LIMIT * 2 + 1]
+    )
+
+    by_category = {}
+    for pk, cat in rows:
+        by_category.setdefault(cat, []).append(pk)
+
+    links = [
+        link_model(product_id=pk, related_id=related_id, position=i)
+        for pk, cat in rows
+        for i, related_id in enumerate(_pick(pk, by_category[cat], top))
+    ]
+    with transaction.atomic():
+        stale = link_model.objects.all()
+        if category_ids is not None:
+            stale = stale.filter(product_id__in=[pk for pk, _ in rows])
+        stale.delete()
+        link_model.objects.bulk_create(links)
+    return len(rows)
+
+
+def related_products(product) -> list:
+    """Похожие товары для карточки — один запрос по (product, position)."""
+    links = (
+        RelatedProduct.objects.filter(product=product, related__is_active=True)
+        .select_related("related")
+        .only("related__id", "related__name", "related__slug", "related__price_byn", "related__image")
+        .order_by("position")
+    )
+    return [link.related for link in links]
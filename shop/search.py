@@ -0,0 +1,85 @@
+"""
+Поиск товаров для /api/search/.
+
+На Postgres: tsvector (русская морфология) с весами name > категория >
+short_desc, префиксный tsquery для ввода «на лету» и pg_trgm по названию
+для опечаток; сортировка по релевантности. На прочих СУБД (SQLite в тестах)
+— прежний icontains.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import Product
+
+SEARCH_CONFIG = "russian"
+TRIGRAM_MIN_LENGTH = 3  # короче — триграммы дают шум
+
+# Ведём tsvector одним UPDATE: название категории лежит в другой таблице
+UPDATE_VECTOR_SQL = f"""
+UPDATE shop_product AS p SET search_vector =
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(p.name, '')), 'A') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(c.name, '') || ' ' || coalesce(pc.name, '')), 'B') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(p.short_desc, '')), 'C')
+FROM shop_category AS c
+LEFT JOIN shop_category AS pc ON pc.id = c.parent_id
+WHERE c.id = p.category_id
+"""
+
+
+def is_postgres() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def update_search_vectors(product_ids=None, category_ids=None) -> None:
+    """Пересчитать tsvector для товаров (или товаров категорий и их подкатегорий)."""
+    if not is_postgres():
+        return
+    sql, params = UPDATE_VECTOR_SQL, []
+    if product_ids is not None:
+        sql += " AND p.id = ANY(%s)"
+        params.append(list(product_ids))
+    if category_ids is not None:
+        sql += " AND (c.id = ANY(%s) OR c.parent_id = ANY(%s))"
+        params += [list(category_ids), list(category_ids)]
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+
+
+def _prefix_tsquery(q: str) -> str:
+    words = re.findall(r"\w+", q.lower())
+    return " & ".join(f"{w}:*" for w in words)
+
+
+def search_products(q: str, limit: int = 10):
+    """Активные товары по запросу, самые релевантные первыми."""
+    base = Product.objects.filter(is_active=True).only("id", "name", "slug", "price_byn", "image")
+    if not is_postgres():
+        return list(
+            base.filter(
+                Q(name__icontains=q) |
+                Q(short_desc__icontains=q) |
+                Q(category__name__icontains=q)
+            ).order_by("-is_new", "-id")[:limit]
+        )
+
+    tsquery = _prefix_tsquery(q)
+    if not tsquery:
+        return []
+    query = SearchQuery(tsquery, search_type="raw", config=SEARCH_CONFIG)
+    match = Q(search_vector=query)
+    if len(q) >= TRIGRAM_MIN_LENGTH:
+        match |= Q(name__trigram_similar=q)
+    return list(
+        base.filter(match)
+        .annotate(
+            score=Greatest(
+                SearchRank(F("search_vector"), query),
+                TrigramSimilarity("name", q),
+            )
+        )
+        .order_by("-score", "-is_new", "-id")[:limit]
+    )
@@ -1,5 +1,17 @@
+from decimal import Decimal
+
 from django.db import transaction
-from .models import Customer
+from core.metrics import Counter
+from imageops.variants import ensure_variants, name_from_url
+
+from .cache import bump_generation
+from .models import Customer, Order, OrderItem, Payment, Product, ProductPhoto
+from .thumbnails import thumbnail_url
+
+ORDERS_CREATED = Counter("shop_orders_created_total", "Оформлено заказов")
+CHECKOUT_FAILURES = Counter(
+    "shop_checkout_failures_total", "Неудачные оформления: empty_cart, email_required, error", ("reason",),
+)
 
 
 def _normalize_username(s: str) -> str:
@@ -33,7 +45,7 @@ def _coerce_contact_pref(value: str | None) -> str | None:
     return allowed.get(value)
 
 
-@transaction.atomic
+@transaction.atomic(savepoint=False)  # вызывается внутри checkout: лишний SAVEPOINT — лишние round trip'ы
 def upsert_customer_from_checkout(
     email: str,
     name: str = "",
@@ -91,3 +103,79 @@ def upsert_customer_from_checkout(
         ])
 
     return cust
+
+
+def refresh_product_cover(product_id: int) -> None:
+    """
+    Пересчитать обложку товара для карточек каталога: первое активное фото
+    (position, id) и URL его кадрированной миниатюры. Пишем через update(),
+    чтобы не дёргать сигналы Product.
+    """
+    first = (
+        ProductPhoto.objects.filter(product_id=product_id, is_active=True)
+        .order_by("position", "id")
+        .first()
+    )
+    url = ""
+    if first:
+        try:
+            url = thumbnail_url(first, "image_crop")
+        except Exception:
+            url = ""  # битый файл — карточка возьмёт фолбэк из шаблона
+        if url:
+            ensure_variants(name_from_url(url))  # srcset для карточек каталога
+    Product.objects.filter(pk=product_id).update(cover=first, cover_url=url[:500])
+    bump_generation("catalog")
+
+
+@transaction.atomic(savepoint=False)
+def place_order(
+    *,
+    customer: Customer,
+    lines,
+    shipping_cost: Decimal = Decimal("0"),
+    discount: Decimal = Decimal("0"),
+    payment_provider: str = Payment.Provider.CARD,
+    **fields,
+) -> Order:
+    """
+    Создать заказ с позициями и платежом PENDING минимумом запросов:
+    суммы считаются в памяти, номер выдаёт OrderCounter до INSERT, позиции
+    пишутся одним bulk_create. lines — [(product, qty, price_byn)].
+    """
+    items, subtotal = [], Decimal("0")
+    for product, qty, price in lines:
+        line_total = price * qty  # bulk_create не вызывает OrderItem.save
+        items.append(OrderItem(
+            product=product,
+            product_name=product.name,  # срез имени
+            sku="",
+            qty=qty,
+            price_byn=price,  # срез цены
+            line_total=line_total,
+        ))
+        subtotal += line_total
+
+    order = Order(
+        customer=customer,
+        subtotal=subtotal,
+        shipping_cost=shipping_cost,
+        discount=discount,
+        total=subtotal + shipping_cost - discount,
+        **fields,
+    )
+    order.save(force_insert=True)
+
+    for item in items:
+        item.order = order
+    OrderItem.objects.bulk_create(items)
+
+    Payment.objects.create(
+        order=order,
+        provider=payment_provider,
+        amount=order.total,
+        currency=order.currency,
+        status=Payment.PStatus.PENDING,
+    )
+    transaction.on_commit(ORDERS_CREATED.inc)
+    return order
@@ -0,0 +1,131 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from imageops.signals import image_processed
+
+from .cache import bump_generation
+from .models import (
+    Category, Product, ProductPhoto, NewTabSettings, HomePageSettings,
+    AboutPageSettings, ContactPageSettings, DeliveryPageSettings, SingletonSettings,
+)
+from .related import refresh_related
+from .search import update_search_vectors
+from .services import refresh_product_cover
+from .suggest import mark_dirty
+from .thumbnails import THUMBNAIL_SPECS, pregenerate
+
+# Модель -> группы кэша (shop/cache.py), которые она инвалидирует
+CACHE_GROUPS = {
+    Category: ("menu", "catalog"),
+    Product: ("catalog",),
+    ProductPhoto: ("catalog",),
+    NewTabSettings: ("catalog",),
+    HomePageSettings: ("home",),
+    AboutPageSettings: ("about",),
+    ContactPageSettings: ("contact",),
+    DeliveryPageSettings: ("delivery",),
+}
+
+
+def invalidate_caches(sender, **kwargs):
+    groups = CACHE_GROUPS[sender]
+    # после коммита: иначе параллельный запрос закэширует ещё старые данные
+    transaction.on_commit(lambda: bump_generation(*groups))
+
+
+for _model in CACHE_GROUPS:
+    for _signal in (post_save, post_delete):
+        _signal.connect(invalidate_caches, sender=_model, dispatch_uid=f"invalidate_{_model.__name__}")
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {"name", "short_desc", "category"} & set(update_fields):
+        return
+    product_id = instance.pk
+    transaction.on_commit(lambda: update_search_vectors(product_ids=[product_id]))
+
+
+# поля товара, от которых зависят блоки «Похожие товары» (shop/related.py)
+RELATED_FIELDS = ("category_id", "is_active", "is_new")
+
+
+@receiver(pre_save, sender=Product)
+def product_remember_related_fields(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = Product.objects.filter(pk=instance.pk).values(*RELATED_FIELDS).first()
+    instance.__dict__["_related_old"] = old
+
+
+@receiver(post_save, sender=Product)
+def product_related_changed(sender, instance, created, **kwargs):
+    old = instance.__dict__.pop("_related_old", None)
+    if not created and old and all(old[f] == getattr(instance, f) for f in RELATED_FIELDS):
+        return
+    categories = {instance.category_id} | ({old["category_id"]} if old else set())
+    transaction.on_commit(lambda: refresh_related(categories))
+
+
+@receiver(post_delete, sender=Product)
+def product_related_deleted(sender, instance, **kwargs):
+    category_id = instance.category_id
+    transaction.on_commit(lambda: refresh_related([category_id]))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_suggest_changed(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: mark_dirty([product_id]))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    category_id = instance.pk
+
+    def refresh():
+        update_search_vectors(category_ids=[category_id])
+        mark_dirty(
+            Product.objects.filter(Q(category_id=category_id) | Q(category__parent_id=category_id))
+            .values_list("id", flat=True)
+        )
+
+    transaction.on_commit(refresh)
+
+
+@receiver([post_save, post_delete], sender=ProductPhoto)
+def product_photo_changed(sender, instance, **kwargs):
+    product_id = instance.product_id
+    transaction.on_commit(lambda: refresh_product_cover(product_id))
+
+
+def pregenerate_thumbnails(sender, instance, **kwargs):
+    def run():
+        pregenerate(instance)
+        if issubclass(sender, SingletonSettings):
+            # в копии get_solo() могли попасть оригиналы вместо ещё не нарезанных миниатюр
+            sender.invalidate_solo()
+            bump_generation(*CACHE_GROUPS[sender])
+
+    transaction.on_commit(run)
+
+
+for _model in THUMBNAIL_SPECS:
+    post_save.connect(pregenerate_thumbnails, sender=_model, dispatch_uid=f"pregenerate_{_model.__name__}")
+
+
+@receiver(image_processed)
+def image_swapped(sender, instance, **kwargs):
+    # воркер imageops подменил файл — старые миниатюры больше не находятся
+    if sender in THUMBNAIL_SPECS:
+        pregenerate(instance)
+    if sender is ProductPhoto:
+        refresh_product_cover(instance.product_id)
+    if sender is Product:
+        mark_dirty([instance.pk])
+    if issubclass(sender, SingletonSettings):
+        sender.invalidate_solo()  # в копии get_solo() старое имя файла
+    if sender in CACHE_GROUPS:
+        bump_generation(*CACHE_GROUPS[sender])
@@ -0,0 +1,273 @@
+"""
+Подсказки поиска из памяти воркера.
+
+Весь каталог активных товаров помещается в память, поэтому /api/search/
+отвечает из индекса префиксов слов (+ триграммы названия для опечаток)
+без запросов к БД. Индекс свой в каждом воркере; сигналы Product/Category
+(shop/signals.py) пишут id изменённых товаров в общий кэш под новым
+поколением группы «search» вместе с предыдущим поколением, и каждый
+воркер при следующем запросе проходит эту цепочку от текущего поколения
+до своего и догружает только эти товары. Если звено цепочки вытеснено
+или цепочка ведёт мимо поколения воркера — полная пересборка. Файловый кэш
+не умеет compare-and-set: два одновременных mark_dirty могут сослаться на
+одно и то же предыдущее поколение, и одна запись выпадет из цепочки —
+поэтому mark_dirty проверяет, что его запись видна от текущего поколения,
+и иначе публикует её заново.
+Последние ответы лежат в LRU и сбрасываются при любом изменении индекса.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from .cache import get_generation, new_generation, set_generation
+from .models import Product
+
+GROUP = "search"
+DIRTY_TIMEOUT = 60 * 60
+MAX_JOURNAL = 1000  # длиннее цепочка — дешевле пересобрать индекс
+PUBLISH_ATTEMPTS = 3
+TRIGRAM_MIN_LENGTH = 3
+TRIGRAM_THRESHOLD = 0.3  # как pg_trgm.similarity_threshold по умолчанию
+
+# Веса полей — как у tsvector в shop/search.py: название > категория > описание
+WEIGHTS = (("name", 3), ("category", 2), ("desc", 1))
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def enabled() -> bool:
+    return getattr(settings, "SHOP_SEARCH_SUGGEST", True)
+
+
+def _words(text: str) -> list:
+    return _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+
+
+def _trigrams(text: str) -> set:
+    grams = set()
+    for word in _words(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _dirty_key(gen: int) -> str:
+    return f"shop:suggest:dirty:{gen}"
+
+
+def _publish(ids) -> tuple:
+    """Дописать запись журнала; (её поколение, предыдущее)."""
+    prev = get_generation(GROUP)
+    gen = new_generation(prev)
+    # запись журнала — до смены поколения, чтобы воркер не увидел поколение без неё
+    cache.set(_dirty_key(gen), {"prev": prev, "ids": ids}, DIRTY_TIMEOUT)
+    set_generation(GROUP, gen)
+    return gen, prev
+
+
+def mark_dirty(product_ids) -> None:
+    """Сообщить всем воркерам, что товары изменились (вызывать после коммита)."""
+    ids = list(product_ids)
+    for _ in range(PUBLISH_ATTEMPTS):
+        gen, prev = _publish(ids)
+        journal = _journal(get_generation(GROUP), prev)
+        # None — цепочка порвана, воркеры и так пересоберут индекс целиком
+        if journal is None or gen in journal:
+            return
+        # параллельный mark_dirty сослался на то же prev и перезаписал поколение
+    _publish(None)  # не удалось встроиться в цепочку — пусть воркеры пересоберут индекс
+
+
+def _journal(current: int, since: int):
+    """Записи журнала {поколение: id или None} от since (не включая) до current; None — цепочка порвана."""
+    journal = {}
+    gen = current
+    while gen != since:
+        if gen < since or len(journal) >= MAX_JOURNAL:
+            return None
+        entry = cache.get(_dirty_key(gen))
+        if entry is None:
+            return None
+        journal[gen] = entry["ids"]
+        gen = entry["prev"]
+    return journal
+
+
+class SuggestIndex:
+    def __init__(self, lru_size: int = 512):
+        self.lru_size = lru_size
+        self.generation = None
+        self.entries = {}    # id -> {"item": ответ API, "fields": {поле: set(слов)}, ...}
+        self.prefixes = {}   # префикс слова -> set(id)
+        self.trigrams = {}   # триграмма названия -> set(id)
+        self.lru = OrderedDict()
+        self.lock = threading.Lock()
+
+    # --- наполнение ---
+
+    def _queryset(self):
+        return (
+            Product.objects.filter(is_active=True)
+            .select_related("category__parent")
+            .only(
+                "id", "name", "slug", "price_byn", "image", "is_new", "short_desc",
+                "category__name", "category__parent__name",
+            )
+        )
+
+    def _add(self, p) -> None:
+        category = p.category
+        fields = {
+            "name": set(_words(p.name)),
+            "category": set(_words(category.name if category else ""))
+            | set(_words(category.parent.name if category and category.parent else "")),
+            "desc": set(_words(p.short_desc)),
+        }
+        grams = _trigrams(p.name)
+        self.entries[p.id] = {
+            "item": {
+                "id": p.id,
+                "name": p.name,
+                "slug": p.slug,
+                "price": int(p.price_byn),
+                "image": (p.image.url if p.image else ""),
+                "url": reverse("shop:product-detail", args=[p.slug]),
+            },
+            "fields": fields,
+            "grams": grams,
+            "is_new": p.is_new,
+        }
+        for word in set().union(*fields.values()):
+            for i in range(1, len(word) + 1):
+                self.prefixes.setdefault(word[:i], set()).add(p.id)
+        for g in grams:
+            self.trigrams.setdefault(g, set()).add(p.id)
+
+    def _remove(self, product_id) -> None:
+        entry = self.entries.pop(product_id, None)
+        if entry is None:
+            return
+        for word in set().union(*entry["fields"].values()):
+            for i in range(1, len(word) + 1):
+                ids = self.prefixes.get(word[:i])
+                if ids is not None:
+                    ids.discard(product_id)
+                    if not ids:
+                        del self.prefixes[word[:i]]
+        for g in entry["grams"]:
+            ids = self.trigrams.get(g)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self.trigrams[g]
+
+    def rebuild(self, generation) -> None:
+        self.entries, self.prefixes, self.trigrams = {}, {}, {}
+        for p in self._queryset():
+            self._add(p)
+        self.generation = generation
+        self.lru.clear()
+
+    def refresh(self, product_ids, generation) -> None:
+        ids = set(product_ids)
+        for pk in ids:
+            self._remove(pk)
+        if ids:
+            for p in self._queryset().filter(pk__in=ids):
+                self._add(p)
+        self.generation = generation
+        self.lru.clear()
+
+    def sync(self) -> None:
+        """Догнать общее поколение: догрузить изменённые товары или пересобрать."""
+        current = get_generation(GROUP)
+        if current == self.generation:
+            return
+        journal = None if self.generation is None else _journal(current, self.generation)
+        if journal is None or None in journal.values():
+            self.rebuild(current)
+            return
+        self.refresh({pk for ids in journal.values() for pk in ids}, current)
+
+    # --- поиск ---
+
+    def _match(self, words) -> dict:
+        """id -> очки; каждое слово запроса должно быть префиксом слова товара."""
+        candidates = None
+        for w in words:
+            ids = self.prefixes.get(w, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return {}
+        scores = {}
+        for pk in candidates:
+            fields = self.entries[pk]["fields"]
+            scores[pk] = sum(
+                weight
+                for w in words
+                for field, weight in WEIGHTS
+                if any(token.startswith(w) for token in fields[field])
+            )
+        return scores
+
+    def _fuzzy(self, q) -> dict:
+        """Похожие по триграммам названия (для опечаток)."""
+        grams = _trigrams(q)
+        if not grams:
+            return {}
+        hits = {}
+        for g in grams:
+            for pk in self.trigrams.get(g, ()):
+                hits[pk] = hits.get(pk, 0) + 1
+        scores = {}
+        for pk, common in hits.items():
+            similarity = common / len(grams | self.entries[pk]["grams"])
+            if similarity >= TRIGRAM_THRESHOLD:
+                scores[pk] = similarity
+        return scores
+
+    def search(self, q: str, limit: int = 10) -> list:
+        key = (q.lower(), limit)
+        with self.lock:
+            self.sync()
+            if key in self.lru:
+                self.lru.move_to_end(key)
+                return self.lru[key]
+
+            words = _words(q)
+            scores = self._match(words) if words else {}
+            if not scores and len(q) >= TRIGRAM_MIN_LENGTH:
+                scores = self._fuzzy(q)
+            ranked = sorted(
+                scores,
+                key=lambda pk: (scores[pk], self.entries[pk]["is_new"], pk),
+                reverse=True,
+            )
+            result = [self.entries[pk]["item"] for pk in ranked[:limit]]
+
+            self.lru[key] = result
+            if len(self.lru) > self.lru_size:
+                self.lru.popitem(last=False)
+            return result
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SuggestIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SuggestIndex(getattr(settings, "SHOP_SEARCH_SUGGEST_LRU", 512))
+    return _index
+
+
+def suggest(q: str, limit: int = 10) -> list:
+    """Ответ для /api/search/: список словарей товаров, самые релевантные первыми."""
+    return get_index().search(q, limit)
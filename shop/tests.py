@@ -1,3 +1,623 @@
-from django.test import TestCase
+"""
+Регрессии по числу запросов к БД и скорости горячих функций.
 
-# Create your tests here.
+Каждая страница из shop.urls и основные списки/формы админки открываются
+на маленьком каталоге, потом каталог вырастает в GROWTH раз — число
+запросов не должно меняться (иначе где-то запрос на строку) и не должно
+превышать бюджет из STOREFRONT / ADMIN. При провале печатается весь SQL
+страницы, повторяющиеся запросы — первыми. Там же — пересжатие медиатеки
+(imageops_recompress) на настоящих моделях магазина.
+
+    python manage.py test shop
+"""
+import io
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from imageops.models import RecompressCheckpoint
+
+from . import suggest
+from .cache import _gen_key, bump_generation, cached, get_generation
+from .cart import COOKIE_NAME, COOKIE_SALT, Cart, check_storage, dumps, price_map
+from .models import (
+    Category, Customer, HomePageSettings, Order, OrderCounter, OrderItem, Payment, Product, ProductPhoto,
+)
+from .pagination import encode_opaque_cursor
+from .recommendations import rebuild_all
+from .related import refresh_related
+from .views import _cart_context, _get_cart_rows, _menu_sections
+
+SMALL = 6       # товаров в начальном каталоге
+GROWTH = 5      # во сколько раз растёт каталог между замерами
+CART_LINES = 3
+
+# страница -> бюджет запросов (тёплый кэш, кэш HTML страниц выключен)
+STOREFRONT = {
+    "home": 1,
+    "catalog": 2,
+    "catalog_category": 5,
+    "catalog_sorted_page": 4,
+    "catalog_api": 1,
+    "product": 4,
+    "search_api": 0,
+    "cart_summary": 0,
+    "cart_add": 0,
+    "cart_update": 0,
+    "checkout": 0,
+    "checkout_submit": 8,  # с SAVEPOINT/RELEASE
+    "about": 0,
+    "contact": 0,
+    "delivery": 0,
+}
+# в админке сверх своих запросов: сессия, пользователь, COUNT для пагинатора
+ADMIN = {
+    "product_changelist": 12,
+    "category_changelist": 11,
+    "productphoto_changelist": 10,
+    "order_changelist": 14,
+    "customer_changelist": 10,
+    "payment_changelist": 10,
+    "imagejob_changelist": 11,
+    "product_change": 11,
+    "category_change": 11,
+    "order_change": 9,
+    "customer_change": 9,
+}
+# уже известные запросы на строку: страница -> где
+KNOWN_N_PLUS_ONE = {}
+
+_NORMALIZE_RE = re.compile(r"\b\d+\b|'[^']*'")
+
+
+def _jpeg(size=(64, 64), color=(180, 120, 90), quality=75) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def format_queries(queries) -> str:
+    """SQL страницы для сообщения об ошибке; одинаковые с точностью до чисел — сверху."""
+    shapes = Counter(_NORMALIZE_RE.sub("?", q["sql"]) for q in queries)
+    lines = [f"  ×{n}  {shape}" for shape, n in shapes.most_common() if n > 1]
+    if lines:
+        lines.insert(0, "Повторяющиеся запросы:")
+    lines.append("Все запросы:")
+    lines += [f"  {i}. {q['sql']}" for i, q in enumerate(queries, 1)]
+    return "\n".join(lines)
+
+
+class QueryBudgetMixin:
+    def measure(self, call):
+        """(число запросов, список SQL, ответ) для call(); первый вызов прогревает кэши."""
+        call()
+        with CaptureQueriesContext(connection) as ctx:
+            response = call()
+        if isinstance(response, HttpResponse):
+            self.assertLess(response.status_code, 400, f"HTTP {response.status_code}")
+        return len(ctx.captured_queries), ctx.captured_queries, response
+
+    def assertBudget(self, label, count, queries, budget):
+        self.assertLessEqual(
+            count, budget,
+            f"{label}: {count} запросов при бюджете {budget}\n{format_queries(queries)}",
+        )
+
+    def assertConstant(self, label, small, large):
+        (n_small, q_small), (n_large, q_large) = small, large
+        self.assertEqual(
+            n_small, n_large,
+            f"{label}: {n_small} запросов на маленьком каталоге и {n_large} — на большом "
+            f"(запрос на строку?)\n{format_queries(q_large)}",
+        )
+
+
+@override_settings(SHOP_PAGE_CACHE=False, SHOP_PERF_SAMPLE_RATE=0.0)
+class CatalogTestCase(QueryBudgetMixin, TestCase):
+    """Каталог с фото, клиентами и заказами, который можно растить."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media)
+        cls._media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media_override.disable()
+        shutil.rmtree(cls._media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.image_name = default_storage.save("products/photos/test.jpg", ContentFile(_jpeg()))
+        cls.root = Category.objects.create(name="Текстиль", slug="textile", position=1)
+        cls.child = Category.objects.create(name="Пледы", slug="plaids", parent=cls.root, position=1)
+        cls.other = Category.objects.create(name="Посуда", slug="dishes", position=2)
+        cls.grown = 0
+        cls.grow(SMALL)
+
+    @classmethod
+    def grow(cls, count):
+        """Добавить count подкатегорий, товаров (по 2 фото), клиентов и заказов; сбросить кэши витрины."""
+        start = cls.grown
+        Category.objects.bulk_create([
+            Category(name=f"Подкатегория {i}", slug=f"sub-{i}", parent=(cls.root, cls.other)[i % 2], position=10 + i)
+            for i in range(start, start + count)
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                name=f"Плед шерстяной {i}", slug=f"plaid-{i}",
+                category=(cls.child, cls.other)[i % 2],
+                price_byn=Decimal(50 + i), is_new=(i % 3 == 0), short_desc="мягкий плед",
+            )
+            for i in range(start, start + count)
+        ])
+        ProductPhoto.objects.bulk_create([
+            ProductPhoto(product=p, image=cls.image_name, image_crop="0,0,64,64", position=n)
+            for p in products
+            for n in range(2)
+        ])
+        for p in products:
+            p.cover = p.photos.first()
+        Product.objects.bulk_update(products, ["cover"])
+
+        customers = Customer.objects.bulk_create([
+            Customer(email=f"buyer{i}@example.com", name=f"Покупатель {i}")
+            for i in range(start, start + count)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(number=f"T-{i}", customer=c, email=c.email, subtotal=p.price_byn, total=p.price_byn)
+            for i, (c, p) in enumerate(zip(customers, products), start)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=o, product=p, product_name=p.name, qty=1, price_byn=p.price_byn, line_total=p.price_byn)
+            for o, p in zip(orders, products)
+        ] + [
+            OrderItem(order=o, product=products[0], product_name=products[0].name, qty=1,
+                      price_byn=products[0].price_byn, line_total=products[0].price_byn)
+            for o in orders[1:]
+        ])
+        Payment.objects.bulk_create([Payment(order=o, amount=o.total) for o in orders])
+
+        cls.grown += count
+        refresh_related()
+        rebuild_all()
+        bump_generation("menu", "catalog", "search", "recs", "home", "about", "contact", "delivery")
+
+    def cart_cookie(self) -> str:
+        """Подписанная cookie корзины с CART_LINES первыми товарами."""
+        lines = {pid: 1 for pid in Product.objects.order_by("id").values_list("id", flat=True)[:CART_LINES]}
+        response = HttpResponse()
+        response.set_signed_cookie(COOKIE_NAME, dumps(lines), salt=COOKIE_SALT)
+        return response.cookies[COOKIE_NAME].value
+
+    def cart_client(self, cookie) -> Client:
+        client = Client()
+        client.cookies[COOKIE_NAME] = cookie
+        return client
+
+
+class StorefrontQueryBudgetTests(CatalogTestCase):
+    def _targets(self):
+        product = Product.objects.order_by("id").first()
+        cookie = self.cart_cookie()
+        cart = self.cart_client(cookie)
+        pid = str(product.id)
+        checkout_form = {"email": "new@example.com", "full_name": "Тест", "contact_method": "email"}
+        return {
+            "home": lambda: self.client.get("/"),
+            "catalog": lambda: self.client.get(reverse("shop:catalog")),
+            "catalog_category": lambda: self.client.get(
+                reverse("shop:catalog"), {"section": self.root.slug, "category": self.child.slug}),
+            "catalog_sorted_page": lambda: self.client.get(
+                reverse("shop:catalog"), {"section": self.other.slug, "sort": "price_asc", "page": 2}),
+            "catalog_api": lambda: self.client.get(reverse("shop:catalog_api"), {"sort": "price_desc"}),
+            "product": lambda: self.client.get(product.get_absolute_url()),
+            "search_api": lambda: self.client.get(reverse("shop:search_api"), {"q": "плед"}),
+            "cart_summary": lambda: cart.get(reverse("shop:cart_summary")),
+            "cart_add": lambda: cart.post(reverse("shop:cart_add"), {"product_id": pid}),
+            "cart_update": lambda: cart.post(reverse("shop:cart_update"), {"product_id": pid, "action": "plus"}),
+            "checkout": lambda: cart.get(reverse("shop:checkout")),
+            "checkout_submit": lambda: self.cart_client(cookie).post(reverse("shop:checkout_submit"), checkout_form),
+            "about": lambda: self.client.get(reverse("shop:about")),
+            "contact": lambda: self.client.get(reverse("shop:contact")),
+            "delivery": lambda: self.client.get(reverse("shop:delivery")),
+        }
+
+    def test_budgets_constant_as_catalog_grows(self):
+        small = {label: self.measure(call)[:2] for label, call in self._targets().items()}
+        self.grow(SMALL * (GROWTH - 1))
+        for label, call in self._targets().items():
+            with self.subTest(label):
+                count, queries, _ = self.measure(call)
+                self.assertBudget(label, count, queries, STOREFRONT[label])
+                self.assertConstant(label, small[label], (count, queries))
+
+    def test_conditional_get_is_free(self):
+        url = reverse("shop:catalog")
+        etag = self.client.get(url)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertBudget("catalog 304", len(ctx), ctx.captured_queries, 0)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_rotated_csrf_cookie_gets_fresh_page(self):
+        url = reverse("shop:catalog")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "r" * 32  # вход/выход выдаёт новую cookie
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_content_version_changes_etag(self):
+        url = reverse("shop:catalog")
+        etag = self.client.get(url)["ETag"]
+        with override_settings(SHOP_CONTENT_VERSION="next-release"):
+            self.assertNotEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class CursorTests(CatalogTestCase):
+    def test_bad_page_cursor_falls_back_to_offset(self):
+        for after in ("²", "1²", "99999999999999999999999", "-1", ""):
+            with self.subTest(after=after):
+                response = self.client.get(reverse("shop:catalog"), {"after": after, "sort": "newest"})
+                self.assertEqual(response.status_code, 200)
+
+    def test_bad_api_cursor_is_400(self):
+        garbage = [
+            "é", "!!!", "bmV3ZXN0", encode_opaque_cursor("newest", "²"),
+            encode_opaque_cursor("newest", "9" * 30), encode_opaque_cursor("price_asc", "10_1"),
+        ]
+        for cursor in garbage:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse("shop:catalog_api"), {"sort": "newest", "cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+class GenerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_evicted_generation_never_revives_old_entries(self):
+        self.assertEqual(cached("menu", lambda: "старое", "menu"), "старое")
+        seen = {get_generation("menu")}
+        for _ in range(3):
+            bump_generation("menu")
+            seen.add(get_generation("menu"))
+        cache.delete(_gen_key("menu"))  # вытеснен: новый счётчик не должен совпасть со старыми
+        self.assertNotIn(get_generation("menu"), seen)
+        self.assertEqual(cached("menu", lambda: "новое", "menu"), "новое")
+
+    def test_bump_always_changes_generation(self):
+        before = get_generation("catalog")
+        bump_generation("catalog")
+        bump_generation("catalog")
+        self.assertGreater(get_generation("catalog"), before)
+
+
+class HomeThumbnailTests(CatalogTestCase):
+    def test_home_page_does_not_generate_thumbnails(self):
+        HomePageSettings.objects.update_or_create(pk=1, defaults={
+            "featured_1": self.root, "featured_1_image": self.image_name, "featured_1_crop": "0,0,64,64",
+        })
+        bump_generation("solo_homepagesettings")
+        blocks = HomePageSettings.get_solo().featured_blocks()
+        # миниатюры ещё не нарезаны: отдаётся оригинал, нарезка — дело pregenerate
+        self.assertEqual(blocks[0]["image"], default_storage.url(self.image_name))
+
+
+class OrderNumberTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(email="buyer@example.com")
+
+    def order(self) -> Order:
+        return Order.objects.create(customer=self.customer, email=self.customer.email)
+
+    def test_consecutive_numbers(self):
+        first, second = self.order(), self.order()
+        self.assertEqual((first.number, second.number), ("№-0001", "№-0002"))
+        self.assertEqual(OrderCounter.objects.get(scope="").value, 2)
+
+    @override_settings(SHOP_ORDER_NUMBER_YEARLY=True)
+    def test_new_year_restarts_counter(self):
+        numbers = []
+        for year in (2026, 2026, 2027):
+            with mock.patch("shop.models.timezone.localdate", return_value=date(year, 12, 31)):
+                numbers.append(self.order().number)
+        self.assertEqual(numbers, ["№-2026-0001", "№-2026-0002", "№-2027-0001"])
+
+
+class OrderNumberBackfillTests(TransactionTestCase):
+    """0033_order_counter: заказы без номера получают «№-pk», у остальных номер не меняется."""
+
+    before = [("shop", "0032_product_search_vector")]
+    after = [("shop", "0033_order_counter")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_existing_numbers_kept(self):
+        apps = self.migrate(self.before)
+        Order = apps.get_model("shop", "Order")
+        customer = apps.get_model("shop", "Customer").objects.create(email="a@example.com")
+        numbered = Order.objects.create(customer=customer, number="№-0007")
+        legacy = Order.objects.create(customer=customer, number="ORDER-OLD")
+        blank = Order.objects.create(customer=customer, number=None)
+
+        apps = self.migrate(self.after)
+        Order = apps.get_model("shop", "Order")
+        numbers = dict(Order.objects.values_list("pk", "number"))
+        self.assertEqual(numbers[numbered.pk], "№-0007")
+        self.assertEqual(numbers[legacy.pk], "ORDER-OLD")
+        self.assertEqual(numbers[blank.pk], f"№-{blank.pk:04d}")
+        # счётчик продолжает с наибольшего «№-…»
+        self.assertEqual(
+            apps.get_model("shop", "OrderCounter").objects.get(scope="").value, max(7, blank.pk),
+        )
+
+
+class CartPricesTests(CatalogTestCase):
+    def test_price_map_loads_only_requested_products(self):
+        cache.clear()
+        first, second, *_rest = Product.objects.order_by("id")
+        hidden = Product.objects.create(name="Скрытый", slug="hidden", category=self.other, price_byn=1, is_active=False)
+        with CaptureQueriesContext(connection) as ctx:
+            prices = price_map([first.pk, second.pk, hidden.pk])
+        self.assertEqual(set(prices), {first.pk, second.pk})
+        self.assertEqual(len(ctx), 1)
+        self.assertIn("IN (", ctx.captured_queries[0]["sql"])
+
+    def test_legacy_session_cart_moves_to_cookie(self):
+        product = Product.objects.order_by("id").first()
+        session = self.client.session
+        session["cart"] = {str(product.pk): {"qty": 2}}
+        session.save()
+
+        summary = self.client.get(reverse("shop:cart_summary")).json()
+        self.assertEqual([(i["id"], i["qty"]) for i in summary["items"]], [(product.pk, 2)])
+
+        response = self.client.post(reverse("shop:cart_update"), {"product_id": product.pk, "action": "plus"})
+        self.assertEqual(response.json()["qty"], 3)
+        self.assertIn(COOKIE_NAME, response.cookies)
+        self.assertNotIn("cart", self.client.session)
+
+
+class CartStorageTests(TestCase):
+    def test_cache_storage_needs_shared_backend(self):
+        backends = {
+            "django.core.cache.backends.filebased.FileBasedCache": False,
+            "django.core.cache.backends.locmem.LocMemCache": False,
+            "django.core.cache.backends.redis.RedisCache": True,
+            "django.core.cache.backends.db.DatabaseCache": True,
+        }
+        for backend, ok in backends.items():
+            with self.subTest(backend), override_settings(
+                SHOP_CART_STORAGE="cache", CACHES={"default": {"BACKEND": backend}},
+            ):
+                if ok:
+                    check_storage()
+                else:
+                    self.assertRaises(ImproperlyConfigured, check_storage)
+        with override_settings(SHOP_CART_STORAGE="session"):
+            self.assertRaises(ImproperlyConfigured, check_storage)
+
+
+class SuggestJournalTests(CatalogTestCase):
+    def test_concurrent_mark_dirty_is_not_lost(self):
+        index = suggest.SuggestIndex()
+        index.sync()
+        first, second = Product.objects.order_by("id")[:2]
+        Product.objects.filter(pk=first.pk).update(name="Кресло")
+        Product.objects.filter(pk=second.pk).update(name="Торшер")
+
+        publish = suggest.set_generation
+        state = {"raced": False}
+
+        def racing_set_generation(group, gen):
+            # второй процесс прочитал то же предыдущее поколение и записал своё поверх нашего
+            publish(group, gen)
+            if not state["raced"]:
+                state["raced"] = True
+                prev = cache.get(suggest._dirty_key(gen))["prev"]
+                other = suggest.new_generation(gen)
+                cache.set(suggest._dirty_key(other), {"prev": prev, "ids": [second.pk]})
+                publish(group, other)
+
+        with mock.patch.object(suggest, "set_generation", racing_set_generation):
+            suggest.mark_dirty([first.pk])
+
+        self.assertEqual([p["id"] for p in index.search("кресло")], [first.pk])
+        self.assertEqual([p["id"] for p in index.search("торшер")], [second.pk])
+
+
+class AdminQueryBudgetTests(CatalogTestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(self.admin)
+
+    def _targets(self):
+        product = Product.objects.order_by("id").first()
+        order = Order.objects.order_by("id").first()
+        customer = Customer.objects.order_by("id").first()
+
+        def page(name, *args):
+            return lambda: self.client.get(reverse(f"admin:{name}", args=args))
+
+        return {
+            "product_changelist": page("shop_product_changelist"),
+            "category_changelist": page("shop_category_changelist"),
+            "productphoto_changelist": page("shop_productphoto_changelist"),
+            "order_changelist": page("shop_order_changelist"),
+            "customer_changelist": page("shop_customer_changelist"),
+            "payment_changelist": page("shop_payment_changelist"),
+            "imagejob_changelist": page("imageops_imagejob_changelist"),
+            "product_change": page("shop_product_change", product.pk),
+            "category_change": page("shop_category_change", self.child.pk),
+            "order_change": page("shop_order_change", order.pk),
+            "customer_change": page("shop_customer_change", customer.pk),
+        }
+
+    def test_budgets_constant_as_catalog_grows(self):
+        small = {label: self.measure(call)[:2] for label, call in self._targets().items()}
+        self.grow(SMALL * (GROWTH - 1))
+        # строки инлайнов у открываемых объектов тоже растут: фото товара, заказы клиента, позиции заказа
+        product = Product.objects.order_by("id").first()
+        customer = Customer.objects.order_by("id").first()
+        ProductPhoto.objects.bulk_create([
+            ProductPhoto(product=product, image=self.image_name, position=n) for n in range(2, 8)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(number=f"C-{n}", customer=customer, email=customer.email) for n in range(6)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=o, product=p, product_name=p.name, qty=1, price_byn=p.price_byn, line_total=p.price_byn)
+            for o in [Order.objects.order_by("id").first(), *orders]
+            for p in Product.objects.order_by("id")[:6]
+        ])
+        for label, call in self._targets().items():
+            with self.subTest(label):
+                count, queries, _ = self.measure(call)
+                if label in KNOWN_N_PLUS_ONE:
+                    self.skipTest(f"известный запрос на строку: {KNOWN_N_PLUS_ONE[label]}")
+                self.assertBudget(label, count, queries, ADMIN[label])
+                self.assertConstant(label, small[label], (count, queries))
+
+
+@override_settings(IMAGEOPS_MAX_DIMS=(1800, 1800), IMAGEOPS_QUALITY=82, IMAGEOPS_FORCE_WEBP=False)
+class RecompressMediaTests(CatalogTestCase):
+    def setUp(self):
+        self.big = default_storage.save("products/photos/big.jpg", ContentFile(_jpeg((2400, 1600), quality=95)))
+        self.product = Product.objects.order_by("id").first()
+        self.photo = ProductPhoto.objects.create(
+            product=self.product, image=self.big, image_crop="0,0,1600,1600", position=5,
+        )
+        Product.objects.filter(pk=self.product.pk).update(image=self.big)
+
+    def recompress(self, **options):
+        out = io.StringIO()
+        call_command("imageops_recompress", workers=1, batch_size=4, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_changes_nothing(self):
+        output = self.recompress(dry_run=True)
+        self.assertRegex(output, r"Можно заменить: [1-9]")
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.image.name, self.big)
+        self.assertFalse(RecompressCheckpoint.objects.exists())
+
+    def test_oversized_file_is_replaced_everywhere(self):
+        self.recompress()
+        self.photo.refresh_from_db()
+        self.product.refresh_from_db()
+        new_name = self.photo.image.name
+        self.assertNotEqual(new_name, self.big)
+        self.assertEqual(self.product.image.name, new_name)  # та же картинка в другом поле
+        self.assertEqual(self.photo.image_crop, "0,0,1200,1200")  # 2400 → 1800
+        with default_storage.open(new_name) as fh, Image.open(fh) as img:
+            self.assertEqual(img.size, (1800, 1200))
+
+        checkpoint = RecompressCheckpoint.objects.get(pk="shop.ProductPhoto.image")
+        self.assertEqual(checkpoint.files, 1)
+        self.assertEqual(checkpoint.position, ProductPhoto.objects.order_by("-pk").first().pk)
+
+        self.assertIn("Заменено: 0 ", self.recompress())  # продолжение с чекпоинта: делать нечего
+        # с нуля: свои же результаты не пересжимаются — выигрыш меньше --min-saving
+        self.assertIn("Заменено: 0 ", self.recompress(restart=True))
+
+    def test_originals_kept_unless_asked(self):
+        output = self.recompress()
+        self.assertIn("освобождено 0.0 МБ", output)
+        self.assertTrue(default_storage.exists(self.big))
+        self.assertEqual(RecompressCheckpoint.objects.get(pk="shop.ProductPhoto.image").bytes_freed, 0)
+
+    def test_delete_originals_frees_unreferenced(self):
+        originals = [self.big, self.image_name]  # общий test.jpg тоже пересжимается
+        size = sum(default_storage.size(name) for name in originals)
+        self.addCleanup(default_storage.save, self.image_name, ContentFile(_jpeg()))
+        self.recompress(delete_originals=True)
+        for name in originals:  # ни фото, ни товары на них больше не ссылаются
+            self.assertFalse(default_storage.exists(name))
+        checkpoints = RecompressCheckpoint.objects.all()
+        self.assertEqual(sum(c.bytes_freed for c in checkpoints), size)
+        self.assertGreater(sum(c.bytes_written for c in checkpoints), 0)
+
+
+@override_settings(SHOP_PERF_SAMPLE_RATE=0.0)
+class HotPathBenchmarks(QueryBudgetMixin, TestCase):
+    """Микробенчмарки: запросы и время на вызов (пороги с большим запасом)."""
+
+    LOOPS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        root = Category.objects.create(name="Декор", slug="decor")
+        for i in range(8):
+            Category.objects.create(name=f"Подкатегория {i}", slug=f"sub-{i}", parent=root, position=i)
+        cls.products = Product.objects.bulk_create([
+            Product(name=f"Ваза {i}", slug=f"vase-{i}", category=root, price_byn=Decimal(10 + i))
+            for i in range(200)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        bump_generation("menu", "catalog")
+        self.cart = Cart(RequestFactory().get("/"))
+        for p in self.products[:20]:
+            self.cart.add(p.id, 2)
+
+    def bench(self, label, func, budget_ms, queries=0):
+        func()  # прогрев кэшей
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        self.assertBudget(label, len(ctx), ctx.captured_queries, queries)
+        best = float("inf")
+        for _ in range(3):
+            started = time.perf_counter()
+            for _ in range(self.LOOPS):
+                func()
+            best = min(best, (time.perf_counter() - started) / self.LOOPS * 1000)
+        self.assertLess(best, budget_ms, f"{label}: {best:.3f} мс на вызов при пороге {budget_ms} мс")
+        return best
+
+    def test_cart_totals(self):
+        price_map(self.cart.lines)
+        self.bench("Cart.totals", self.cart.totals, budget_ms=1)
+
+    def test_cart_context(self):
+        self.bench("_cart_context", lambda: _cart_context(None, self.cart), budget_ms=1)
+
+    def test_get_cart_rows(self):
+        self.bench("_get_cart_rows", lambda: _get_cart_rows(self.cart), budget_ms=20, queries=1)
+
+    def test_menu_sections(self):
+        self.bench("_menu_sections", _menu_sections, budget_ms=2)
@@ -0,0 +1,117 @@
+"""
+Заранее нарезанные миниатюры для ImageRatioField.
+
+Кадрированные миниатюры генерируются при сохранении модели (см. signals.py)
+и командой `manage.py pregenerate_thumbnails`. На рендере страниц бэкенд
+PregeneratedThumbnailsBackend только ищет готовый файл и, если его нет,
+отдаёт оригинал — генерации внутри запроса не происходит. Такие промахи
+считает метрика shop_thumbnail_misses_total (в лог — только на DEBUG:
+пока миниатюры не нарезаны, промах на каждой картинке каждой страницы).
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from easy_thumbnails.files import get_thumbnailer
+from image_cropping.backends.easy_thumbs import EasyThumbnailsBackend
+from image_cropping.templatetags.cropping import cropped_thumbnail
+
+from core.metrics import Counter
+
+from .perf import span
+from .models import (
+    Category, NewTabSettings, ProductPhoto, HomePageSettings,
+    AboutPageSettings, DeliveryPageSettings,
+)
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_MISSES = Counter(
+    "shop_thumbnail_misses_total", "Кадрированные миниатюры, не нарезанные заранее (отдан оригинал)",
+)
+
+# Модель -> [(поле кропа, опции как в {% cropped_thumbnail %} шаблонов)]
+THUMBNAIL_SPECS = {
+    ProductPhoto: [
+        ("image_crop", {}),  # catalog.html, product.html
+    ],
+    Category: [
+        ("banner_crop", {"upscale": True}),  # catalog.html
+    ],
+    NewTabSettings: [
+        ("banner_crop", {"upscale": True}),  # catalog.html
+    ],
+    HomePageSettings: [
+        ("hero_crop", {"upscale": True}),  # index.html
+        ("featured_1_crop", {"upscale": True}),
+        ("featured_2_crop", {"upscale": True}),
+        ("featured_3_crop", {"upscale": True}),
+    ],
+    AboutPageSettings: [
+        ("block1_crop", {"scale": 1}),  # about.html
+        ("block2_crop", {"scale": 1}),
+        ("block3_crop", {"scale": 1}),
+    ],
+    DeliveryPageSettings: [
+        ("image_left_crop", {}),  # delivery.html
+        ("image_right_crop", {}),
+    ],
+}
+
+_generating = ContextVar("shop_thumbnails_generating", default=False)
+
+
+@contextmanager
+def generating():
+    """Внутри блока бэкенд генерирует недостающие миниатюры."""
+    token = _generating.set(True)
+    try:
+        yield
+    finally:
+        _generating.reset(token)
+
+
+class PregeneratedThumbnailsBackend(EasyThumbnailsBackend):
+    """
+    Бэкенд django-image-cropping, который не генерирует кадрированные
+    миниатюры на рендере. Превью в админке (запросы без box) генерируются
+    как раньше.
+    """
+
+    def get_thumbnail_url(self, image_path, thumbnail_options):
+        with span("thumb"):
+            if _generating.get() or "box" not in thumbnail_options:
+                return super().get_thumbnail_url(image_path, thumbnail_options)
+
+            thumb = get_thumbnailer(image_path).get_thumbnail(thumbnail_options, generate=False)
+            if thumb:
+                return thumb.url
+            THUMBNAIL_MISSES.inc()
+            logger.debug("thumbnail miss: %s %s", getattr(image_path, "name", image_path), thumbnail_options)
+            return image_path.url
+
+
+def thumbnail_url(instance, ratiofieldname, **options) -> str:
+    """URL кадрированной миниатюры; при отсутствии — сгенерировать."""
+    with generating():
+        return cropped_thumbnail({}, instance, ratiofieldname, **options) or ""
+
+
+def ready_thumbnail_url(instance, ratiofieldname, **options) -> str:
+    """URL готовой миниатюры; если её нет — оригинал (промах считается), без генерации."""
+    return cropped_thumbnail({}, instance, ratiofieldname, **options) or ""
+
+
+def pregenerate(instance) -> int:
+    """Нарезать все миниатюры, которые нужны шаблонам для instance."""
+    done = 0
+    for ratiofieldname, options in THUMBNAIL_SPECS.get(type(instance), ()):
+        try:
+            if thumbnail_url(instance, ratiofieldname, **options):
+                done += 1
+        except Exception:
+            logger.exception(
+                "thumbnail pregeneration failed: %s #%s %s",
+                type(instance).__name__, instance.pk, ratiofieldname,
+            )
+    return done
@@ -2,7 +2,7 @@ from django.urls import path
 from .views import (
     HomeView, catalog, product_detail, checkout,
     cart_add, cart_update, about, contact, delivery,
-    cart_summary, search_products, checkout_submit,
+    cart_summary, search_products, checkout_submit, catalog_api,
 )
 
 app_name = "shop"
@@ -20,4 +20,5 @@ urlpatterns = [
     path("delivery/", delivery, name="delivery"),
     path("api/cart/summary/", cart_summary, name="cart_summary"),
     path("api/search/", search_products, name="search_api"),
+    path("api/catalog/", catalog_api, name="catalog_api"),
 ]
@@ -1,21 +1,38 @@
+import hashlib
+from functools import wraps
+
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
 from django.db.models import Q
 from .models import Product, Category, NewTabSettings, HomePageSettings, AboutPageSettings, ContactPageSettings, \
     DeliveryPageSettings
 from decimal import Decimal, InvalidOperation
-from django.http import JsonResponse, HttpResponseBadRequest
-from django.views.decorators.http import require_POST
+from django.http import Http404, JsonResponse, HttpResponseBadRequest
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST
 from django_countries import countries
 from django.conf import settings
 from django.urls import reverse
 from django.views.generic import TemplateView
+from django.utils.decorators import method_decorator
 from django.db import transaction
-from .models import Customer, Order, OrderItem, Payment
-from .services import upsert_customer_from_checkout
+from .models import Customer, Order, Payment
+from .services import CHECKOUT_FAILURES, place_order, upsert_customer_from_checkout
+from .cache import cached, versioned_key
+from .cart import Cart, price_map
+from . import search as search_engine
+from . import suggest
+from .conditional import conditional_page
+from .pagecache import page_cached
+from .recommendations import also_bought
+from .related import related_products
+from .pagination import (
+    cached_count, decode_opaque_cursor, encode_opaque_cursor, keyset_page, keyset_slice,
+)
 from django.db.models import Prefetch
 
 
+@method_decorator(conditional_page("menu", "catalog", "home"), name="dispatch")
+@method_decorator(page_cached("menu", "catalog", "home"), name="dispatch")
 class HomeView(TemplateView):
     template_name = "index.html"
 
@@ -33,6 +50,11 @@ class HomeView(TemplateView):
         return ctx
 
 
+CATALOG_PER_PAGE = 8
+
+
+@conditional_page("menu", "catalog")
+@page_cached("menu", "catalog", params=("section", "category", "sort", "page", "after", "before"))
 def catalog(request):
     section_slug  = (request.GET.get("section") or "new").strip()
     category_slug = (request.GET.get("category") or "").strip()
@@ -45,13 +67,35 @@ def catalog(request):
         .order_by("position", "name")
     )
 
+    found = _catalog_filter(section_slug, category_slug)
+
+    # keyset по сортировке из SORTS; количество — из кэша по фильтру
+    products = keyset_page(
+        found.pop("qs"), request.GET, sort=sort, per_page=CATALOG_PER_PAGE,
+        count_key=f"{section_slug}:{category_slug}",
+    )
+
+    return render(request, "catalog.html", {
+        **found,
+        "sections": sections,
+        "products": products,
+        "sort": sort,
+        "menu_sections": _menu_sections(),
+    })
+
+
+def _catalog_filter(section_slug, category_slug):
+    """
+    Товары вкладки/подкатегории каталога + то, что нужно шаблону о фильтре.
+    Общая часть catalog и catalog_api.
+    """
     current_section  = None
     current_category = None
     current_tab      = None
     new_settings     = None
     categories       = Category.objects.none()   # пока пусто
 
-    qs = Product.objects.filter(is_active=True).select_related("category", "category__parent")
+    qs = Product.objects.filter(is_active=True).select_related("category", "category__parent", "cover")
 
     if section_slug == "new":
         current_tab  = "new"
@@ -73,24 +117,66 @@ def catalog(request):
             current_category = get_object_or_404(Category, slug=category_slug, parent=current_section)
             qs = qs.filter(category=current_category)
 
-    order_map = {"newest": "-id", "oldest": "id", "price_desc": "-price_byn", "price_asc": "price_byn"}
-    qs = qs.order_by(order_map.get(sort, "-id"))
-
-    products = Paginator(qs, 8).get_page(request.GET.get("page"))
-
-    return render(request, "catalog.html", {
-        "sections": sections,
+    return {
+        "qs": qs,
         "current_section": current_section,
         "current_category": current_category,
         "current_tab": current_tab,
         "categories": categories,
-        "products": products,
-        "sort": sort,
         "new_settings": new_settings,
-        "menu_sections": _menu_sections(),
+    }
+
+
+def _catalog_api_params(request):
+    return (
+        (request.GET.get("section") or "new").strip(),
+        (request.GET.get("category") or "").strip(),
+        (request.GET.get("sort") or "newest").strip(),
+        (request.GET.get("cursor") or "").strip(),
+    )
+
+
+def _catalog_api_etag(request):
+    # без запросов к БД: ответ меняется только вместе с поколением «catalog»
+    key = versioned_key("api_catalog:" + "|".join(_catalog_api_params(request)), "catalog")
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+@condition(etag_func=_catalog_api_etag)
+def catalog_api(request):
+    """
+    JSON-срез каталога для бесконечной прокрутки:
+    { ok, items:[{id,name,price,image,url}], next, count }
+    next — непрозрачный курсор для ?cursor= следующего запроса (null — конец).
+    """
+    section_slug, category_slug, sort, cursor = _catalog_api_params(request)
+    qs = _catalog_filter(section_slug, category_slug)["qs"]
+
+    after = decode_opaque_cursor(cursor, sort) if cursor else None
+    if cursor and after is None:
+        return HttpResponseBadRequest("bad cursor")
+
+    rows, next_cursor = keyset_slice(qs, sort=sort, after=after, per_page=CATALOG_PER_PAGE)
+    count = cached_count(qs, f"{section_slug}:{category_slug}")
+
+    response = JsonResponse({
+        "ok": True,
+        "items": [{
+            "id": p.id,
+            "name": p.name,
+            "price": int(p.price_byn),
+            "image": p.cover_url or (p.image.url if p.image else ""),
+            "url": p.get_absolute_url(),
+        } for p in rows],
+        "next": encode_opaque_cursor(sort, next_cursor) if next_cursor else None,
+        "count": count,
     })
+    patch_cache_control(response, no_cache=True)  # браузер переспрашивает с If-None-Match
+    return response
 
 
+@conditional_page("menu", "catalog", "recs")
+@page_cached("menu", "catalog", "recs")
 def product_detail(request, slug):
     product = get_object_or_404(
         Product.objects.filter(is_active=True)
@@ -118,63 +204,29 @@ def product_detail(request, slug):
     for ph in photos_qs:
         push(ph.image.url, ph.alt or product.name, cover=False)
 
-    # Похожие товары: сначала из той же категории (кроме текущего), всего 4
-    limit = 4
-    base_qs = Product.objects.filter(is_active=True).exclude(pk=product.pk)
-
-    same_cat = list(
-        base_qs.filter(category=product.category)
-        .select_related("category")
-        .only("id", "name", "slug", "price_byn", "image", "category")
-        .order_by("-is_new", "-id")[:limit]
-    )
-
-    related = same_cat
-    if len(related) < limit:
-        need = limit - len(related)
-        exclude_ids = [p.id for p in related] + [product.id]
-        fallback = list(
-            Product.objects.filter(is_active=True)
-            .exclude(id__in=exclude_ids)
-            .only("id", "name", "slug", "price_byn", "image")
-            .order_by("-is_new", "-id")[:need]
-        )
-        related += fallback
+    # Похожие товары — готовый список из RelatedProduct (shop/related.py)
+    related = related_products(product)
 
     return render(request, "product.html", {
         "product": product,
         "gallery": gallery,
         "related_products": related,
+        "also_bought": also_bought([product.id]),
         "menu_sections": _menu_sections(),
     })
 
 
-def _cart_context(request):
-    cart_raw = request.session.get("cart", {})
-    if not cart_raw:
-        return {"items": [], "total": Decimal(0), "count": 0}
-
-    ids = [int(pid) for pid in cart_raw.keys()]
-    products = (
-        Product.objects.filter(id__in=ids, is_active=True)
-        .only("id", "name", "slug", "price_byn", "image")
-    )
-
+def _cart_context(request, cart=None):
+    cart = cart if cart is not None else Cart(request)
     items, total, count = [], Decimal(0), 0
-    by_id = {p.id: p for p in products}
-    for pid_str, row in cart_raw.items():
-        pid = int(pid_str)
-        p = by_id.get(pid)
-        if not p:
-            continue
-        qty = max(1, int(row.get("qty", 1)))
-        line_total = p.price_byn * qty
+    for pid, info, qty in cart.rows():
+        line_total = info["price"] * qty
         items.append({
-            "id": p.id,
-            "name": p.name,
-            "slug": p.slug,
-            "image": (p.image.url if p.image else None),
-            "price": p.price_byn,
+            "id": pid,
+            "name": info["name"],
+            "slug": info["slug"],
+            "image": info["image"],
+            "price": info["price"],
             "qty": qty,
             "line_total": line_total,
         })
@@ -184,24 +236,6 @@ def _cart_context(request):
     return {"items": items, "total": total, "count": count}
 
 
-def _cart_totals(cart_dict):
-    """Подсчитать итоговую сумму и общее кол-во по cart_dict вида {"12":{"qty":2}}."""
-    if not cart_dict:
-        return Decimal(0), 0
-    ids = [int(pid) for pid in cart_dict.keys()]
-    by_id = {p.id: p for p in Product.objects.filter(id__in=ids, is_active=True).only("id", "price_byn")}
-    total = Decimal(0)
-    count = 0
-    for pid_str, row in cart_dict.items():
-        p = by_id.get(int(pid_str))
-        if not p:
-            continue
-        qty = max(1, int(row.get("qty", 1)))
-        total += p.price_byn * qty
-        count += qty
-    return total, count
-
-
 @require_POST
 def cart_add(request):
     pid = request.POST.get("product_id")
@@ -216,16 +250,16 @@ def cart_add(request):
 
     qty = min(max(qty, 1), 99)  # 1..99
     # Проверяем, что товар активен
-    get_object_or_404(Product, pk=pid, is_active=True)
+    if not price_map([pid]):
+        raise Http404("product not found")
 
-    cart = request.session.get("cart", {})
-    current = cart.get(str(pid), {}).get("qty", 0)
-    cart[str(pid)] = {"qty": min(current + qty, 99)}  # накапливаем
-    request.session["cart"] = cart
-    request.session.modified = True
+    cart = Cart(request)
+    cart.add(pid, qty)  # накапливаем
 
-    total, count = _cart_totals(cart)
-    return JsonResponse({"ok": True, "count": count, "total": int(total)})
+    total, count = cart.totals()
+    response = JsonResponse({"ok": True, "count": count, "total": int(total)})
+    cart.save(response)
+    return response
 
 
 @require_POST
@@ -240,47 +274,37 @@ def cart_update(request):
         return HttpResponseBadRequest("bad pid")
 
     # убеждаемся, что товар существует и активен (заодно для цены)
-    product = get_object_or_404(Product, pk=pid, is_active=True)
+    product = price_map([pid]).get(pid)
+    if product is None:
+        raise Http404("product not found")
 
-    cart = request.session.get("cart", {})
-    key = str(pid)
-    cur = int(cart.get(key, {}).get("qty", 0))
+    cart = Cart(request)
+    cur = cart.qty(pid)
 
     if action == "remove":
-        cart.pop(key, None)
+        cart.remove(pid)
     elif action == "plus":
-        cart[key] = {"qty": min(99, cur + 1)}
+        cart.set(pid, cur + 1)
     elif action == "minus":
-        new_qty = cur - 1
-        if new_qty <= 0:
-            cart.pop(key, None)
-        else:
-            cart[key] = {"qty": new_qty}
+        cart.set(pid, cur - 1)
     elif action == "set":
         try:
             q = int(qty_raw)
         except (TypeError, ValueError):
             return HttpResponseBadRequest("bad qty")
-        q = max(0, min(99, q))
-        if q <= 0:
-            cart.pop(key, None)
-        else:
-            cart[key] = {"qty": q}
+        cart.set(pid, max(0, min(99, q)))
     else:
         return HttpResponseBadRequest("bad action")
 
-    request.session["cart"] = cart
-    request.session.modified = True
-
     # Итоги по корзине
-    total, count = _cart_totals(cart)
+    total, count = cart.totals()
 
     # Текущая строка (если не удалили)
-    qty = int(cart.get(key, {}).get("qty", 0))
+    qty = cart.qty(pid)
     removed = qty == 0
-    line_total = (product.price_byn * qty) if not removed else Decimal(0)
+    line_total = (product["price"] * qty) if not removed else Decimal(0)
 
-    return JsonResponse({
+    response = JsonResponse({
         "ok": True,
         "removed": removed,
         "qty": qty,
@@ -288,6 +312,8 @@ def cart_update(request):
         "total": int(total),
         "count": count,
     })
+    cart.save(response)
+    return response
 
 
 def checkout(request):
@@ -316,9 +342,10 @@ def checkout(request):
 def cart_summary(request):
     """
     JSON для мини-корзины (окно справа):
-    { ok, items:[{id,name,slug,image,qty,price,line_total,url,size}], total, count }
+    { ok, items:[{id,name,slug,image,qty,price,line_total,url,size}], total, count,
+      recommendations:[{id,name,slug,image,price,url}] }
     """
-    ctx = _cart_context(request)  # <-- используем твою существующую сборку из сессии
+    ctx = _cart_context(request)
 
     items = []
     for it in ctx["items"]:
@@ -335,11 +362,22 @@ def cart_summary(request):
             "url": reverse("shop:product-detail", args=[slug]) if slug else "",
         })
 
+    # «С этим покупают» по всей корзине — из кэша, без запросов к БД
+    recommendations = [{
+        "id": r["id"],
+        "name": r["name"],
+        "slug": r["slug"],
+        "image": r["image"] or "",
+        "price": int(r["price_byn"]),
+        "url": reverse("shop:product-detail", args=[r["slug"]]),
+    } for r in also_bought([it["id"] for it in ctx["items"]])]
+
     return JsonResponse({
         "ok": True,
         "items": items,
         "total": int(ctx["total"]),
         "count": ctx["count"],
+        "recommendations": recommendations,
     })
 
 
@@ -348,25 +386,18 @@ def search_products(request):
     if not q:
         return JsonResponse({"ok": True, "items": []})
 
-    qs = (
-        Product.objects.filter(is_active=True)
-        .filter(
-            Q(name__icontains=q) |
-            Q(short_desc__icontains=q) |  # <<< у тебя поле short_desc, не description
-            Q(category__name__icontains=q)
-        )
-        .only("id", "name", "slug", "price_byn", "image")
-        .order_by("-is_new", "-id")[:10]
-    )
-
-    items = [{
-        "id": p.id,
-        "name": p.name,
-        "slug": p.slug,
-        "price": int(p.price_byn),
-        "image": (p.image.url if p.image else ""),
-        "url": reverse("shop:product-detail", args=[p.slug]),
-    } for p in qs]
+    if suggest.enabled():
+        # индекс в памяти воркера (shop/suggest.py) — без запросов к БД
+        items = suggest.suggest(q, limit=10)
+    else:
+        items = [{
+            "id": p.id,
+            "name": p.name,
+            "slug": p.slug,
+            "price": int(p.price_byn),
+            "image": (p.image.url if p.image else ""),
+            "url": reverse("shop:product-detail", args=[p.slug]),
+        } for p in search_engine.search_products(q, limit=10)]
 
     return JsonResponse({"ok": True, "items": items})
 
@@ -378,32 +409,17 @@ def _parse_decimal(val, default="0"):
         return Decimal(default)
 
 
-def _get_cart_rows(session):
+def _get_cart_rows(cart):
     """
-    Вернёт список (product, qty, price_byn) только по актуальным активным товарам из сессии.
+    Вернёт список (product, qty, price_byn) только по актуальным активным товарам корзины.
+    Цены читаем из БД, а не из price_map: заказ фиксирует цену на момент оформления.
     """
-    cart_raw = session.get("cart", {}) or {}
-    if not cart_raw:
-        return []
-
-    ids = [int(pid) for pid in cart_raw.keys() if str(pid).isdigit()]
-    if not ids:
+    if not cart:
         return []
 
-    by_id = {p.id: p for p in Product.objects.filter(id__in=ids, is_active=True)
+    by_id = {p.id: p for p in Product.objects.filter(id__in=list(cart.lines), is_active=True)
     .only("id", "name", "price_byn")}
-    rows = []
-    for pid_str, row in cart_raw.items():
-        try:
-            pid = int(pid_str)
-        except (TypeError, ValueError):
-            continue
-        p = by_id.get(pid)
-        if not p:
-            continue
-        qty = max(1, int(row.get("qty", 1)))
-        rows.append((p, qty, p.price_byn))
-    return rows
+    return [(by_id[pid], qty, by_id[pid].price_byn) for pid, qty in cart.lines.items() if pid in by_id]
 
 
 def _extract_utm_from_request(request):
@@ -430,6 +446,18 @@ def _post(request, key, fallback_keys=()):
     return ""
 
 
+def _count_checkout_errors(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Exception:
+            CHECKOUT_FAILURES.inc(reason="error")
+            raise
+    return wrapper
+
+
+@_count_checkout_errors
 @transaction.atomic
 @require_POST
 def checkout_submit(request):
@@ -440,8 +468,10 @@ def checkout_submit(request):
     """
 
     # 1) Корзина
-    cart_rows = _get_cart_rows(request.session)
+    cart = Cart(request)
+    cart_rows = _get_cart_rows(cart)
     if not cart_rows:
+        CHECKOUT_FAILURES.inc(reason="empty_cart")
         return HttpResponseBadRequest("empty cart")
 
     # 2) Доставка vs Самовывоз
@@ -457,6 +487,7 @@ def checkout_submit(request):
     phone = _post(request, "phone", ("phone_pickup",))
 
     if not email:
+        CHECKOUT_FAILURES.inc(reason="email_required")
         return HttpResponseBadRequest("email required")
 
     # Способ связи и хэндлы
@@ -518,9 +549,14 @@ def checkout_submit(request):
         # запасной вариант — чтобы заказ точно не остался без контакта
         return customer.preferred_contact_value or email or phone or tg_username or instagram_username
 
-    # 7) Создаём заказ (пока без позиций)
-    order = Order.objects.create(
+    # 7) Заказ + позиции + платёж PENDING (суммы считаются в памяти)
+    order = place_order(
         customer=customer,
+        lines=cart_rows,
+        shipping_cost=shipping_cost,
+        discount=discount,
+        payment_provider=Payment.Provider.CARD,  # замените при интеграции провайдера
+
         email=email,
         phone=phone,
         contact_method=(contact_method or customer.preferred_contact),
@@ -534,54 +570,21 @@ def checkout_submit(request):
         pickup_address=(pickup_address if not is_delivery else ""),
         delivery_address=(f"{country}, {city}, {pickup_address}".strip(", ") if is_delivery else ""),
 
-        # Деньги
-        shipping_cost=shipping_cost,
-        discount=discount,
-
         # Прочее
         comment=_post(request, "order_comment"),
         utm=_extract_utm_from_request(request),
         currency="BYN",
     )
 
-    # 8) Позиции + пересчёт
-    subtotal = Decimal("0")
-    for product, qty, price in cart_rows:
-        line_total = price * qty
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            product_name=product.name,  # срез имени
-            sku="",  # если появится product.sku — подставь
-            qty=qty,
-            price_byn=price,  # срез цены
-            line_total=line_total,
-        )
-        subtotal += line_total
-
-    order.subtotal = subtotal
-    order.total = subtotal + shipping_cost - discount
-    order.save(update_fields=["subtotal", "total"])
-
-    # 9) (опц.) предварительный платёж PENDING
-    Payment.objects.create(
-        order=order,
-        provider=Payment.Provider.CARD,  # замените при интеграции провайдера
-        amount=order.total,
-        currency=order.currency,
-        status=Payment.PStatus.PENDING,
-    )
-
-    # 10) Очистка корзины
-    request.session["cart"] = {}
-    request.session.modified = True
+    # 8) Очистка корзины
+    cart.clear()
 
-    # 11) Ответ фронту
+    # 9) Ответ фронту
     msg = (
         f"Ваш заказ {order.number} на сумму {int(order.total)} {order.currency} оформлен. "
         f"Мы свяжемся с вами для уточнения оплаты."
     )
-    return JsonResponse({
+    response = JsonResponse({
         "ok": True,
         "order_id": order.id,
         "order_number": order.number,
@@ -590,18 +593,26 @@ def checkout_submit(request):
         "message": msg,
         # "payment_url": null  # появится при подключении платёжной сессии
     })
+    cart.save(response)
+    return response
 
 
+@conditional_page("menu", "about")
+@page_cached("menu", "about")
 def about(request):
     settings_obj = AboutPageSettings.get_solo()
     return render(request, "about.html", {"about": settings_obj, "menu_sections": _menu_sections()})
 
 
+@conditional_page("menu", "contact")
+@page_cached("menu", "contact")
 def contact(request):
     c = ContactPageSettings.get_solo()
     return render(request, "contact.html", {"contact": c, "ymaps_key": settings.YANDEX_MAPS_API_KEY, "menu_sections": _menu_sections()})
 
 
+@conditional_page("menu", "delivery")
+@page_cached("menu", "delivery")
 def delivery(request):
     d = DeliveryPageSettings.get_solo()
     return render(request, "delivery.html", {"delivery": d, "menu_sections": _menu_sections()})
@@ -609,8 +620,12 @@ def delivery(request):
 
 def _menu_sections():
     """
-    Возвращает дерево категорий для меню:
+    Возвращает дерево категорий для меню (из кэша, сбрасывается сигналами Category):
     """
+    return cached("menu_sections", _build_menu_sections, "menu")
+
+
+def _build_menu_sections():
     parents = Category.objects.filter(parent__isnull=True).order_by("position", "name")
     children_qs = Category.objects.filter(parent__isnull=False).order_by("position", "name")
     sections = list(
@@ -623,4 +638,4 @@ def _menu_sections():
             "children": [{"slug": c.slug, "name": c.name} for c in getattr(s, "subcats", [])],
         }
         for s in sections
-    ]
\ No newline at end of file
+    ]